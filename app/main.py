@@ -1,24 +1,41 @@
 # init fast API
-from fastapi import FastAPI, Request, UploadFile, File, HTTPException, APIRouter, WebSocket, WebSocketDisconnect
+from fastapi import FastAPI, Request, UploadFile, File, HTTPException
 
-from langchain_core.messages import HumanMessage
-from scripts.model import llm
-from langchain_google_genai import ChatGoogleGenerativeAI
+from fastapi.responses import PlainTextResponse
+
+from contextlib import asynccontextmanager
 import asyncio
-import json
+import logging
 import os
-import shutil
-
-from routers import chat
+import time
+import uuid
+from pathlib import Path
 
 #adding CORS
 from fastapi.middleware.cors import CORSMiddleware
 
-from routers import chat as chat_router
-from scripts.doc_retrieval import DocumentBaseRetriever
-from scripts.model import llm
+from app.routers import assess as assess_router
+from app.routers import chat as chat_router
+from app.routers import history as history_router
+from ragPipeline import rag
+from scripts.doc_retrieval import index_file
+from scripts.ingest_jobs import IngestJobs, JobQueueFull
+from scripts.metrics import METRICS
+from scripts.profiler import SamplingProfiler
+
+logger = logging.getLogger(__name__)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    #clients, stores and the rule table are lazy; build them before taking traffic, off the event loop
+    if os.getenv("WARM_UP", "1") == "1":
+        timings = await asyncio.to_thread(rag.warm_up)
+        logger.info("warm-up (ms): %s", timings)
+    yield
+    #uploads already accepted are indexed before the process exits
+    await asyncio.to_thread(INGEST_JOBS.close)
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"], 
@@ -26,29 +43,97 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
-retriever_instance = DocumentBaseRetriever()
-chat_router.router.RETRIEVER = retriever_instance
-chat_router.LLM = llm
+#opt-in sampling profiler: with PROFILE_REQUESTS=1 a request sent with `X-Profile: 1` has the event
+#loop thread sampled while it runs, collapsed stacks go to PROFILE_DIR (path in X-Profile-File)
+PROFILE_REQUESTS = os.getenv("PROFILE_REQUESTS", "0") == "1"
+PROFILE_DIR = os.getenv("PROFILE_DIR", "app/profiles")
+PROFILE_INTERVAL_MS = float(os.getenv("PROFILE_INTERVAL_MS", "5"))
+
+async def profile_request(request: Request, call_next):
+    if request.headers.get("x-profile") != "1":
+        return await call_next(request)
+    profiler = SamplingProfiler(interval_s=PROFILE_INTERVAL_MS / 1000).start()
+    try:
+        #until the response starts: a streamed body is sampled only up to its first chunk
+        response = await call_next(request)
+    finally:
+        profiler.stop()
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    name = request.url.path.strip("/").replace("/", "_") or "root"
+    path = os.path.join(PROFILE_DIR, f"{int(time.time() * 1000)}-{name}.folded")
+    with open(path, "w") as f:
+        f.write(profiler.collapsed())
+    response.headers["X-Profile-File"] = path
+    response.headers["X-Profile-Samples"] = str(profiler.samples)
+    return response
+
+#not installed unless enabled, ordinary requests don't pay for the middleware
+if PROFILE_REQUESTS:
+    app.middleware("http")(profile_request)
 
 
 # temp directory
 UPLOAD_DIR = "app/temp_uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-@app.post("app/temp_uploads")
+#uploads are written here first and moved into UPLOAD_DIR by their ingest job
+INCOMING_DIR = os.path.join(UPLOAD_DIR, ".incoming")
+os.makedirs(INCOMING_DIR, exist_ok=True)
+UPLOAD_CHUNK_BYTES = int(os.getenv("UPLOAD_CHUNK_BYTES", str(1024 * 1024)))
+
+#indexing runs on background workers, the upload request only waits for the bytes to hit disk
+INGEST_JOBS = IngestJobs(
+    index_file,
+    max_workers=int(os.getenv("INGEST_WORKERS", "2")),
+    max_pending=int(os.getenv("INGEST_MAX_PENDING", "16")),
+)
+METRICS.collect("rag_ingest_jobs", INGEST_JOBS.stats)
+
+async def save_upload(file: UploadFile, directory: str) -> str:
+    """
+    Copy an upload to a new file in `directory` chunk by chunk, the reads and writes off the event loop.
+    """
+    path = os.path.join(directory, f"{uuid.uuid4().hex}.part")
+    with open(path, "wb") as buffer:
+        while chunk := await file.read(UPLOAD_CHUNK_BYTES):
+            await asyncio.to_thread(buffer.write, chunk)
+    return path
+
+@app.post("/upload", status_code=202)
 async def upload_file(file: UploadFile = File(...)):
+    name = Path(file.filename or "").name
+    if not name:
+        raise HTTPException(status_code=400, detail="Upload needs a file name")
     try:
-        file_path = os.path.join(UPLOAD_DIR, file.filename)
-        with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-
-        retriever_instance.add_uploaded_docs([file_path])
-        return {"message": f"Successfully uploaded + indexed current data {file.filename}"}
+        staged = await save_upload(file, INCOMING_DIR)
     except Exception as e:
          raise HTTPException(status_code=500, detail=f"Upload Failed, try again or contact admin: {str(e)}")
+    try:
+        # no-op if this exact file was indexed before, only changed pages are re-indexed otherwise
+        job = INGEST_JOBS.submit(staged, os.path.join(UPLOAD_DIR, name))
+    except JobQueueFull as e:
+        os.unlink(staged)
+        raise HTTPException(status_code=503, detail=f"Indexing queue is full, retry shortly: {e}", headers={"Retry-After": "5"})
+    return {"message": f"Uploaded {name}, indexing in the background", **job}
+
+@app.get("/upload/{job_id}")
+async def upload_status(job_id: str):
+    """
+    Indexing progress of an upload: status (queued/running/done/failed), pages_done of pages_total, chunks.
+    """
+    job = INGEST_JOBS.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"no upload job {job_id}")
+    return job
 
 @app.get("/")
 async def home():
      return {"message": "API is online."}
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    #prometheus text format: node/llm/retriever/embedding histograms, cache and store gauges
+    return PlainTextResponse(METRICS.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 # add routers
 app.include_router(chat_router.router)
+app.include_router(history_router.router)
+app.include_router(assess_router.router)
@@ -0,0 +1,212 @@
+import asyncio
+import json
+import os
+import re
+import time
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from langchain_core.documents import Document
+from pydantic import BaseModel
+
+#module import
+from ragPipeline import rag
+from scripts.metrics import observe_llm, observe_retrieval
+from scripts.patient_store import normalize_term
+
+router = APIRouter()
+
+ASSESS_MAX_CONCURRENCY = int(os.getenv("ASSESS_MAX_CONCURRENCY", "8"))
+
+decision_prompt = (
+    "You are a clinical decision support assistant applying NICE NG12 (suspected cancer: recognition and referral). "
+    "Using only the guideline evidence below, assess the patient and reply with JSON only, no prose:\n"
+    '{{"decision": "urgent_referral" | "urgent_investigation" | "non_urgent_investigation" | "no_referral", '
+    '"rationale": "<one or two sentences>", "citations": [{{"source": "...", "page": <page>, "excerpt": "..."}}]}}\n\n'
+    "Patient:\n{patient}\n\nGuideline evidence:\n{evidence}"
+)
+
+#request
+class AssessRequest(BaseModel):
+    patient_id: str
+    #ask the llm for a written rationale even when an NG12 rule decides the case
+    narrative: bool = False
+
+class BatchAssessRequest(BaseModel):
+    patient_ids: List[str]
+    narrative: bool = False
+    #resume point from a previous run's progress line: every index below it is done
+    cursor: int = 0
+    max_concurrency: Optional[int] = None
+
+def symptom_signature(patient: dict) -> Tuple[str, ...]:
+    return tuple(sorted({normalize_term(s) for s in patient.get("symptoms") or []}))
+
+def guideline_query(signature: Tuple[str, ...]) -> str:
+    return f"NG12 suspected cancer referral criteria for {', '.join(signature) or 'no reported symptoms'}"
+
+def format_evidence(docs: List[Document]) -> str:
+    return "\n\n".join(
+        f"[source: {d.metadata.get('source', 'NG12')}, page: {d.metadata.get('page', '?')}]\n{d.page_content}" for d in docs
+    )
+
+def parse_decision(content: str, docs: List[Document]) -> dict:
+    """
+    The model's JSON decision; if it didn't return valid JSON keep the text and cite the evidence used.
+    """
+    match = re.search(r"\{.*\}", content, re.S)
+    if match:
+        try:
+            decision = json.loads(match.group(0))
+            if isinstance(decision, dict) and "decision" in decision:
+                return decision
+        except json.JSONDecodeError:
+            pass
+    return {
+        "decision": "unparsed",
+        "rationale": content.strip(),
+        "citations": [
+            {"source": d.metadata.get("source"), "page": d.metadata.get("page"), "excerpt": d.page_content[:200]} for d in docs
+        ],
+    }
+
+def rule_decision(patient: dict) -> Optional[dict]:
+    """
+    Decision from the compiled NG12 rule table, None when no recommendation matches or a symptom
+    isn't covered by a cleanly compiled term (retrieval + the llm decide those).
+    """
+    if not rag.RULE_FAST_PATH or not rag.RULE_TABLE.covers(patient):
+        return None
+    return rag.RULE_TABLE.evaluate(patient)
+
+def rule_documents(decision: dict) -> List[Document]:
+    """
+    The matched recommendations as evidence, so a narrative request needs no retrieval.
+    """
+    return [
+        Document(page_content=c["excerpt"], metadata={"source": c["source"], "page": c["page"]})
+        for c in decision["citations"]
+    ]
+
+async def retrieve_guideline_evidence(signature: Tuple[str, ...]) -> List[Document]:
+    start = time.perf_counter()
+    docs = await rag.retriever.ainvoke(guideline_query(signature))
+    observe_retrieval("assess", start, docs)
+    return docs
+
+async def decide(patient: dict, docs: List[Document]) -> dict:
+    prompt = decision_prompt.format(patient=json.dumps(patient), evidence=format_evidence(docs))
+    start = time.perf_counter()
+    response = await rag.llm.ainvoke(prompt)
+    observe_llm("assess", start, prompt, response)
+    return {**parse_decision(response.content, docs), "decided_by": "llm"}
+
+async def narrate(patient: dict, decision: dict) -> dict:
+    """
+    LLM rationale over the matched recommendations; the rule table's decision and citations stand.
+    """
+    written = await decide(patient, rule_documents(decision))
+    return {**decision, "rationale": written.get("rationale", decision["rationale"])}
+
+@router.post("/assess")
+async def assess_endpoint(request: AssessRequest):
+    """
+    get_patient -> NG12 rule table -> structured decision JSON. Only patients no rule matches (or
+    narrative requests) go through retrieve_guideline_evidence and the llm.
+    """
+    patient = rag.PATIENT_STORE.get(request.patient_id)
+    if patient is None:
+        raise HTTPException(status_code=404, detail=f"Unknown patient_id {request.patient_id}")
+    try:
+        decision = rule_decision(patient)
+        if decision is not None:
+            if request.narrative:
+                decision = await narrate(patient, decision)
+            return {"patient_id": request.patient_id, **decision}
+        docs = await retrieve_guideline_evidence(symptom_signature(patient))
+        return {"patient_id": request.patient_id, **await decide(patient, docs)}
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+async def assess_batch(request: BatchAssessRequest, progress_every: int = 10) -> AsyncIterator[dict]:
+    """
+    Assess patient_ids[cursor:], yielding result / error / progress events as they complete.
+
+    Patients an NG12 rule decides are answered from the rule table. The rest are grouped by symptom
+    signature and each distinct guideline retrieval runs once, shared by every patient in the group.
+    LLM decisions run `max_concurrency` at a time. Results arrive out of order; every result and
+    error event carries the cursor, the lowest index not finished yet, so a client cut off at any
+    point resumes from the last one it read without missing a patient (a few past it may be assessed
+    twice). Progress events with counters follow every `progress_every` results.
+    """
+    total = len(request.patient_ids)
+    concurrency = max(1, min(request.max_concurrency or ASSESS_MAX_CONCURRENCY, ASSESS_MAX_CONCURRENCY))
+    start = min(max(request.cursor, 0), total)
+    evidence: Dict[Tuple[str, ...], asyncio.Task] = {}
+    pending = asyncio.Queue()
+    for index in range(start, total):
+        pending.put_nowait(index)
+    results: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 4)
+    by_rule = 0
+
+    async def assess_one(index: int) -> dict:
+        nonlocal by_rule
+        patient_id = request.patient_ids[index]
+        patient = rag.PATIENT_STORE.get(patient_id)
+        if patient is None:
+            return {"type": "error", "index": index, "patient_id": patient_id, "detail": "unknown patient_id"}
+        decision = rule_decision(patient)
+        if decision is not None:
+            by_rule += 1
+            if request.narrative:
+                decision = await narrate(patient, decision)
+            return {"type": "result", "index": index, "patient_id": patient_id, "decision": decision}
+        signature = symptom_signature(patient)
+        if signature not in evidence:
+            #first patient with this signature starts the retrieval, the rest of the group awaits it
+            evidence[signature] = asyncio.ensure_future(retrieve_guideline_evidence(signature))
+        docs = await evidence[signature]
+        return {"type": "result", "index": index, "patient_id": patient_id, "decision": await decide(patient, docs)}
+
+    async def worker() -> None:
+        while not pending.empty():
+            index = pending.get_nowait()
+            try:
+                event = await assess_one(index)
+            except Exception as e:
+                event = {"type": "error", "index": index, "patient_id": request.patient_ids[index], "detail": str(e)}
+            await results.put(event)
+
+    workers = [asyncio.ensure_future(worker()) for _ in range(concurrency)]
+    finished, done, cursor = set(), 0, start
+    try:
+        for _ in range(start, total):
+            event = await results.get()
+            finished.add(event["index"])
+            while cursor in finished:
+                finished.discard(cursor)
+                cursor += 1
+            done += 1
+            yield {**event, "cursor": cursor}
+            if done % progress_every == 0 or cursor == total:
+                yield {"type": "progress", "done": start + done, "total": total, "cursor": cursor,
+                       "retrievals": len(evidence), "rule_decisions": by_rule}
+        if start == total:
+            yield {"type": "progress", "done": total, "total": total, "cursor": total, "retrievals": 0, "rule_decisions": 0}
+    finally:
+        for w in workers:
+            w.cancel()
+        for task in evidence.values():
+            task.cancel()
+
+@router.post("/assess/batch")
+async def assess_batch_endpoint(request: BatchAssessRequest):
+    """
+    Newline-delimited JSON stream of per-patient results, each with the resume cursor, plus progress lines.
+    """
+    async def body():
+        async for event in assess_batch(request):
+            yield json.dumps(event) + "\n"
+    return StreamingResponse(body(), media_type="application/x-ndjson")
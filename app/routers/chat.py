@@ -1,34 +1,148 @@
-from fastapi import APIRouter, HTTPException
-from pydantic import BaseModel
-from typing import List, Optional
+import json
+import uuid
+
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, ValidationError
+from typing import AsyncIterator, List, Optional, Tuple
 
 #module import
 
-from scripts.model import llm
-from langchain_core.messages import HumanMessage, AIMessage
+from langchain_core.messages import HumanMessage, AIMessage, AIMessageChunk
+from ragPipeline.rag import graph, memory
+from ragPipeline.checkpointer import session_config
 router = APIRouter()
 
 #request
 class ChatRequest(BaseModel):
     message: str
     history: Optional[List[dict]] = []
+    #continue a server-side conversation: history is then only needed if the session expired
+    session_id: Optional[str] = None
 
 class ChatResponse(BaseModel):
     reply: str
-@router.post("app/routers/chat.py", response_model=ChatResponse)
+    #"continued", "restored" (expired, rebuilt from history) or "new"; None without a session_id
+    session: Optional[str] = None
+
+def format_messages(request: ChatRequest) -> list:
+    #prepare messages including history for content
+    formatted_messages = []
+    for m in request.history:
+        if m["role"] == "user":
+            formatted_messages.append(HumanMessage(content=m["content"]))
+        elif m["role"] == "assistant":
+            formatted_messages.append(AIMessage(content=m["content"]))
+
+    #add current message
+    formatted_messages.append(HumanMessage(content=request.message))
+    return formatted_messages
+
+async def thread_input(request: ChatRequest) -> Tuple[dict, list, bool, Optional[str]]:
+    """
+    (config, messages, ephemeral, session) for one call. A session keeps its messages in its checkpoint
+    thread, so only the new message is sent unless the thread was evicted; then it is rebuilt from
+    request.history ("restored"), or starts over ("new") and the client is told so. Without a session
+    the history comes with the request and the call gets a throwaway thread, deleted once it finishes.
+    """
+    if request.session_id:
+        config = session_config(request.session_id)
+        if (await graph.aget_state(config)).values.get("messages"):
+            return config, [HumanMessage(content=request.message)], False, "continued"
+        return config, format_messages(request), False, "restored" if request.history else "new"
+    return {"configurable": {"thread_id": uuid.uuid4().hex}}, format_messages(request), True, None
+
+@router.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(request: ChatRequest):
+    config, messages, ephemeral, session = await thread_input(request)
     try:
-        #prepare messages including history for content
-        formatted_messages = []
-        for m in request.history:
-            if m["role"] == "user":
-                formatted_messages.append(HumanMessage(content=m["content"]))
-            elif m["role"] == "assistant":
-                formatted_messages.append(AIMessage(content=m["content"]))
-
-        #add current message
-        formatted_messages.append(HumanMessage(content=request.message))
-        response = await llm.invoke(formatted_messages)
-        return ChatResponse(reply=response.content)
+        #run the rag graph on the event loop, llm waits of concurrent chats overlap
+        result = await graph.ainvoke({"messages": messages}, config=config)
+        return ChatResponse(reply=result["messages"][-1].content, session=session)
     except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        if ephemeral:
+            await memory.adelete_thread(config["configurable"]["thread_id"])
+
+
+async def stream_chat(request: ChatRequest) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    Run the rag graph and yield (event, data) as it goes:
+      token      {"text"}  a piece of the generate answer, as the llm produces it
+      review     {"issues_detected"}  compliance check (local screen or llm) on the buffered answer finished
+      correction {"text"}  doc_finalizer revised the answer, replaces everything streamed so far
+      done       {"reply", "cache_hit", "issues_detected", "session"}
+      error      {"detail"}
+    """
+    streamed, final, cache_hit, issues_detected = [], "", False, False
+    config, messages, ephemeral, session = await thread_input(request)
+    try:
+        async for mode, payload in graph.astream(
+            {"messages": messages},
+            config=config,
+            stream_mode=["messages", "updates"],
+        ):
+            if mode == "messages":
+                chunk, metadata = payload
+                #only stream the answer, not the review/revision calls
+                if metadata.get("langgraph_node") == "generate" and isinstance(chunk, AIMessageChunk) and chunk.content:
+                    streamed.append(chunk.content)
+                    yield "token", {"text": chunk.content}
+                continue
+            for node, update in payload.items():
+                if not update:
+                    continue
+                if node == "check_cache" and update.get("cache_hit"):
+                    #cached answers were already reviewed, send them whole
+                    cache_hit, issues_detected = True, bool(update["issues_detected"])
+                    final = update["messages"][-1].content
+                    yield "token", {"text": final}
+                elif node == "phi_screen" and not update["phi_flagged"]:
+                    #passed the local screen, no llm review
+                    yield "review", {"issues_detected": False}
+                elif node == "double_check":
+                    issues_detected = bool(update["issues_detected"])
+                    yield "review", {"issues_detected": issues_detected}
+                elif node == "doc_finalizer":
+                    final = update["messages"][-1].content
+                    if final != "".join(streamed):
+                        yield "correction", {"text": final}
+        yield "done", {"reply": final, "cache_hit": cache_hit, "issues_detected": issues_detected, "session": session}
+    except Exception as e:
+        yield "error", {"detail": str(e)}
+    finally:
+        if ephemeral:
+            await memory.adelete_thread(config["configurable"]["thread_id"])
+
+def format_sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatRequest):
+    """
+    Server-sent events version of /chat, see stream_chat for the events.
+    """
+    async def body():
+        async for event, data in stream_chat(request):
+            yield format_sse(event, data)
+    return StreamingResponse(body(), media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket):
+    """
+    WebSocket version of /chat/stream: send ChatRequest json, receive {"event": ..., **data} messages.
+    Several questions can go over one connection.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                request = ChatRequest(**await websocket.receive_json())
+            except (ValidationError, TypeError, ValueError) as e:
+                await websocket.send_json({"event": "error", "detail": str(e)})
+                continue
+            async for event, data in stream_chat(request):
+                await websocket.send_json({"event": event, **data})
+    except WebSocketDisconnect:
+        pass
@@ -0,0 +1,41 @@
+import uuid
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from typing import List, Optional
+
+#module import
+
+from langchain_core.messages import AIMessage, HumanMessage
+from ragPipeline.checkpointer import session_config
+from ragPipeline.rag import graph, memory
+router = APIRouter()
+
+class SessionHistory(BaseModel):
+    session_id: str
+    summary: Optional[str] = ""
+    messages: List[dict] = []
+
+@router.post("/sessions", response_model=SessionHistory)
+async def create_session():
+    #ids are only names for checkpoint threads, the thread appears with the first /chat call
+    return SessionHistory(session_id=uuid.uuid4().hex)
+
+@router.get("/sessions/{session_id}", response_model=SessionHistory)
+async def get_session(session_id: str):
+    """
+    What the server keeps for a session: the rolling summary and the recent turns.
+    """
+    values = (await graph.aget_state(session_config(session_id))).values
+    if not values.get("messages"):
+        raise HTTPException(status_code=404, detail=f"no session {session_id} (never used or expired)")
+    messages = [
+        {"role": "user" if isinstance(m, HumanMessage) else "assistant", "content": m.content}
+        for m in values["messages"] if isinstance(m, (HumanMessage, AIMessage))
+    ]
+    return SessionHistory(session_id=session_id, summary=values.get("summary", ""), messages=messages)
+
+@router.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    await memory.adelete_thread(session_config(session_id)["configurable"]["thread_id"])
+    return {"session_id": session_id, "deleted": True}
@@ -0,0 +1,98 @@
+"""
+IVF index vs exact scan: query latency and recall@k against the exact top k, per nprobe, on
+synthetic clustered unit vectors (a mixture of gaussians standing in for guideline + requisition
+chunks; queries are perturbed corpus rows, like paraphrased questions). Also reports training time
+and the cost of an incremental insert of 1% new rows. 1M rows of 768-d float32 is 3 GB, pass a
+smaller --dim on small machines; latency scales with dim for both methods.
+
+    python -m benchmarks.bench_ann --sizes 10000 100000 1000000 --dim 128
+"""
+import argparse
+import json
+import statistics
+import time
+
+import numpy as np
+
+from scripts.ann_index import IVFIndex
+from scripts.mmr import top_k
+
+
+def clustered(count: int, dim: int, clusters: int, rng: np.random.Generator, spread: float = 0.6) -> np.ndarray:
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    matrix = np.empty((count, dim), dtype=np.float32)
+    block = 100_000
+    for start in range(0, count, block):
+        n = min(block, count - start)
+        rows = centers[rng.integers(0, clusters, n)] + spread * rng.standard_normal((n, dim), dtype=np.float32)
+        matrix[start:start + n] = rows / np.linalg.norm(rows, axis=1, keepdims=True)
+    return matrix
+
+
+def _timed_ms(fn):
+    start = time.perf_counter()
+    out = fn()
+    return out, (time.perf_counter() - start) * 1000
+
+
+def run_size(count: int, dim: int, queries: int, k: int, nprobes: list, rng: np.random.Generator) -> dict:
+    matrix = clustered(count, dim, clusters=max(16, count // 500), rng=rng)
+    picks = rng.integers(0, count, queries)
+    noise = 0.3 * rng.standard_normal((queries, dim), dtype=np.float32) / np.sqrt(dim)
+    qs = matrix[picks] + noise
+    qs /= np.linalg.norm(qs, axis=1, keepdims=True)
+
+    exact, exact_ms = [], []
+    for q in qs:
+        rows, ms = _timed_ms(lambda: top_k(matrix @ q, k))
+        exact.append(set(rows.tolist()))
+        exact_ms.append(ms)
+
+    index, train_ms = _timed_ms(lambda: IVFIndex.train(matrix))
+    result = {
+        "rows": count,
+        "nlist": index.nlist,
+        "train_ms": round(train_ms, 1),
+        "exact_p50_ms": round(statistics.median(exact_ms), 3),
+        "ivf": [],
+    }
+    index.search(matrix, qs[0], k, 1)
+    for nprobe in nprobes:
+        latencies, found = [], 0
+        for q, truth in zip(qs, exact):
+            (rows, _), ms = _timed_ms(lambda: index.search(matrix, q, k, nprobe))
+            latencies.append(ms)
+            found += len(truth & set(rows.tolist()))
+        p50 = statistics.median(latencies)
+        result["ivf"].append({
+            "nprobe": nprobe,
+            "p50_ms": round(p50, 3),
+            f"recall@{k}": round(found / (k * queries), 3),
+            "speedup": round(result["exact_p50_ms"] / p50, 1),
+        })
+    #what a publish pays for 1% new rows without retraining
+    new = clustered(max(1, count // 100), dim, clusters=16, rng=rng)
+    _, insert_ms = _timed_ms(lambda: index.updated(np.arange(count), new))
+    result["insert_1pct_ms"] = round(insert_ms, 1)
+    return result
+
+
+def run(sizes: list, dim: int, queries: int, k: int, nprobes: list, seed: int) -> dict:
+    rng = np.random.default_rng(seed)
+    result = {"dim": dim, "queries": queries, "k": k, "sizes": []}
+    for count in sizes:
+        result["sizes"].append(run_size(count, dim, queries, k, nprobes, rng))
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dim", type=int, default=128, help="768 matches text-embedding-004")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32, 64])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.queries, args.k, args.nprobe, args.seed)
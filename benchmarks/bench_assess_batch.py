@@ -0,0 +1,112 @@
+"""
+POST /assess/batch against one /assess call per patient (same concurrency), offline: synthetic
+patients, a guideline retriever with simulated latency and SlowFakeChatModel. Also checks that a
+batch interrupted part way and resumed from the last cursor it read covers every patient.
+
+    python -m benchmarks.bench_assess_batch --patients 500 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import tempfile
+import time
+from pathlib import Path
+from typing import List
+
+from langchain_core.documents import Document
+
+import ragPipeline.rag as rag
+from app.routers import assess
+from benchmarks.bench_chat_concurrency import NG12_CHUNKS, StaticRetriever
+from benchmarks.bench_patient_store import write_patients
+from scripts.fakes import SlowFakeChatModel
+from scripts.patient_store import PatientStore
+
+DECISION = json.dumps({"decision": "urgent_referral", "rationale": "Meets NG12 1.1.1.", "citations": []})
+
+
+class SlowCountingRetriever(StaticRetriever):
+    latency_s: float = 0.05
+    calls: int = 0
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        self.calls += 1
+        await asyncio.sleep(self.latency_s)
+        return NG12_CHUNKS
+
+
+async def _per_patient(ids: List[str], concurrency: int) -> None:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(pid: str) -> None:
+        async with slots:
+            await assess.assess_endpoint(assess.AssessRequest(patient_id=pid))
+
+    await asyncio.gather(*(one(pid) for pid in ids))
+
+
+async def _batch(ids: List[str], concurrency: int, cursor: int = 0, stop_after: int = 0) -> dict:
+    seen, last_cursor = set(), cursor
+    request = assess.BatchAssessRequest(patient_ids=ids, cursor=cursor, max_concurrency=concurrency)
+    events = assess.assess_batch(request)
+    async for event in events:
+        last_cursor = event["cursor"]
+        if event["type"] != "progress":
+            seen.add(event["index"])
+        if stop_after and len(seen) >= stop_after:
+            await events.aclose()
+            break
+    return {"seen": seen, "cursor": last_cursor}
+
+
+def _reset(latency_ms: float, retrieval_ms: float) -> SlowCountingRetriever:
+    #measures retrieval sharing on the llm path, see bench_ng12_rules for the rule table
+    rag.RULE_FAST_PATH = False
+    rag.llm = SlowFakeChatModel(latency_s=latency_ms / 1000, reply=DECISION)
+    rag.retriever = SlowCountingRetriever(latency_s=retrieval_ms / 1000)
+    return rag.retriever
+
+
+async def run(n: int, concurrency: int, latency_ms: float, retrieval_ms: float) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        source = Path(work) / "patients.jsonl"
+        write_patients(source, n)
+        rag.PATIENT_STORE = PatientStore(str(Path(work) / "store"))
+        rag.PATIENT_STORE.build(str(source))
+        ids = [f"PT-{100000 + i}" for i in range(n)]
+
+        retriever = _reset(latency_ms, retrieval_ms)
+        start = time.perf_counter()
+        await _per_patient(ids, concurrency)
+        per_patient = {"seconds": round(time.perf_counter() - start, 2), "retrievals": retriever.calls, "llm_calls": rag.llm.calls}
+
+        retriever = _reset(latency_ms, retrieval_ms)
+        start = time.perf_counter()
+        full = await _batch(ids, concurrency)
+        batch = {"seconds": round(time.perf_counter() - start, 2), "retrievals": retriever.calls, "llm_calls": rag.llm.calls}
+        assert full["seen"] == set(range(n)) and full["cursor"] == n
+
+        _reset(latency_ms, retrieval_ms)
+        first = await _batch(ids, concurrency, stop_after=n // 3)
+        rest = await _batch(ids, concurrency, cursor=first["cursor"])
+        assert first["seen"] | rest["seen"] == set(range(n))
+
+    result = {
+        "patients": n,
+        "concurrency": concurrency,
+        "per_patient": per_patient,
+        "batch": batch,
+        "resume": {"interrupted_at": len(first["seen"]), "cursor": first["cursor"], "reassessed": len(first["seen"] & rest["seen"])},
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--retrieval-ms", type=float, default=50)
+    args = parser.parse_args()
+    asyncio.run(run(args.patients, args.concurrency, args.latency_ms, args.retrieval_ms))
@@ -0,0 +1,97 @@
+"""
+Chat throughput vs concurrency with the LLM stubbed by SlowFakeChatModel (fixed latency per call):
+the async /chat route (graph.ainvoke) against the old pattern of running the graph synchronously
+inside the async handler, which holds the event loop for every LLM round trip.
+
+    python -m benchmarks.bench_chat_concurrency --latency-ms 200 --concurrency 1 4 16 64
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.messages import HumanMessage
+from langchain_core.retrievers import BaseRetriever
+
+import ragPipeline.rag as rag
+from app.routers import chat
+from scripts.fakes import SlowFakeChatModel
+
+NG12_CHUNKS = [
+    Document(id="ng12-p3-0", page_content="Refer people using a suspected cancer pathway referral for lung cancer if they are aged 40 and over with unexplained haemoptysis."),
+    Document(id="ng12-p3-1", page_content="Offer an urgent chest X-ray to people aged 40 and over with persistent cough, fatigue or shortness of breath who have ever smoked."),
+]
+
+
+class StaticRetriever(BaseRetriever):
+    """
+    Returns the same chunks for every question, so the run measures the LLM waits only.
+    """
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        return NG12_CHUNKS
+
+
+def build_app() -> FastAPI:
+    app = FastAPI()
+    app.include_router(chat.router)
+
+    @app.post("/chat_blocking", response_model=chat.ChatResponse)
+    async def chat_blocking(request: chat.ChatRequest):
+        # the previous behaviour: sync llm calls on the event loop
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        result = rag.graph.invoke({"messages": [HumanMessage(request.message)]}, config=config)
+        return chat.ChatResponse(reply=result["messages"][-1].content)
+
+    return app
+
+
+async def _drive(client: httpx.AsyncClient, path: str, concurrency: int, requests: int) -> float:
+    slots = asyncio.Semaphore(concurrency)
+
+    async def one(i: int) -> None:
+        async with slots:
+            # unique questions so the answer cache never short-circuits the graph
+            response = await client.post(path, json={"message": f"referral for haemoptysis, patient {i} {uuid.uuid4().hex}"})
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    return time.perf_counter() - start
+
+
+async def run(latency_ms: float, levels: List[int], requests_per_level: int) -> dict:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rag.llm = SlowFakeChatModel(latency_s=latency_ms / 1000)
+    rag.retriever = StaticRetriever()
+    transport = httpx.ASGITransport(app=build_app())
+    result = {"latency_ms": latency_ms, "levels": []}
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        for concurrency in levels:
+            requests = max(requests_per_level, concurrency)
+            row = {"concurrency": concurrency, "requests": requests}
+            for name, path in (("async", "/chat"), ("blocking", "/chat_blocking")):
+                seconds = await _drive(client, path, concurrency, requests)
+                row[name] = {"seconds": round(seconds, 3), "req_per_s": round(requests / seconds, 2)}
+            result["levels"].append(row)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--latency-ms", type=float, default=200)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=16, help="requests per concurrency level (at least the level itself)")
+    args = parser.parse_args()
+    asyncio.run(run(args.latency_ms, args.concurrency, args.requests))
@@ -0,0 +1,97 @@
+"""
+Per-turn cost of a long conversation through POST /chat (SlowFakeChatModel, static retriever):
+the client resending its whole history every turn against a server-side session (session_id + the
+new message only). Reports request bytes, prompt tokens sent to the llm, messages held in the
+checkpoint thread and summary compactions, early vs late in the conversation.
+
+    python -m benchmarks.bench_chat_history --turns 200
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import uuid
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.messages import BaseMessage
+
+import ragPipeline.rag as rag
+from app.routers import chat
+from benchmarks.bench_chat_concurrency import StaticRetriever
+from ragPipeline.checkpointer import session_config
+from ragPipeline.context import estimate_tokens
+from scripts.fakes import SlowFakeChatModel
+
+
+class CountingChatModel(SlowFakeChatModel):
+    """
+    SlowFakeChatModel that records the prompt size of every call.
+    """
+
+    prompt_tokens: List[int] = []
+
+    def _respond(self, messages: List[BaseMessage]) -> List[str]:
+        self.prompt_tokens.append(sum(estimate_tokens(str(m.content)) for m in messages))
+        return super()._respond(messages)
+
+
+def _window(values: List[float], turns: int) -> dict:
+    tenth = max(1, turns // 10)
+    return {"first_10pct": round(sum(values[:tenth]) / tenth, 1), "last_10pct": round(sum(values[-tenth:]) / tenth, 1)}
+
+
+async def _conversation(client: httpx.AsyncClient, turns: int, server_side: bool) -> dict:
+    rag.llm = CountingChatModel(latency_s=0, reply="Refer using a suspected cancer pathway referral for lung cancer (NG12 1.1.1).")
+    rag.llm.prompt_tokens = []
+    session_id, history = uuid.uuid4().hex, []
+    request_bytes, prompt_tokens, latency_ms = [], [], []
+    for turn in range(turns):
+        #unique questions so the answer cache never short-circuits the graph
+        message = f"turn {turn}: patient aged 5{turn % 10} with haemoptysis, what next? {uuid.uuid4().hex[:8]}"
+        payload = {"message": message, "session_id": session_id} if server_side else {"message": message, "history": history}
+        body = json.dumps(payload)
+        calls = len(rag.llm.prompt_tokens)
+        start = time.perf_counter()
+        response = await client.post("/chat", content=body, headers={"content-type": "application/json"})
+        response.raise_for_status()
+        latency_ms.append((time.perf_counter() - start) * 1000)
+        request_bytes.append(len(body))
+        prompt_tokens.append(sum(rag.llm.prompt_tokens[calls:]))
+        history += [{"role": "user", "content": message}, {"role": "assistant", "content": response.json()["reply"]}]
+    thread = (await rag.graph.aget_state(session_config(session_id))).values if server_side else {}
+    return {
+        "request_bytes": _window(request_bytes, turns),
+        "llm_prompt_tokens_per_turn": _window(prompt_tokens, turns),
+        "latency_ms": _window(latency_ms, turns),
+        "thread_messages": len(thread.get("messages", [])),
+        "summary_chars": len(thread.get("summary", "")),
+    }
+
+
+async def run(turns: int, window: int) -> dict:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    rag.CONVERSATION.window = window
+    rag.retriever = StaticRetriever()
+    app = FastAPI()
+    app.include_router(chat.router)
+    result = {"turns": turns, "window": window}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        result["resend_history"] = await _conversation(client, turns, server_side=False)
+        result["server_session"] = await _conversation(client, turns, server_side=True)
+    result["conversation"] = rag.CONVERSATION.stats()
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--window", type=int, default=8, help="messages kept verbatim")
+    args = parser.parse_args()
+    asyncio.run(run(args.turns, args.window))
@@ -0,0 +1,74 @@
+"""
+Time to first token of the streamed chat (the event source behind /chat/stream and /chat/ws) vs time
+to the full reply of /chat, LLM stubbed by SlowFakeChatModel (first-token latency + per-word latency).
+Measured at the route handlers, in-process test transports buffer streamed bodies.
+
+    python -m benchmarks.bench_chat_ttft --first-token-ms 400 --token-ms 15 --words 300
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import ragPipeline.rag as rag
+from app.routers import chat
+from benchmarks.bench_chat_concurrency import StaticRetriever
+from scripts.fakes import SlowFakeChatModel
+
+
+def _request() -> chat.ChatRequest:
+    # unique questions so the answer cache never short-circuits the graph
+    return chat.ChatRequest(message=f"referral for haemoptysis {uuid.uuid4().hex}")
+
+
+async def _blocking_reply() -> float:
+    start = time.perf_counter()
+    await chat.chat_endpoint(_request())
+    return time.perf_counter() - start
+
+
+async def _streamed_reply() -> dict:
+    start = time.perf_counter()
+    first_token = None
+    async for event, data in chat.stream_chat(_request()):
+        if event == "token" and first_token is None:
+            first_token = time.perf_counter() - start
+        elif event == "error":
+            raise RuntimeError(data["detail"])
+    return {"ttft": first_token, "total": time.perf_counter() - start}
+
+
+async def run(first_token_ms: float, token_ms: float, words: int, rounds: int) -> dict:
+    rag.llm = SlowFakeChatModel(
+        latency_s=first_token_ms / 1000,
+        token_latency_s=token_ms / 1000,
+        reply=" ".join(f"word{i}" for i in range(words)),
+    )
+    rag.retriever = StaticRetriever()
+    blocking, streamed = [], []
+    for _ in range(rounds):
+        blocking.append(await _blocking_reply())
+        streamed.append(await _streamed_reply())
+    ms = lambda values: round(statistics.median(values) * 1000, 1)
+    result = {
+        "first_token_ms": first_token_ms,
+        "token_ms": token_ms,
+        "words": words,
+        "chat_reply_ms": ms(blocking),
+        "stream_first_token_ms": ms([s["ttft"] for s in streamed]),
+        "stream_total_ms": ms([s["total"] for s in streamed]),
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--first-token-ms", type=float, default=400)
+    parser.add_argument("--token-ms", type=float, default=15)
+    parser.add_argument("--words", type=int, default=300)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+    asyncio.run(run(args.first_token_ms, args.token_ms, args.words, args.rounds))
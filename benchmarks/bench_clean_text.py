@@ -0,0 +1,121 @@
+"""
+clean_pdf_text: golden-output equivalence + throughput (pages/sec) against the original
+fixpoint-regex implementation, kept below as the reference.
+
+    python -m benchmarks.bench_clean_text               # verify golden corpus + benchmark
+    python -m benchmarks.bench_clean_text --regenerate  # rebuild the corpus from NG12 with the reference
+
+Exits non-zero if any page differs from its golden output.
+"""
+import argparse
+import json
+import re
+import sys
+import time
+from pathlib import Path
+
+from pypdf import PdfReader
+
+from scripts.document_loader import (
+    _COMMON_WORDS,
+    _HYPHEN_LINEBREAK,
+    _LINEBREAK,
+    _SPACE_AFTER_DOT,
+    _SPACE_AFTER_OPEN,
+    _SPACE_BEFORE_DOT,
+    _SPACE_BEFORE_PUNCT,
+    _WS,
+    clean_pdf_text,
+)
+
+GOLDEN_PATH = Path("data/golden/clean_pdf_text_ng12.json")
+NG12_PATH = "data/NG12_pdf.pdf"
+
+_SINGLE_LETTER_PREFIX = re.compile(r"(?i)\b([a-z])\s+([a-z]{2,})\b")
+_SINGLE_LETTER_SUFFIX = re.compile(r"(?i)\b([a-z]{2,})\s+([a-z])\b")
+_TWO_LETTER_SUFFIX = re.compile(r"(?i)\b([a-z]{4,})\s+([a-z]{1,2})\b")
+_MIDWORD_CANDIDATE = re.compile(r"\b([A-Za-z]{3,})\s+([A-Za-z]{3,})\b")
+
+
+def reference_clean_pdf_text(text: str) -> str:
+    text = text.replace("\x00", "")
+    text = _HYPHEN_LINEBREAK.sub(r"\1\2", text)
+    text = _LINEBREAK.sub("\n", text)
+    text = _WS.sub(" ", text)
+
+    for _ in range(6):
+        new_text = text
+        new_text = _SINGLE_LETTER_PREFIX.sub(r"\1\2", new_text)
+        new_text = _SINGLE_LETTER_SUFFIX.sub(r"\1\2", new_text)
+        new_text = _TWO_LETTER_SUFFIX.sub(r"\1\2", new_text)
+
+        def _join(m):
+            a, b = m.group(1), m.group(2)
+            if a.lower() in _COMMON_WORDS:
+                return m.group(0)
+            if a[0].isupper() and b[0].islower():
+                return m.group(0)
+            if b.lower() in _COMMON_WORDS:
+                return m.group(0)
+            if len(a) + len(b) < 8:
+                return m.group(0)
+            return a + b
+
+        new_text2 = _MIDWORD_CANDIDATE.sub(_join, new_text)
+        if new_text2 == text:
+            break
+        text = new_text2
+
+    text = _SPACE_AFTER_OPEN.sub(r"\1", text)
+    text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
+    text = _SPACE_BEFORE_DOT.sub(".", text)
+    text = _SPACE_AFTER_DOT.sub(". ", text)
+    text = _WS.sub(" ", text)
+    return text.strip()
+
+
+def regenerate() -> None:
+    reader = PdfReader(NG12_PATH)
+    corpus = []
+    for page, pdf_page in enumerate(reader.pages):
+        raw = pdf_page.extract_text() or ""
+        corpus.append({"page": page, "raw": raw, "cleaned": reference_clean_pdf_text(raw)})
+    GOLDEN_PATH.parent.mkdir(parents=True, exist_ok=True)
+    GOLDEN_PATH.write_text(json.dumps(corpus, ensure_ascii=False, indent=1))
+    print(f"wrote {len(corpus)} golden pages to {GOLDEN_PATH}")
+
+
+def _pages_per_sec(fn, pages, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for raw in pages:
+            fn(raw)
+    return repeat * len(pages) / (time.perf_counter() - start)
+
+
+def main(repeat: int) -> int:
+    corpus = json.loads(GOLDEN_PATH.read_text())
+    mismatches = [entry["page"] for entry in corpus if clean_pdf_text(entry["raw"]) != entry["cleaned"]]
+    pages = [entry["raw"] for entry in corpus]
+    whole_doc = "\n".join(pages)
+
+    result = {
+        "golden_pages": len(corpus),
+        "mismatched_pages": mismatches,
+        "reference_pages_per_sec": _pages_per_sec(reference_clean_pdf_text, pages, repeat),
+        "clean_pdf_text_pages_per_sec": _pages_per_sec(clean_pdf_text, pages, repeat),
+        "reference_whole_doc_ms": _pages_per_sec(reference_clean_pdf_text, [whole_doc], 1) ** -1 * 1000,
+        "clean_pdf_text_whole_doc_ms": _pages_per_sec(clean_pdf_text, [whole_doc], 1) ** -1 * 1000,
+    }
+    print(json.dumps(result, indent=2))
+    return 1 if mismatches else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--regenerate", action="store_true")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.regenerate:
+        regenerate()
+    sys.exit(main(args.repeat))
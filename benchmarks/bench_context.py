@@ -0,0 +1,84 @@
+"""
+Prompt context size before/after ContextAssembler, offline: NG12 split exactly as ingestion does,
+top-k chunks per question from the BM25 index (optionally with a second copy of the guideline
+indexed under another name, as a re-upload would), then the plain join generate used to send
+against the assembled context.
+
+    python -m benchmarks.bench_context --pdf data/NG12_pdf.pdf --k 4 8 --duplicate-upload
+"""
+import argparse
+import json
+import time
+
+from langchain_core.documents import Document
+
+from ragPipeline.context import ContextAssembler, estimate_tokens
+from scripts.document_loader import split_documents
+from scripts.ingest_manifest import chunk_id
+from scripts.lexical_index import InvertedIndex
+from scripts.ng12_rules import guideline_pages
+
+QUESTIONS = [
+    "When should a patient with haemoptysis be referred for lung cancer?",
+    "What are the criteria for an urgent chest X-ray?",
+    "Which patients with dysphagia need a suspected cancer pathway referral?",
+    "When is FIT testing offered for colorectal cancer?",
+    "What are the referral criteria for breast cancer in people aged 30 and over?",
+    "When should visible haematuria be referred for bladder cancer?",
+    "What does NG12 recommend for persistent hoarseness?",
+    "When should a very urgent full blood count be offered for leukaemia?",
+    "What are the recommendations for unexplained weight loss?",
+    "When should post-menopausal bleeding be referred?",
+    "What safety netting does NG12 recommend?",
+    "Which symptoms suggest pancreatic cancer in people aged 60 and over?",
+]
+
+
+def _index(pdf: str, duplicate_upload: bool) -> InvertedIndex:
+    pages = guideline_pages(pdf)
+    if duplicate_upload:
+        pages += [Document(page_content=p.page_content, metadata={**p.metadata, "source": "uploads/NG12 (1).pdf"})
+                  for p in pages]
+    chunks = split_documents(pages)
+    index = InvertedIndex()
+    for i, c in enumerate(chunks):
+        c.id = chunk_id(c.metadata["source"], c.metadata["page"], c.page_content, occurrence=i)
+    index.add_documents(chunks)
+    return index
+
+
+def run(pdf: str, ks, budget: int, duplicate_upload: bool) -> dict:
+    index = _index(pdf, duplicate_upload)
+    result = {"duplicate_upload": duplicate_upload, "token_budget": budget, "runs": []}
+    for k in ks:
+        assembler = ContextAssembler(token_budget=budget)
+        raw, assembled, elapsed = [], [], 0.0
+        for question in QUESTIONS:
+            docs = [Document(id=d.id, page_content=d.page_content, metadata={**d.metadata, "relevance_score": s})
+                    for d, s in index.search(question, k=k)]
+            raw.append(estimate_tokens("\n\n".join(d.page_content for d in docs)))
+            start = time.perf_counter()
+            assembled.append(assembler.assemble(docs).tokens)
+            elapsed += time.perf_counter() - start
+        stats = assembler.stats()
+        result["runs"].append({
+            "k": k,
+            "input_tokens_per_call": {"before": round(sum(raw) / len(raw)), "after": round(sum(assembled) / len(assembled))},
+            "saved_ratio": round(stats["saved_ratio"], 3),
+            "merged_chunks": stats["merged_chunks"],
+            "deduplicated": stats["deduplicated"],
+            "over_budget": stats["over_budget"],
+            "assemble_ms_avg": round(elapsed / len(QUESTIONS) * 1000, 3),
+        })
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="data/NG12_pdf.pdf")
+    parser.add_argument("--k", type=int, nargs="+", default=[4, 8, 16])
+    parser.add_argument("--budget", type=int, default=2000)
+    parser.add_argument("--duplicate-upload", action="store_true")
+    args = parser.parse_args()
+    run(args.pdf, args.k, args.budget, args.duplicate_upload)
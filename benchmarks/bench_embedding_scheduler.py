@@ -0,0 +1,72 @@
+"""
+Concurrent callers embedding through the model directly vs through EmbeddingScheduler, offline
+against HashingEmbeddings with a simulated round trip.
+
+    python -m benchmarks.bench_embedding_scheduler --callers 32 --requests 20 --latency-ms 40
+"""
+import argparse
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from scripts.embedding_scheduler import EmbeddingScheduler
+from scripts.fakes import HashingEmbeddings
+
+# a small pool of repeated questions, like clinicians asking the standard referral questions
+QUESTIONS = [
+    "referral for unexplained haemoptysis aged 40 and over",
+    "iron-deficiency anaemia in adults over 60",
+    "persistent cough and fatigue in a current smoker",
+    "visible haematuria without urinary tract infection",
+    "dysphagia referral pathway",
+    "breast lump aged 30 and over",
+]
+
+
+def _drive(embedder, callers: int, requests: int) -> float:
+    def caller(i: int) -> None:
+        for j in range(requests):
+            embedder.embed_query(QUESTIONS[(i + j) % len(QUESTIONS)] + f" patient {i * requests + j}")
+            embedder.embed_query(QUESTIONS[(i * j) % len(QUESTIONS)])
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=callers) as pool:
+        list(pool.map(caller, range(callers)))
+    return time.perf_counter() - start
+
+
+def run(callers: int, requests: int, latency_ms: float, batch_size: int, wait_ms: float, in_flight: int) -> dict:
+    direct_model = HashingEmbeddings(latency_s=latency_ms / 1000)
+    direct_s = _drive(direct_model, callers, requests)
+
+    batched_model = HashingEmbeddings(latency_s=latency_ms / 1000)
+    scheduler = EmbeddingScheduler(batched_model, max_batch_size=batch_size, max_wait_ms=wait_ms, max_in_flight=in_flight)
+    batched_s = _drive(scheduler, callers, requests)
+    scheduler.close()
+
+    total = callers * requests * 2
+    result = {
+        "requests": total,
+        "direct": {"seconds": direct_s, "model_calls": direct_model.calls, "req_per_s": total / direct_s},
+        "scheduler": {
+            "seconds": batched_s,
+            "model_calls": batched_model.calls,
+            "model_texts": batched_model.texts,
+            "req_per_s": total / batched_s,
+            **scheduler.stats(),
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--callers", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--latency-ms", type=float, default=40)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--wait-ms", type=float, default=10)
+    parser.add_argument("--in-flight", type=int, default=4)
+    args = parser.parse_args()
+    run(args.callers, args.requests, args.latency_ms, args.batch_size, args.wait_ms, args.in_flight)
@@ -0,0 +1,123 @@
+"""
+Cost of the instrumentation: histogram observe, node timer and llm-call recording overhead per
+call, the rag graph (SlowFakeChatModel, static retriever) with timed nodes against the same node
+bodies bare, the same with the sampling profiler running, what the removed per-request prints of
+the retrieved documents and answer cost, and how long a /metrics scrape takes.
+
+    python -m benchmarks.bench_metrics --questions 300
+"""
+import argparse
+import asyncio
+import copy
+import io
+import json
+import os
+import statistics
+import time
+import uuid
+from contextlib import redirect_stdout
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+from langchain_core.messages import HumanMessage
+from langchain_core.runnables import RunnableLambda
+from langgraph.checkpoint.memory import MemorySaver
+
+import ragPipeline.rag as rag
+from benchmarks.bench_chat_concurrency import NG12_CHUNKS, StaticRetriever
+from scripts.fakes import SlowFakeChatModel
+from scripts.metrics import LLM_TOKENS, METRICS, NODE_SECONDS, Histogram, observe_llm, timed
+from scripts.profiler import SamplingProfiler
+
+
+def _ns_per_call(fn, calls: int) -> float:
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter_ns() - start) / calls
+
+
+def micro(calls: int, response) -> dict:
+    histogram = Histogram("bench_seconds", "", ["node"])
+    noop = lambda: None
+    wrapped = timed("bench", noop)
+    prompt = [{"role": "user", "content": "Review the following answer. " * 40}]
+    return {
+        "observe_ns": round(_ns_per_call(lambda: histogram.observe(0.003, node="generate"), calls)),
+        "timed_call_ns": round(_ns_per_call(wrapped, calls) - _ns_per_call(noop, calls)),
+        #no usage_metadata on the fake model's replies: includes the token estimate
+        "observe_llm_ns": round(_ns_per_call(lambda: observe_llm("bench", 0.0, prompt, response), calls // 10)),
+    }
+
+
+def bare_graph():
+    """
+    rag's graph with the node bodies unwrapped, no node timers.
+    """
+    builder = copy.copy(rag.graph_builder)
+    builder.nodes = {}
+    for name, spec in rag.graph_builder.nodes.items():
+        timed_node = spec.runnable
+        bare = RunnableLambda(timed_node.func.__wrapped__, afunc=timed_node.afunc.__wrapped__)
+        builder.nodes[name] = spec._replace(runnable=bare)
+    builder.compiled = False
+    return builder.compile(checkpointer=MemorySaver())
+
+
+async def _latencies(graph, questions: int) -> list:
+    latencies = []
+    for i in range(questions):
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        #unique questions so the answer cache never short-circuits the graph
+        message = HumanMessage(f"When should haemoptysis be referred? ({i} {uuid.uuid4().hex[:6]})")
+        start = time.perf_counter()
+        await graph.ainvoke({"messages": [message]}, config=config)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def _p50(values: list) -> float:
+    return round(statistics.median(values), 3)
+
+
+async def run(questions: int, calls: int) -> dict:
+    rag.llm = SlowFakeChatModel(latency_s=0)
+    rag.retriever = StaticRetriever()
+    bare = bare_graph()
+    await _latencies(rag.graph, 20)
+    await _latencies(bare, 20)
+    answer = await rag.llm.ainvoke("When should haemoptysis be referred?")
+    result = {"questions": questions, "micro": micro(calls, answer), "graph_p50_ms": {}}
+    #interleave so drift hits both sides
+    runs = {"bare": [], "instrumented": []}
+    for _ in range(3):
+        runs["bare"] += await _latencies(bare, questions // 3)
+        runs["instrumented"] += await _latencies(rag.graph, questions // 3)
+    result["graph_p50_ms"] = {name: _p50(values) for name, values in runs.items()}
+    with SamplingProfiler(interval_s=0.005) as profiler:
+        result["graph_p50_ms"]["instrumented_profiled"] = _p50(await _latencies(rag.graph, questions // 3))
+    result["profiler"] = {"samples": profiler.samples, "distinct_stacks": len(profiler.stacks), "top": profiler.top(3)}
+    sink = io.StringIO()
+    with redirect_stdout(sink):
+        result["removed_prints_us_per_request"] = round(_ns_per_call(lambda: (print(NG12_CHUNKS), print(answer.content)), 200) / 1000, 1)
+    result["print_bytes_per_request"] = len(sink.getvalue()) // 200
+    start = time.perf_counter()
+    text = METRICS.render()
+    result["scrape"] = {"ms": round((time.perf_counter() - start) * 1000, 3), "bytes": len(text), "lines": text.count("\n")}
+    result["node_mean_ms"] = {
+        node: round(NODE_SECONDS.summary(node=node)["mean"] * 1000, 3)
+        for node in ("compact_history", "route_query", "retrieve", "check_cache", "generate", "phi_screen", "doc_finalizer")
+    }
+    result["generate_tokens_mean"] = {
+        kind: round(LLM_TOKENS.summary(caller="generate", kind=kind)["mean"], 1) for kind in ("input", "output")
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", type=int, default=300, help="graph runs per variant")
+    parser.add_argument("--calls", type=int, default=200000, help="calls per micro-benchmark")
+    args = parser.parse_args()
+    asyncio.run(run(args.questions, args.calls))
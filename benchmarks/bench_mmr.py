@@ -0,0 +1,69 @@
+"""
+Microbenchmark: stock InMemoryVectorStore MMR vs the NumPy engine in scripts/mmr.py.
+
+    python -m benchmarks.bench_mmr --sizes 1000 10000 100000 --dim 768
+
+The baseline holds vectors as ndarray rows instead of python float lists to keep memory sane
+at 100k chunks, which if anything flatters it (the stock path still rebuilds the matrix per query).
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+from langchain_core.embeddings import DeterministicFakeEmbedding
+from langchain_core.vectorstores import InMemoryVectorStore
+
+from scripts.mmr import batch_mmr
+
+
+def _timeit(fn, repeat: int) -> float:
+    fn()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def run(sizes, dim: int, k: int, fetch_k: int, batch: int, repeat: int) -> list:
+    rng = np.random.default_rng(0)
+    results = []
+    for n in sizes:
+        matrix = rng.standard_normal((n, dim), dtype=np.float32)
+        matrix /= np.linalg.norm(matrix, axis=1, keepdims=True)
+        queries = rng.standard_normal((batch, dim), dtype=np.float32)
+        queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+        stock = InMemoryVectorStore(embedding=DeterministicFakeEmbedding(size=dim))
+        stock.store = {
+            str(i): {"id": str(i), "vector": matrix[i], "text": "", "metadata": {}} for i in range(n)
+        }
+        q0 = queries[0].tolist()
+
+        row = {
+            "chunks": n,
+            "dim": dim,
+            "stock_mmr_ms": _timeit(
+                lambda: stock.max_marginal_relevance_search_by_vector(q0, k=k, fetch_k=fetch_k), repeat
+            ),
+            "numpy_mmr_ms": _timeit(lambda: batch_mmr(queries[:1], matrix, k=k, fetch_k=fetch_k), repeat),
+            f"numpy_mmr_batch{batch}_ms_per_query": _timeit(
+                lambda: batch_mmr(queries, matrix, k=k, fetch_k=fetch_k), repeat
+            ) / batch,
+        }
+        row["speedup"] = row["stock_mmr_ms"] / row["numpy_mmr_ms"]
+        results.append(row)
+        print(json.dumps(row))
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000, 100_000])
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--fetch-k", type=int, default=20)
+    parser.add_argument("--batch", type=int, default=32)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    run(args.sizes, args.dim, args.k, args.fetch_k, args.batch, args.repeat)
@@ -0,0 +1,96 @@
+"""
+NG12 rule table: compile time, per-patient evaluation latency and coverage over synthetic patients,
+then POST /assess through the rule fast path against the retrieval + LLM path (SlowFakeChatModel,
+static retriever) for the same patients.
+
+    python -m benchmarks.bench_ng12_rules --pdf data/NG12_pdf.pdf --patients 20000
+"""
+import argparse
+import asyncio
+import json
+import random
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+import ragPipeline.rag as rag
+from app.routers import assess
+from benchmarks.bench_assess_batch import DECISION
+from benchmarks.bench_chat_concurrency import StaticRetriever
+from benchmarks.bench_patient_store import write_patients
+from scripts.fakes import SlowFakeChatModel
+from scripts.ng12_rules import RuleTable
+from scripts.patient_store import PatientStore
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def _assess_ms(ids, fast_path: bool) -> list:
+    rag.RULE_FAST_PATH = fast_path
+    timings = []
+    for pid in ids:
+        start = time.perf_counter()
+        await assess.assess_endpoint(assess.AssessRequest(patient_id=pid))
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def run(pdf: str, n: int, sample: int, latency_ms: float) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        start = time.perf_counter()
+        table = RuleTable.build(pdf, str(Path(work) / "ng12_rules.json"))
+        compile_s = time.perf_counter() - start
+        start = time.perf_counter()
+        table = RuleTable.open_or_build(pdf, str(Path(work) / "ng12_rules.json"))
+        reopen_ms = (time.perf_counter() - start) * 1000
+
+        source = Path(work) / "patients.jsonl"
+        write_patients(source, n)
+        store = PatientStore(str(Path(work) / "store"))
+        store.build(str(source))
+        patients = list(store.records(range(len(store))))
+
+        timings, decisions = [], Counter()
+        for patient in patients:
+            start = time.perf_counter()
+            decision = table.evaluate(patient)
+            timings.append((time.perf_counter() - start) * 1e6)
+            decisions[decision["decision"] if decision else "no_rule"] += 1
+
+        rag.PATIENT_STORE, rag.RULE_TABLE = store, table
+        rag.llm = SlowFakeChatModel(latency_s=latency_ms / 1000, reply=DECISION)
+        rag.retriever = StaticRetriever()
+        ids = [p["patient_id"] for p in random.Random(0).sample(patients, min(sample, len(patients)))]
+        fast = asyncio.run(_assess_ms(ids, True))
+        llm = asyncio.run(_assess_ms(ids, False))
+
+    result = {
+        "rules": len(table),
+        "compile_s": round(compile_s, 2),
+        "reopen_ms": round(reopen_ms, 2),
+        "patients": n,
+        "rule_coverage": round(1 - decisions["no_rule"] / n, 3),
+        "decisions": dict(decisions),
+        "evaluate_us": {"p50": round(_pct(timings, 0.5), 1), "p99": round(_pct(timings, 0.99), 1)},
+        "assess_ms": {
+            "rule_fast_path": {"p50": round(_pct(fast, 0.5), 2), "p99": round(_pct(fast, 0.99), 2)},
+            "llm_only": {"p50": round(_pct(llm, 0.5), 2), "p99": round(_pct(llm, 0.99), 2)},
+            "llm_calls": rag.llm.calls,
+        },
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="data/NG12_pdf.pdf")
+    parser.add_argument("--patients", type=int, default=20_000)
+    parser.add_argument("--sample", type=int, default=40, help="patients sent through /assess per path")
+    parser.add_argument("--latency-ms", type=float, default=1500, help="simulated llm latency")
+    args = parser.parse_args()
+    run(args.pdf, args.patients, args.sample, args.latency_ms)
@@ -0,0 +1,104 @@
+"""
+Patient store at scale: build from a synthetic patients.jsonl, then time id lookups and symptom /
+age / smoking queries against a freshly opened (mmap, cold Python heap) store.
+
+    python -m benchmarks.bench_patient_store --patients 1000000 --workdir /tmp/patient_bench
+"""
+import argparse
+import json
+import random
+import time
+from pathlib import Path
+
+from scripts.patient_store import PatientStore
+
+SYMPTOMS = [
+    "unexplained hemoptysis", "fatigue", "persistent cough", "sore throat", "shortness of breath",
+    "dysphagia", "iron-deficiency anaemia", "persistent hoarseness", "unexplained breast lump",
+    "visible haematuria", "weight loss", "abdominal pain", "rectal bleeding", "night sweats",
+]
+SMOKING = ["Current Smoker", "Ex-Smoker", "Never Smoked"]
+
+
+def write_patients(path: Path, n: int, seed: int = 0) -> None:
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as fh:
+        for i in range(n):
+            fh.write(json.dumps({
+                "patient_id": f"PT-{100000 + i}",
+                "name": f"Patient {i}",
+                "age": rng.randint(18, 95),
+                "gender": rng.choice(["Male", "Female"]),
+                "smoking_history": rng.choice(SMOKING),
+                "symptoms": rng.sample(SYMPTOMS, rng.randint(1, 3)),
+                "symptom_duration_days": rng.randint(1, 120),
+            }) + "\n")
+
+
+def _rss_mb() -> dict:
+    """
+    Resident memory split into anonymous (Python heap, numpy temporaries) and file-backed (mmap'd store).
+    """
+    rss = {}
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith(("RssAnon:", "RssFile:")):
+                    rss[line.split(":")[0]] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return rss
+
+
+def run(n: int, workdir: str, lookups: int) -> dict:
+    work = Path(workdir)
+    work.mkdir(parents=True, exist_ok=True)
+    source = work / f"patients-{n}.jsonl"
+    if not source.exists():
+        write_patients(source, n)
+
+    start = time.perf_counter()
+    PatientStore(str(work / "store")).build(str(source))
+    build_s = time.perf_counter() - start
+
+    rss_before = _rss_mb()
+    start = time.perf_counter()
+    store = PatientStore(str(work / "store"))
+    open_ms = (time.perf_counter() - start) * 1000
+
+    rng = random.Random(1)
+    ids = [f"PT-{100000 + rng.randrange(n)}" for _ in range(lookups)]
+    start = time.perf_counter()
+    assert all(store.get(pid)["patient_id"] == pid for pid in ids)
+    get_us = (time.perf_counter() - start) / lookups * 1e6
+
+    start = time.perf_counter()
+    rows = store.find(symptoms=["persistent cough", "fatigue"], smoking="current smoker", min_age=40)
+    find_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    aged = store.find(min_age=40, max_age=49)
+    age_ms = (time.perf_counter() - start) * 1000
+
+    result = {
+        "patients": n,
+        "build_s": round(build_s, 2),
+        "open_ms": round(open_ms, 2),
+        "get_us": round(get_us, 2),
+        "find_ms": round(find_ms, 2),
+        "find_rows": int(len(rows)),
+        "age_only_ms": round(age_ms, 2),
+        "age_only_rows": int(len(aged)),
+        # growth from opening + querying: heap vs mapped store pages (readahead included)
+        **{f"{k.lower()}_delta_mb": round(v - rss_before.get(k, 0), 1) for k, v in _rss_mb().items()},
+    }
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--patients", type=int, default=1_000_000)
+    parser.add_argument("--workdir", default="/tmp/patient_bench")
+    parser.add_argument("--lookups", type=int, default=10_000)
+    args = parser.parse_args()
+    run(args.patients, args.workdir, args.lookups)
@@ -0,0 +1,106 @@
+"""
+Cold start: import time of the main modules and time to the first /assess and /chat responses,
+each in a fresh interpreter, with the FastAPI lifespan warm-up on (startup builds the clients,
+stores and rule table) and off (the first request builds what it touches). The llm and retriever
+are swapped for SlowFakeChatModel / StaticRetriever after import so no network is needed.
+
+    python -m benchmarks.bench_startup --runs 3 --cold
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+
+MODULES = ["scripts.patient_store", "ragPipeline.context", "ragPipeline.rag", "app.main"]
+
+
+async def _first_requests() -> dict:
+    import httpx
+    import ragPipeline.rag as rag
+    from benchmarks.bench_chat_concurrency import StaticRetriever
+    from scripts.fakes import SlowFakeChatModel
+    import app.main as main
+
+    rag.llm = SlowFakeChatModel(latency_s=0)
+    rag.retriever = StaticRetriever()
+    timings = {}
+    start = time.perf_counter()
+    async with main.app.router.lifespan_context(main.app):
+        timings["lifespan_ms"] = (time.perf_counter() - start) * 1000
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+            patient_id = next(iter(rag.PATIENT_STORE.records([0])))["patient_id"]
+            for name, path, body in (
+                ("first_assess_ms", "/assess", {"patient_id": patient_id}),
+                ("second_assess_ms", "/assess", {"patient_id": patient_id}),
+                ("first_chat_ms", "/chat", {"message": "When should haemoptysis be referred?"}),
+                ("second_chat_ms", "/chat", {"message": "When should hoarseness be referred?"}),
+            ):
+                start = time.perf_counter()
+                response = await client.post(path, json=body)
+                response.raise_for_status()
+                timings[name] = (time.perf_counter() - start) * 1000
+    return timings
+
+
+def child(module: str, requests: bool) -> None:
+    start = time.perf_counter()
+    __import__(module)
+    result = {"import_ms": (time.perf_counter() - start) * 1000}
+    if requests:
+        result.update(asyncio.run(_first_requests()))
+    #the graph nodes print to stdout as well, tag the result line
+    print("RESULT " + json.dumps(result))
+
+
+def _spawn(module: str, requests: bool, env: dict) -> dict:
+    out = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_startup", "--child", module] + (["--requests"] if requests else []),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    line = next(l for l in out.stdout.splitlines() if l.startswith("RESULT "))
+    return json.loads(line[len("RESULT "):])
+
+
+def _median(runs: list) -> dict:
+    return {key: round(statistics.median(r[key] for r in runs), 1) for key in runs[0]}
+
+
+def run(runs: int, cold: bool) -> dict:
+    result = {"runs": runs, "cold_stores": cold, "import_ms": {}}
+    for module in MODULES:
+        result["import_ms"][module] = _median([_spawn(module, False, dict(os.environ)) for _ in range(runs)])["import_ms"]
+    for warm in ("1", "0"):
+        samples = []
+        for _ in range(runs):
+            with tempfile.TemporaryDirectory() as work:
+                env = {**os.environ, "WARM_UP": warm}
+                if cold:
+                    #nothing compiled yet: patient store and NG12 rule table are built on this boot
+                    env.update(PATIENT_STORE_DIR=str(Path(work) / "patient_store"),
+                               NG12_RULES_TABLE=str(Path(work) / "ng12_rules.json"))
+                samples.append(_spawn("app.main", True, env))
+        result["warm_up" if warm == "1" else "lazy"] = _median(samples)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=3, help="fresh interpreters per measurement (median)")
+    parser.add_argument("--cold", action="store_true", help="build the patient store and rule table on each boot")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--requests", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args.child, args.requests)
+    else:
+        run(args.runs, args.cold)
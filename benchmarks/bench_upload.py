@@ -0,0 +1,109 @@
+"""
+Upload responsiveness: POST /upload of a pdf while another client pings GET / every few ms.
+Compares the old handler (copy + index_file inline in the request) with the background job queue:
+time until the upload request returns, time until the chunks are searchable, and the worst ping
+latency while it happens. HashingEmbeddings stands in for the Gemini embeddings.
+
+    python -m benchmarks.bench_upload --pdf data/NG12_pdf.pdf
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import logging
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+WORKDIR = Path(tempfile.mkdtemp(prefix="ng12-upload-"))
+atexit.register(shutil.rmtree, WORKDIR, True)
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ["VECTOR_INDEX_DIR"] = str(WORKDIR / "vector_index")
+os.environ["INGEST_MANIFEST"] = str(WORKDIR / "ingest_manifest.json")
+os.environ["EMBED_CACHE_PATH"] = str(WORKDIR / "embeddings.pack")
+os.environ["WARM_UP"] = "0"
+
+import httpx
+from fastapi import File, UploadFile
+
+import scripts.document_loader as document_loader
+from scripts.fakes import HashingEmbeddings
+
+document_loader.EMBEDDINGS = HashingEmbeddings()
+
+import app.main as main
+import scripts.doc_retrieval as doc_retrieval
+
+
+@main.app.post("/upload_inline")
+async def upload_inline(file: UploadFile = File(...)):
+    #the previous handler: blocking copy and indexing on the event loop
+    path = os.path.join(main.UPLOAD_DIR, Path(file.filename).name)
+    with open(path, "wb") as buffer:
+        shutil.copyfileobj(file.file, buffer)
+    return {"new_chunks": len(doc_retrieval.index_file(path))}
+
+
+def _reset() -> None:
+    #every run starts from an empty index so both handlers do the full work
+    doc_retrieval.MANIFEST.path.unlink(missing_ok=True)
+    document_loader.VECTOR_STORE.delete(list(document_loader.VECTOR_STORE.snapshot().id_to_row))
+
+
+async def _ping(client: httpx.AsyncClient, stop: asyncio.Event, latencies: list, stalls: list) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/")
+        latencies.append((time.perf_counter() - start) * 1000)
+        #anything past the 5 ms sleep is time the event loop couldn't run this task
+        start = time.perf_counter()
+        await asyncio.sleep(0.005)
+        stalls.append((time.perf_counter() - start) * 1000 - 5)
+
+
+async def _one(client: httpx.AsyncClient, path: str, pdf: str) -> dict:
+    _reset()
+    stop, latencies, stalls = asyncio.Event(), [], []
+    pinger = asyncio.create_task(_ping(client, stop, latencies, stalls))
+    #pings in flight before the upload starts
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    with open(pdf, "rb") as fh:
+        response = await client.post(path, files={"file": (Path(pdf).name, fh, "application/pdf")})
+    response.raise_for_status()
+    returned_ms = (time.perf_counter() - start) * 1000
+    body = response.json()
+    if "job_id" in body:
+        while (await client.get(f"/upload/{body['job_id']}")).json()["status"] not in ("done", "failed"):
+            await asyncio.sleep(0.01)
+    searchable_ms = (time.perf_counter() - start) * 1000
+    stop.set()
+    await pinger
+    return {
+        "request_returned_ms": round(returned_ms, 1),
+        "searchable_ms": round(searchable_ms, 1),
+        "ping_p50_ms": round(statistics.median(latencies), 1),
+        "worst_ping_ms": round(max(latencies), 1),
+        "worst_loop_stall_ms": round(max(stalls), 1),
+        "chunks": len(document_loader.VECTOR_STORE),
+    }
+
+
+async def run(pdf: str) -> dict:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    result = {"pdf": pdf}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://bench", timeout=None) as client:
+        result["inline"] = await _one(client, "/upload_inline", pdf)
+        result["job_queue"] = await _one(client, "/upload", pdf)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="data/NG12_pdf.pdf")
+    args = parser.parse_args()
+    asyncio.run(run(args.pdf))
@@ -0,0 +1,102 @@
+"""
+Checkpointer soak: many chat turns through a graph shaped like the rag graph (messages with
+add_messages, retrieved context, answer), rotating over more sessions than the saver keeps, with
+resident memory sampled along the way. MemorySaver grows with every turn; the bounded savers
+should level off once the thread limit is reached.
+
+Then one long-lived session: the soak graph never compacts its history, so this is what keeps a
+single thread (checkpoint size, rss and turns/s) flat is the savers' per-thread message cap.
+
+    python -m benchmarks.soak_checkpointer --turns 100000 --sessions 5000 --long-session-turns 4000 --backends memory bounded sqlite
+"""
+import argparse
+import json
+import tempfile
+import time
+from pathlib import Path
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import MemorySaver
+from langgraph.graph import END, START, StateGraph
+
+from benchmarks.bench_chat_concurrency import NG12_CHUNKS
+from benchmarks.bench_patient_store import _rss_mb
+from ragPipeline.checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver, session_config
+from ragPipeline.rag import State
+
+def _graph(checkpointer):
+    def retrieve(state: State):
+        return {"question": state["messages"][-1].content, "context": NG12_CHUNKS}
+
+    def generate(state: State):
+        answer = f"Per NG12, refer urgently: {state['question']}"
+        return {"answer": answer, "messages": [AIMessage(answer)]}
+
+    builder = StateGraph(State)
+    builder.add_node("retrieve", retrieve)
+    builder.add_node("generate", generate)
+    builder.add_edge(START, "retrieve")
+    builder.add_edge("retrieve", "generate")
+    builder.add_edge("generate", END)
+    return builder.compile(checkpointer=checkpointer)
+
+
+def _saver(backend: str, work: Path, max_threads: int, max_messages: int):
+    if backend == "memory":
+        return MemorySaver()
+    if backend == "bounded":
+        return BoundedMemorySaver(max_threads=max_threads, max_checkpoints_per_thread=4, max_messages_per_thread=max_messages)
+    return SQLiteCheckpointSaver(str(work / "checkpoints.sqlite"), max_checkpoints_per_thread=4, max_messages_per_thread=max_messages)
+
+
+def soak(backend: str, turns: int, sessions: int, max_threads: int, samples: int, max_messages: int = 200) -> dict:
+    with tempfile.TemporaryDirectory() as work:
+        saver = _saver(backend, Path(work), max_threads, max_messages)
+        graph = _graph(saver)
+        every = max(1, turns // samples)
+        rss, start = [], time.perf_counter()
+        for turn in range(turns):
+            config = session_config(f"user-{turn % sessions}")
+            graph.invoke({"messages": [HumanMessage(f"turn {turn}: haemoptysis aged 40?")]}, config=config)
+            if (turn + 1) % every == 0:
+                rss.append({"turn": turn + 1, "elapsed_s": round(time.perf_counter() - start, 2),
+                            "rss_anon_mb": round(_rss_mb().get("RssAnon", 0.0), 1)})
+        elapsed = time.perf_counter() - start
+        #turns/s over the last sample window, a thread that keeps growing slows down every turn
+        tail_turns = turns - (rss[-2]["turn"] if len(rss) > 1 else 0)
+        tail_s = elapsed - (rss[-2]["elapsed_s"] if len(rss) > 1 else 0)
+        history = len(graph.get_state(session_config(f"user-{(turns - 1) % sessions}")).values["messages"])
+        stats = saver.stats() if hasattr(saver, "stats") else {"threads": len(saver.storage)}
+        if isinstance(saver, SQLiteCheckpointSaver):
+            saver.close()
+            stats["db_mb"] = round(sum(p.stat().st_size for p in Path(work).iterdir()) / 2**20, 1)
+    #growth over the second half, after the saver has filled up to its limits
+    half = rss[len(rss) // 2]["rss_anon_mb"]
+    return {
+        "backend": backend,
+        "sessions": sessions,
+        "turns": turns,
+        "turns_per_s": round(turns / elapsed),
+        "last_window_turns_per_s": round(tail_turns / tail_s) if tail_s > 0 else None,
+        "last_session_messages": history,
+        "rss_anon_mb": {"first": rss[0]["rss_anon_mb"], "half": half, "last": rss[-1]["rss_anon_mb"]},
+        "second_half_growth_mb": round(rss[-1]["rss_anon_mb"] - half, 1),
+        "samples": rss,
+        "saver": stats,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--turns", type=int, default=100_000)
+    parser.add_argument("--sessions", type=int, default=5000, help="distinct session ids, rotated")
+    parser.add_argument("--long-session-turns", type=int, default=4000, help="turns of the single-session run, 0 = skip")
+    parser.add_argument("--max-threads", type=int, default=1000)
+    parser.add_argument("--max-messages", type=int, default=200, help="per-thread message cap of the bounded savers")
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--backends", nargs="+", default=["bounded", "sqlite"], choices=["memory", "bounded", "sqlite"])
+    args = parser.parse_args()
+    results = [soak(b, args.turns, args.sessions, args.max_threads, args.samples, args.max_messages) for b in args.backends]
+    if args.long_session_turns:
+        results += [soak(b, args.long_session_turns, 1, args.max_threads, args.samples, args.max_messages) for b in args.backends]
+    print(json.dumps(results, indent=2))
@@ -0,0 +1,260 @@
+"""
+Offline benchmark + retrieval-quality suite. HashingEmbeddings stands in for EMBEDDINGS and
+SlowFakeChatModel for llm, so the run needs no network or keys and repeats exactly. Reports, as JSON:
+
+  ingestion   load_pdfs / clean_pdf_text / split_documents per stage (median of 3), index_file end to end
+  retrieval   p50/p99 latency, recall@k and MRR per retriever mode against the labelled NG12
+              question set (data/golden/ng12_questions.json: question -> relevant recommendation ids)
+  graph       rag graph latency per question
+  api         POST /chat and /assess throughput and latency at several concurrency levels
+
+    python -m benchmarks.suite --out bench.json
+    python -m benchmarks.suite --compare bench.json      # exit 1 on regressions past --tolerance
+"""
+import argparse
+import asyncio
+import atexit
+import json
+import logging
+import os
+import platform
+import re
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+
+#everything the run writes goes to a scratch dir; must be set before the stores are imported
+WORKDIR = Path(tempfile.mkdtemp(prefix="ng12-bench-"))
+atexit.register(shutil.rmtree, WORKDIR, True)
+os.environ.setdefault("GOOGLE_API_KEY", "offline-benchmark")
+os.environ["VECTOR_INDEX_DIR"] = str(WORKDIR / "vector_index")
+os.environ["INGEST_MANIFEST"] = str(WORKDIR / "ingest_manifest.json")
+os.environ["EMBED_CACHE_PATH"] = str(WORKDIR / "embeddings.pack")
+os.environ["PATIENT_STORE_DIR"] = str(WORKDIR / "patient_store")
+os.environ["NG12_RULES_TABLE"] = str(WORKDIR / "ng12_rules.json")
+os.environ["CHECKPOINTER"] = "memory"
+
+import httpx
+from fastapi import FastAPI
+from langchain_core.messages import HumanMessage
+from pypdf import PdfReader
+
+import ragPipeline.rag as rag
+import scripts.document_loader as document_loader
+from app.routers import assess, chat
+from scripts.doc_retrieval import DocumentBaseRetriever, index_file
+from scripts.fakes import HashingEmbeddings, SlowFakeChatModel
+
+QUESTIONS = "data/golden/ng12_questions.json"
+KS = (1, 4, 10)
+
+
+def install_fakes(llm_latency_ms: float) -> None:
+    """
+    Plug the offline stand-ins in for the Gemini clients (before anything has built them).
+    """
+    embeddings = HashingEmbeddings()
+    #VECTOR_STORE is lazy and picks up document_loader.EMBEDDINGS when first used
+    document_loader.EMBEDDINGS = embeddings
+    rag.EMBEDDINGS = embeddings
+    rag.llm = SlowFakeChatModel(latency_s=llm_latency_ms / 1000)
+
+
+def _pct(values, q):
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(q * len(values)))], 3) if values else 0.0
+
+
+def _timed(fn, *args):
+    start = time.perf_counter()
+    out = fn(*args)
+    return out, (time.perf_counter() - start) * 1000
+
+
+def _median_timed(fn, *args, repeat: int = 3):
+    runs = [_timed(fn, *args) for _ in range(repeat)]
+    return runs[-1][0], statistics.median(ms for _, ms in runs)
+
+
+def ingestion(pdf: str) -> dict:
+    pages, load_ms = _median_timed(document_loader.load_pdfs, pdf)
+    raw = [page.extract_text() or "" for page in PdfReader(pdf).pages]
+    _, clean_ms = _median_timed(lambda: [document_loader.clean_pdf_text(text) for text in raw])
+    chunks, split_ms = _median_timed(document_loader.split_documents, pages)
+    #once: a second index_file of the same pdf is a manifest no-op
+    indexed, index_ms = _timed(index_file, pdf)
+    return {
+        "pages": len(pages),
+        "chunks": len(chunks),
+        "load_pdfs_ms": round(load_ms, 1),
+        "clean_pdf_text_ms": round(clean_ms, 1),
+        "split_documents_ms": round(split_ms, 1),
+        "index_file_ms": round(index_ms, 1),
+        "indexed_chunks": len(indexed),
+    }
+
+
+def _recommendations(doc) -> set:
+    #a chunk counts for a recommendation when it holds its heading: "1.3.2 Refer ...", not a "see 1.3.2" reference
+    return set(re.findall(r"(?<![\d.])(1\.\d+\.\d+) ?[A-Z]", doc.page_content))
+
+
+def retrieval(questions: list) -> dict:
+    result = {}
+    for mode in ("hybrid", "mmr"):
+        retriever = DocumentBaseRetriever(k=max(KS), search_mode=mode)
+        retriever.invoke(questions[0]["question"])
+        latencies, recall, reciprocal = [], {k: 0.0 for k in KS}, 0.0
+        for q in questions:
+            docs, ms = _timed(retriever.invoke, q["question"])
+            latencies.append(ms)
+            relevant = set(q["relevant"])
+            found = [_recommendations(d) & relevant for d in docs]
+            for k in KS:
+                recall[k] += len(set().union(*found[:k])) / len(relevant)
+            rank = next((i + 1 for i, hits in enumerate(found) if hits), None)
+            reciprocal += 1 / rank if rank else 0.0
+        result[mode] = {
+            "latency_ms": {"p50": _pct(latencies, 0.5), "p99": _pct(latencies, 0.99)},
+            **{f"recall@{k}": round(recall[k] / len(questions), 3) for k in KS},
+            "mrr": round(reciprocal / len(questions), 3),
+        }
+    return result
+
+
+async def graph_latency(questions: list) -> dict:
+    rag.retriever = DocumentBaseRetriever()
+    latencies = []
+    for q in questions:
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        start = time.perf_counter()
+        await rag.graph.ainvoke({"messages": [HumanMessage(q["question"])]}, config=config)
+        latencies.append((time.perf_counter() - start) * 1000)
+        await rag.memory.adelete_thread(config["configurable"]["thread_id"])
+    return {"questions": len(questions), "latency_ms": {"p50": _pct(latencies, 0.5), "p99": _pct(latencies, 0.99)}}
+
+
+async def api_throughput(questions: list, levels: list, requests: int) -> dict:
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.include_router(assess.router)
+    patient_ids = [r["patient_id"] for r in rag.PATIENT_STORE.records(range(len(rag.PATIENT_STORE)))]
+    result = {}
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench", timeout=None) as client:
+        for path in ("/chat", "/assess"):
+            rows = []
+            for concurrency in levels:
+                slots, latencies = asyncio.Semaphore(concurrency), []
+
+                async def one(i: int) -> None:
+                    if path == "/chat":
+                        #unique suffix so the answer cache doesn't short-circuit the graph
+                        body = {"message": f"{questions[i % len(questions)]['question']} ({uuid.uuid4().hex[:6]})"}
+                    else:
+                        body = {"patient_id": patient_ids[i % len(patient_ids)]}
+                    async with slots:
+                        start = time.perf_counter()
+                        response = await client.post(path, json=body)
+                        response.raise_for_status()
+                        latencies.append((time.perf_counter() - start) * 1000)
+
+                start = time.perf_counter()
+                await asyncio.gather(*(one(i) for i in range(requests)))
+                seconds = time.perf_counter() - start
+                rows.append({
+                    "concurrency": concurrency,
+                    "req_per_s": round(requests / seconds, 1),
+                    "latency_ms": {"p50": _pct(latencies, 0.5), "p99": _pct(latencies, 0.99)},
+                })
+            result[path] = rows
+    return result
+
+
+def _flatten(value, prefix=""):
+    if isinstance(value, dict):
+        for key, inner in value.items():
+            yield from _flatten(inner, f"{prefix}.{key}" if prefix else str(key))
+    elif isinstance(value, list):
+        for i, inner in enumerate(value):
+            yield from _flatten(inner, f"{prefix}[{i}]")
+    elif isinstance(value, (int, float)) and not isinstance(value, bool):
+        yield prefix, float(value)
+
+
+def compare(current: dict, baseline: dict, tolerance: float) -> list:
+    """
+    Metrics that got worse by more than `tolerance` (relative): latencies up, recall/mrr/throughput down.
+    p99s are reported but not compared, over a few dozen samples they are the single slowest call.
+    """
+    before = dict(_flatten(baseline))
+    regressions = []
+    for name, now in _flatten(current):
+        if name not in before or name.startswith("meta.") or name.endswith(".p99"):
+            continue
+        was = before[name]
+        if any(tag in name for tag in ("recall@", "mrr", "req_per_s")):
+            worse = now < was * (1 - tolerance)
+        elif name.endswith(("_ms", ".p50")):
+            #sub-millisecond stages jitter by more than any tolerance
+            worse = now > was * (1 + tolerance) and now - was > 1.0
+        else:
+            continue
+        if worse:
+            regressions.append({"metric": name, "baseline": was, "current": now})
+    return regressions
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def run(pdf: str, llm_latency_ms: float, levels: list, requests: int) -> dict:
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    install_fakes(llm_latency_ms)
+    #build the stores and rule table up front, they'd otherwise land in the first timed request
+    warm_up = rag.warm_up()
+    questions = json.loads(Path(QUESTIONS).read_text())
+    result = {
+        "meta": {
+            "commit": _commit(),
+            "python": platform.python_version(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "questions": len(questions),
+            "llm_latency_ms": llm_latency_ms,
+            "warm_up_ms": warm_up,
+        },
+        "ingestion": ingestion(pdf),
+        "retrieval": retrieval(questions),
+    }
+    result["graph"] = asyncio.run(graph_latency(questions))
+    result["api"] = asyncio.run(api_throughput(questions, levels, requests))
+    return result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--pdf", default="data/NG12_pdf.pdf")
+    parser.add_argument("--llm-latency-ms", type=float, default=0, help="simulated llm latency per call")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=64, help="requests per concurrency level")
+    parser.add_argument("--out", help="also write the results here")
+    parser.add_argument("--compare", help="baseline results json to check for regressions")
+    parser.add_argument("--tolerance", type=float, default=0.3, help="relative change counted as a regression")
+    args = parser.parse_args()
+    result = run(args.pdf, args.llm_latency_ms, args.concurrency, args.requests)
+    if args.compare:
+        result["regressions"] = compare(result, json.loads(Path(args.compare).read_text()), args.tolerance)
+    report = json.dumps(result, indent=2)
+    if args.out:
+        Path(args.out).write_text(report)
+    #graph nodes print as they run, keep the report on its own at the end
+    sys.stdout.write(report + "\n")
+    sys.exit(1 if result.get("regressions") else 0)
@@ -1,3 +1,16 @@
-from ragPipeline.rag import graph, config, retriever
+import importlib
 
-from scripts.document_loader import DocumentLoader
\ No newline at end of file
+#resolved on first access (PEP 562): importing ragPipeline.context or .checkpointer doesn't build the graph
+_EXPORTS = {
+    "graph": "ragPipeline.rag",
+    "config": "ragPipeline.rag",
+    "retriever": "ragPipeline.rag",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,157 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from scripts.lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+CacheKey = Tuple[str, FrozenSet[str]]
+
+
+def normalize_question(question: str) -> str:
+    """
+    Case, punctuation, whitespace, stopwords and UK/US spelling don't change the answer.
+    """
+    return " ".join(tokenize(question))
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "vector")
+
+    def __init__(self, value: dict, expires_at: float, vector: Optional[np.ndarray]):
+        self.value = value
+        self.expires_at = expires_at
+        self.vector = vector
+
+
+class AnswerCache:
+    """
+    Finished answers keyed on (normalized question, set of retrieved chunk ids).
+
+    The evidence is part of the key, so re-indexing a guideline (new chunk ids) or a change in
+    what the retriever returns invalidates answers without any explicit purge.
+    With `embed_query` and `similarity_threshold` set, a question that misses exactly can still hit
+    an entry for the same evidence whose question embedding is at least that cosine-similar
+    (near-duplicate phrasings). Entries expire after `ttl_s`; past `max_entries` the least recently
+    used is evicted.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl_s: float = 3600.0,
+        embed_query: Optional[Callable[[str], List[float]]] = None,
+        similarity_threshold: float = 0.0,
+    ):
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.embed_query = embed_query
+        self.similarity_threshold = similarity_threshold
+        self._entries: "OrderedDict[CacheKey, _Entry]" = OrderedDict()
+        # evidence set -> normalized questions cached for it, for the similarity lookup
+        self._by_evidence: Dict[FrozenSet[str], Dict[str, None]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._similar_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @property
+    def similarity_enabled(self) -> bool:
+        return self.embed_query is not None and self.similarity_threshold > 0
+
+    def _vector(self, question: str) -> Optional[np.ndarray]:
+        if not self.similarity_enabled:
+            return None
+        try:
+            vector = np.asarray(self.embed_query(question), dtype=np.float32)
+        except Exception:
+            logger.exception("Answer cache could not embed question, skipping similarity lookup")
+            return None
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else None
+
+    def _drop(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        questions = self._by_evidence.get(key[1])
+        if questions is not None:
+            questions.pop(key[0], None)
+            if not questions:
+                del self._by_evidence[key[1]]
+
+    def _live(self, key: CacheKey, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= now:
+            self._drop(key)
+            self._expirations += 1
+            return None
+        return entry
+
+    def get(self, question: str, chunk_ids: Iterable[str]) -> Optional[dict]:
+        normalized, evidence = normalize_question(question), frozenset(chunk_ids)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._live((normalized, evidence), now)
+            if entry is not None:
+                self._entries.move_to_end((normalized, evidence))
+                self._hits += 1
+                return dict(entry.value)
+            candidates = list(self._by_evidence.get(evidence, ())) if self.similarity_enabled else []
+        # embed outside the lock, only when there is something with the same evidence to compare to
+        vector = self._vector(question) if candidates else None
+        with self._lock:
+            if vector is not None:
+                best_key, best_sim = None, self.similarity_threshold
+                for other in candidates:
+                    entry = self._live((other, evidence), now)
+                    if entry is None or entry.vector is None:
+                        continue
+                    sim = float(entry.vector @ vector)
+                    if sim >= best_sim:
+                        best_key, best_sim = (other, evidence), sim
+                if best_key is not None:
+                    self._entries.move_to_end(best_key)
+                    self._hits += 1
+                    self._similar_hits += 1
+                    return dict(self._entries[best_key].value)
+            self._misses += 1
+            return None
+
+    def put(self, question: str, chunk_ids: Iterable[str], value: dict) -> None:
+        normalized, evidence = normalize_question(question), frozenset(chunk_ids)
+        vector = self._vector(question)
+        with self._lock:
+            key = (normalized, evidence)
+            self._drop(key)
+            self._entries[key] = _Entry(dict(value), time.monotonic() + self.ttl_s, vector)
+            self._by_evidence.setdefault(evidence, {})[normalized] = None
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_evidence.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "similar_hits": self._similar_hits,
+                "misses": self._misses,
+                "hit_ratio": self._hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+            }
@@ -0,0 +1,514 @@
+import asyncio
+import atexit
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from pathlib import Path
+from typing import Any, AsyncIterator, Dict, Iterator, List, Optional, Sequence, Set, Tuple
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+from langgraph.checkpoint.memory import MemorySaver
+
+logger = logging.getLogger(__name__)
+
+
+def session_config(session_id: str) -> dict:
+    """
+    Graph config for one chat session: its own checkpoint thread.
+    """
+    return {"configurable": {"thread_id": f"session:{session_id}"}}
+
+
+def _ids(config: RunnableConfig) -> Tuple[str, str, Optional[str]]:
+    conf = config["configurable"]
+    return conf["thread_id"], conf.get("checkpoint_ns", ""), get_checkpoint_id(config)
+
+
+def cap_messages(checkpoint: Checkpoint, max_messages: Optional[int]) -> Checkpoint:
+    """
+    `checkpoint` with its `messages` channel cut to the newest `max_messages`, starting on a human
+    message. The rag graph compacts history long before this; the cap keeps a thread's size bounded
+    for a graph (or a failing summary call) that doesn't.
+    """
+    messages = checkpoint["channel_values"].get("messages")
+    if not max_messages or not isinstance(messages, list) or len(messages) <= max_messages:
+        return checkpoint
+    kept = messages[-max_messages:]
+    #an answer whose question was cut off would open the history
+    start = next((i for i, m in enumerate(kept) if getattr(m, "type", None) == "human"), len(kept) - 1)
+    return {**checkpoint, "channel_values": {**checkpoint["channel_values"], "messages": kept[start:]}}
+
+
+class BoundedMemorySaver(MemorySaver):
+    """
+    MemorySaver with a ceiling: at most `max_threads` threads (least recently used evicted first),
+    threads idle for `ttl_s` dropped, and only the newest `max_checkpoints_per_thread` checkpoints
+    (plus the channel blobs and pending writes they reference) kept per thread, each holding at most
+    `max_messages_per_thread` messages.
+
+    MemorySaver keeps every checkpoint of every thread forever and its delete_thread scans all
+    writes and blobs; here each thread indexes its own keys so pruning and eviction are O(thread).
+    """
+
+    def __init__(
+        self,
+        max_threads: int = 1000,
+        ttl_s: float = 3600.0,
+        max_checkpoints_per_thread: int = 4,
+        max_messages_per_thread: Optional[int] = 200,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.max_threads = max_threads
+        self.ttl_s = ttl_s
+        #the running step's parent must survive until the next checkpoint lands
+        self.max_checkpoints_per_thread = max(2, max_checkpoints_per_thread)
+        self.max_messages_per_thread = max_messages_per_thread
+        self._lock = threading.RLock()
+        self._last_used: "OrderedDict[str, float]" = OrderedDict()
+        #thread -> (ns, checkpoint id) -> channel versions, for blob garbage collection
+        self._versions: Dict[str, Dict[Tuple[str, str], dict]] = defaultdict(dict)
+        self._thread_blobs: Dict[str, Set[tuple]] = defaultdict(set)
+        self._thread_writes: Dict[str, Set[tuple]] = defaultdict(set)
+        self._evicted = {"lru": 0, "ttl": 0}
+        self._pruned = 0
+
+    def _touch(self, thread_id: str) -> None:
+        self._last_used[thread_id] = time.monotonic()
+        self._last_used.move_to_end(thread_id)
+
+    def _prune(self, thread_id: str, checkpoint_ns: str) -> None:
+        checkpoints = self.storage[thread_id][checkpoint_ns]
+        if len(checkpoints) <= self.max_checkpoints_per_thread:
+            return
+        versions = self._versions[thread_id]
+        #checkpoint ids are time-ordered (uuid6), oldest first
+        for checkpoint_id in sorted(checkpoints)[: -self.max_checkpoints_per_thread]:
+            del checkpoints[checkpoint_id]
+            versions.pop((checkpoint_ns, checkpoint_id), None)
+            key = (thread_id, checkpoint_ns, checkpoint_id)
+            self.writes.pop(key, None)
+            self._thread_writes[thread_id].discard(key)
+            self._pruned += 1
+        live = {
+            (thread_id, ns, channel, version)
+            for (ns, _), channels in versions.items() if ns == checkpoint_ns
+            for channel, version in channels.items()
+        }
+        blobs = self._thread_blobs[thread_id]
+        for key in [k for k in blobs if k[1] == checkpoint_ns and k not in live]:
+            self.blobs.pop(key, None)
+            blobs.discard(key)
+
+    def _evict(self) -> None:
+        now = time.monotonic()
+        while self._last_used:
+            thread_id, last_used = next(iter(self._last_used.items()))
+            if len(self._last_used) > self.max_threads:
+                self._evicted["lru"] += 1
+            elif now - last_used > self.ttl_s:
+                self._evicted["ttl"] += 1
+            else:
+                break
+            self.delete_thread(thread_id)
+
+    def sweep(self) -> None:
+        """
+        Drop idle threads now instead of on the next write.
+        """
+        with self._lock:
+            self._evict()
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        with self._lock:
+            thread_id = config["configurable"]["thread_id"]
+            #MemorySaver's defaultdicts create the thread on lookup, so it has to be tracked too
+            self._touch(thread_id)
+            return super().get_tuple(config)
+
+    def list(self, config: Optional[RunnableConfig], **kwargs: Any) -> Iterator[CheckpointTuple]:
+        with self._lock:
+            items = list(super().list(config, **kwargs))
+        yield from items
+
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        checkpoint = cap_messages(checkpoint, self.max_messages_per_thread)
+        with self._lock:
+            saved = super().put(config, checkpoint, metadata, new_versions)
+            thread_id = config["configurable"]["thread_id"]
+            checkpoint_ns = config["configurable"]["checkpoint_ns"]
+            self._versions[thread_id][(checkpoint_ns, checkpoint["id"])] = dict(checkpoint["channel_versions"])
+            self._thread_blobs[thread_id].update((thread_id, checkpoint_ns, k, v) for k, v in new_versions.items())
+            self._touch(thread_id)
+            self._prune(thread_id, checkpoint_ns)
+            self._evict()
+            return saved
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        with self._lock:
+            super().put_writes(config, writes, task_id, task_path)
+            thread_id, checkpoint_ns, checkpoint_id = _ids(config)
+            self._thread_writes[thread_id].add((thread_id, checkpoint_ns, checkpoint_id))
+            self._touch(thread_id)
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self.storage.pop(thread_id, None)
+            for key in self._thread_writes.pop(thread_id, ()):
+                self.writes.pop(key, None)
+            for key in self._thread_blobs.pop(thread_id, ()):
+                self.blobs.pop(key, None)
+            self._versions.pop(thread_id, None)
+            self._last_used.pop(thread_id, None)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "backend": "memory",
+                "threads": len(self.storage),
+                "checkpoints": sum(len(c) for ns in self.storage.values() for c in ns.values()),
+                "blobs": len(self.blobs),
+                "evicted": dict(self._evicted),
+                "pruned_checkpoints": self._pruned,
+            }
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE INDEX IF NOT EXISTS checkpoints_updated ON checkpoints (updated_at);
+"""
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver):
+    """
+    Checkpoints in a SQLite file (WAL) that every worker on the host can open.
+
+    put / put_writes only buffer; a background thread commits the buffer in one transaction every
+    `flush_interval_s` (or as soon as `batch_size` rows are waiting), then trims each thread it
+    touched to its newest `max_checkpoints_per_thread` checkpoints (each holding at most
+    `max_messages_per_thread` messages). Threads idle for `ttl_s` are
+    deleted by the same flusher. Reads see this worker's unflushed rows first, so a session
+    continues correctly on the worker that served its last turn and on any other worker once the
+    batch is committed (within `flush_interval_s`).
+    """
+
+    def __init__(
+        self,
+        path: str = "scripts_VS/checkpoints.sqlite",
+        max_checkpoints_per_thread: int = 4,
+        ttl_s: float = 24 * 3600.0,
+        batch_size: int = 256,
+        flush_interval_s: float = 0.05,
+        max_messages_per_thread: Optional[int] = 200,
+        **kwargs: Any,
+    ):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_checkpoints_per_thread = max(2, max_checkpoints_per_thread)
+        self.max_messages_per_thread = max_messages_per_thread
+        self.ttl_s = ttl_s
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        self._lock = threading.RLock()
+        self._checkpoints: Dict[Tuple[str, str, str], tuple] = {}
+        self._latest: Dict[Tuple[str, str], str] = {}
+        self._writes: Dict[tuple, Tuple[tuple, bool]] = {}
+        self._flushes = 0
+        self._rows_flushed = 0
+        self._last_sweep = time.time()
+        self._wake = threading.Event()
+        self._closed = threading.Event()
+        self._flusher = threading.Thread(target=self._flush_loop, name="checkpoint-flusher", daemon=True)
+        self._flusher.start()
+        atexit.register(self.close)
+
+    #buffered writes
+    def put(
+        self,
+        config: RunnableConfig,
+        checkpoint: Checkpoint,
+        metadata: CheckpointMetadata,
+        new_versions: ChannelVersions,
+    ) -> RunnableConfig:
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self.serde.dumps_typed(cap_messages(checkpoint, self.max_messages_per_thread))
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        row = (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+               type_, blob, metadata_type, metadata_blob, time.time())
+        with self._lock:
+            self._checkpoints[(thread_id, checkpoint_ns, checkpoint["id"])] = row
+            if checkpoint["id"] > self._latest.get((thread_id, checkpoint_ns), ""):
+                self._latest[(thread_id, checkpoint_ns)] = checkpoint["id"]
+            if len(self._checkpoints) + len(self._writes) >= self.batch_size:
+                self._wake.set()
+        return {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+
+    def put_writes(
+        self,
+        config: RunnableConfig,
+        writes: Sequence[Tuple[str, Any]],
+        task_id: str,
+        task_path: str = "",
+    ) -> None:
+        thread_id, checkpoint_ns, checkpoint_id = _ids(config)
+        #special channels (errors, interrupts) overwrite, regular writes are first-wins
+        replace = all(channel in WRITES_IDX_MAP for channel, _ in writes)
+        with self._lock:
+            for idx, (channel, value) in enumerate(writes):
+                idx = WRITES_IDX_MAP.get(channel, idx)
+                key = (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+                if key in self._writes and not replace:
+                    continue
+                type_, blob = self.serde.dumps_typed(value)
+                self._writes[key] = ((*key, channel, type_, blob, task_path), replace)
+            if len(self._checkpoints) + len(self._writes) >= self.batch_size:
+                self._wake.set()
+
+    def flush(self) -> int:
+        """
+        Commit everything buffered in one transaction; returns the number of rows written.
+        """
+        with self._lock:
+            if not self._checkpoints and not self._writes:
+                return 0
+            checkpoints = list(self._checkpoints.values())
+            writes = list(self._writes.values())
+            touched = {(row[0], row[1]) for row in checkpoints}
+            with self._conn:
+                self._conn.executemany("INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", checkpoints)
+                self._conn.executemany("INSERT OR REPLACE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       [row for row, replace in writes if replace])
+                self._conn.executemany("INSERT OR IGNORE INTO writes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       [row for row, replace in writes if not replace])
+                for thread_id, checkpoint_ns in touched:
+                    self._trim(thread_id, checkpoint_ns)
+            self._checkpoints.clear()
+            self._writes.clear()
+            self._latest.clear()
+            self._flushes += 1
+            self._rows_flushed += len(checkpoints) + len(writes)
+            return len(checkpoints) + len(writes)
+
+    def _trim(self, thread_id: str, checkpoint_ns: str) -> None:
+        keep = self._conn.execute(
+            "SELECT checkpoint_id FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC LIMIT 1 OFFSET ?",
+            (thread_id, checkpoint_ns, self.max_checkpoints_per_thread - 1),
+        ).fetchone()
+        if keep is None:
+            return
+        for table in ("checkpoints", "writes"):
+            self._conn.execute(
+                f"DELETE FROM {table} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id < ?",
+                (thread_id, checkpoint_ns, keep[0]),
+            )
+
+    def sweep(self) -> int:
+        """
+        Delete threads whose newest checkpoint is older than `ttl_s`; returns how many.
+        """
+        cutoff = time.time() - self.ttl_s
+        with self._lock, self._conn:
+            stale = [row[0] for row in self._conn.execute(
+                "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(updated_at) < ?", (cutoff,))]
+            for table in ("checkpoints", "writes"):
+                self._conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", [(t,) for t in stale])
+            self._last_sweep = time.time()
+            return len(stale)
+
+    def _flush_loop(self) -> None:
+        while not self._closed.is_set():
+            self._wake.wait(self.flush_interval_s)
+            self._wake.clear()
+            try:
+                self.flush()
+                if time.time() - self._last_sweep > min(self.ttl_s, 60.0):
+                    self.sweep()
+            except sqlite3.Error:
+                logger.exception("Checkpoint flush to %s failed, retrying", self.path)
+
+    def close(self) -> None:
+        if self._closed.is_set():
+            return
+        self._closed.set()
+        self._wake.set()
+        self._flusher.join(timeout=5)
+        with self._lock:
+            self.flush()
+            self._conn.close()
+
+    #reads
+    def _tuple(self, row: tuple, writes: List[tuple]) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, blob, metadata_type, metadata_blob = row[:8]
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id}},
+            checkpoint=self.serde.loads_typed((type_, blob)),
+            metadata=self.serde.loads_typed((metadata_type, metadata_blob)),
+            parent_config=(
+                {"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id}}
+                if parent_id else None
+            ),
+            pending_writes=[(task_id, channel, self.serde.loads_typed((t, v))) for task_id, channel, t, v in writes],
+        )
+
+    def _buffered_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> Dict[tuple, tuple]:
+        return {
+            key[3:]: (row[3], row[5], row[6], row[7])
+            for key, (row, _) in self._writes.items() if key[:3] == (thread_id, checkpoint_ns, checkpoint_id)
+        }
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id, checkpoint_ns, checkpoint_id = _ids(config)
+        with self._lock:
+            checkpoint_id = checkpoint_id or self._latest.get((thread_id, checkpoint_ns))
+            row = self._checkpoints.get((thread_id, checkpoint_ns, checkpoint_id)) if checkpoint_id else None
+            if row is None:
+                if checkpoint_id:
+                    row = self._conn.execute(
+                        "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                        (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+                else:
+                    row = self._conn.execute(
+                        "SELECT * FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                        "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+            writes = {
+                (task_id, idx): (task_id, channel, type_, value)
+                for task_id, idx, channel, type_, value in self._conn.execute(
+                    "SELECT task_id, idx, channel, type, value FROM writes "
+                    "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ? ORDER BY task_id, idx",
+                    (thread_id, checkpoint_ns, row[2]))
+            }
+            writes.update(self._buffered_writes(thread_id, checkpoint_ns, row[2]))
+        return self._tuple(row, list(writes.values()))
+
+    def list(
+        self,
+        config: Optional[RunnableConfig],
+        *,
+        filter: Optional[Dict[str, Any]] = None,
+        before: Optional[RunnableConfig] = None,
+        limit: Optional[int] = None,
+    ) -> Iterator[CheckpointTuple]:
+        self.flush()
+        clauses, params = [], []
+        if config:
+            clauses.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            if config["configurable"].get("checkpoint_ns") is not None:
+                clauses.append("checkpoint_ns = ?")
+                params.append(config["configurable"]["checkpoint_ns"])
+            if get_checkpoint_id(config):
+                clauses.append("checkpoint_id = ?")
+                params.append(get_checkpoint_id(config))
+        if before and get_checkpoint_id(before):
+            clauses.append("checkpoint_id < ?")
+            params.append(get_checkpoint_id(before))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        with self._lock:
+            rows = self._conn.execute(f"SELECT * FROM checkpoints {where} ORDER BY checkpoint_id DESC", params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            item = self.get_tuple({"configurable": {"thread_id": row[0], "checkpoint_ns": row[1], "checkpoint_id": row[2]}})
+            if item is None or filter and not all(item.metadata.get(k) == v for k, v in filter.items()):
+                continue
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            for key in [k for k in self._checkpoints if k[0] == thread_id]:
+                del self._checkpoints[key]
+            for key in [k for k in self._writes if k[0] == thread_id]:
+                del self._writes[key]
+            for key in [k for k in self._latest if k[0] == thread_id]:
+                del self._latest[key]
+            with self._conn:
+                for table in ("checkpoints", "writes"):
+                    self._conn.execute(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+
+    #async: buffered writes are in-memory, reads and deletes may hit the disk
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], **kwargs: Any) -> AsyncIterator[CheckpointTuple]:
+        for item in await asyncio.to_thread(lambda: list(self.list(config, **kwargs))):
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions) -> RunnableConfig:
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path: str = "") -> None:
+        self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    def stats(self) -> dict:
+        with self._lock:
+            threads, checkpoints = self._conn.execute(
+                "SELECT COUNT(DISTINCT thread_id), COUNT(*) FROM checkpoints").fetchone()
+            return {
+                "backend": "sqlite",
+                "threads": threads,
+                "checkpoints": checkpoints,
+                "buffered": len(self._checkpoints) + len(self._writes),
+                "flushes": self._flushes,
+                "rows_per_flush": self._rows_flushed / self._flushes if self._flushes else 0.0,
+            }
@@ -0,0 +1,204 @@
+import hashlib
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+_WORD = re.compile(r"\w+")
+# multiply-add hash family for minhash, fixed seed so signatures are comparable across workers
+_PERM_SEED = 12
+_MIN_OVERLAP_CHARS = 16
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    ~4 characters per token, the usual estimate for English text with BPE-style tokenizers.
+    """
+    return (len(text) + 3) // 4
+
+
+def _overlap(a: str, b: str, min_chars: int = _MIN_OVERLAP_CHARS) -> int:
+    """
+    Length of the longest suffix of `a` that is a prefix of `b` (the splitter's chunk_overlap).
+    """
+    if len(a) < min_chars or len(b) < min_chars:
+        return 0
+    head = b[:min_chars]
+    start = a.find(head, max(0, len(a) - len(b)))
+    while start != -1:
+        if b.startswith(a[start:]):
+            return len(a) - start
+        start = a.find(head, start + 1)
+    return 0
+
+
+@dataclass
+class ContextReport:
+    text: str
+    docs: List[Document]
+    raw_tokens: int
+    tokens: int
+    merged: int = 0
+    deduplicated: int = 0
+    over_budget: int = 0
+    ids: List[str] = field(default_factory=list)
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.raw_tokens - self.tokens
+
+
+class ContextAssembler:
+    """
+    Builds the {context} block for generate from retrieved chunks under a token budget.
+
+    1. Adjacent chunks of the same source and page (split with chunk_overlap, so each repeats the
+       end of the previous one) are stitched back into one passage with the overlap removed.
+    2. Passages whose word-shingle MinHash signatures estimate a Jaccard similarity of at least
+       `dedup_threshold` with a more relevant passage are dropped (re-uploads, near-copies).
+    3. What is left is packed greedily by relevance score (the retriever's fused score, else its
+       rank) until `token_budget` is used.
+    """
+
+    def __init__(
+        self,
+        token_budget: int = 2000,
+        dedup_threshold: float = 0.8,
+        num_perm: int = 64,
+        shingle_size: int = 5,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ):
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.shingle_size = shingle_size
+        self.count_tokens = count_tokens
+        rng = np.random.default_rng(_PERM_SEED)
+        self._mul = rng.integers(1, 2**63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self._add = rng.integers(0, 2**63, size=num_perm, dtype=np.uint64)
+        self._lock = threading.Lock()
+        self._calls = 0
+        self._raw_tokens = 0
+        self._tokens = 0
+        self._merged = 0
+        self._deduplicated = 0
+        self._over_budget = 0
+
+    def signature(self, text: str) -> np.ndarray:
+        words = _WORD.findall(text.lower())
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(1, len(words) - n + 1))}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+            dtype=np.uint64, count=len(shingles),
+        )
+        # uint64 arithmetic wraps, which is the mod 2**64 of the hash family
+        return (hashes[:, None] * self._mul[None, :] + self._add[None, :]).min(axis=0)
+
+    @staticmethod
+    def similarity(a: np.ndarray, b: np.ndarray) -> float:
+        return float(np.mean(a == b))
+
+    @staticmethod
+    def _scored(docs: List[Document]) -> List[Tuple[float, int, Document]]:
+        out = []
+        for rank, doc in enumerate(docs):
+            score = (doc.metadata or {}).get("relevance_score")
+            out.append((float(score) if score is not None else 1.0 / (rank + 1), rank, doc))
+        return out
+
+    def _merge_adjacent(self, scored: List[Tuple[float, int, Document]]) -> Tuple[List[dict], int]:
+        """
+        Passages {text, score, rank, docs}; chunks of one source/page merged where they overlap.
+        """
+        groups: Dict[Tuple[str, int], List[Tuple[float, int, Document]]] = {}
+        for item in scored:
+            meta = item[2].metadata or {}
+            groups.setdefault((str(meta.get("source", "")), meta.get("page", -1)), []).append(item)
+
+        passages, merged = [], 0
+        for items in groups.values():
+            #document order when the splitter recorded it, retrieval order otherwise
+            items.sort(key=lambda it: ((it[2].metadata or {}).get("start_index", it[1]), it[1]))
+            current = None
+            for score, rank, doc in items:
+                text = doc.page_content
+                if current is not None:
+                    if text in current["text"]:
+                        cut = len(text)
+                    else:
+                        cut = _overlap(current["text"], text)
+                    if cut:
+                        current["text"] += text[cut:]
+                        current["score"] = max(current["score"], score)
+                        current["rank"] = min(current["rank"], rank)
+                        current["docs"].append(doc)
+                        merged += 1
+                        continue
+                current = {"text": text, "score": score, "rank": rank, "docs": [doc]}
+                passages.append(current)
+        return passages, merged
+
+    def assemble(self, docs: List[Document], token_budget: Optional[int] = None) -> ContextReport:
+        budget = self.token_budget if token_budget is None else token_budget
+        raw_tokens = self.count_tokens("\n\n".join(d.page_content for d in docs))
+        passages, merged = self._merge_adjacent(self._scored(docs))
+        passages.sort(key=lambda p: (-p["score"], p["rank"]))
+
+        kept, signatures, deduplicated = [], [], 0
+        for passage in passages:
+            sig = self.signature(passage["text"])
+            if any(self.similarity(sig, other) >= self.dedup_threshold for other in signatures):
+                deduplicated += 1
+                continue
+            signatures.append(sig)
+            kept.append(passage)
+
+        packed, used, over_budget = [], 0, 0
+        for passage in kept:
+            tokens = self.count_tokens(passage["text"])
+            if used + tokens <= budget:
+                packed.append(passage)
+                used += tokens
+            elif not packed:
+                #the most relevant passage alone is over budget: keep its head rather than nothing
+                #(cut at the estimate_tokens ratio, re-counted below with count_tokens)
+                packed.append({**passage, "text": passage["text"][: budget * 4]})
+                used = self.count_tokens(packed[-1]["text"])
+            else:
+                over_budget += 1
+
+        text = "\n\n".join(p["text"] for p in packed)
+        report = ContextReport(
+            text=text,
+            docs=[d for p in packed for d in p["docs"]],
+            raw_tokens=raw_tokens,
+            tokens=self.count_tokens(text),
+            merged=merged,
+            deduplicated=deduplicated,
+            over_budget=over_budget,
+            ids=[d.id or (d.metadata or {}).get("chunk_id", "") for p in packed for d in p["docs"]],
+        )
+        with self._lock:
+            self._calls += 1
+            self._raw_tokens += report.raw_tokens
+            self._tokens += report.tokens
+            self._merged += merged
+            self._deduplicated += deduplicated
+            self._over_budget += over_budget
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "calls": self._calls,
+                "raw_tokens": self._raw_tokens,
+                "context_tokens": self._tokens,
+                "saved_tokens": self._raw_tokens - self._tokens,
+                "saved_ratio": 1 - self._tokens / self._raw_tokens if self._raw_tokens else 0.0,
+                "merged_chunks": self._merged,
+                "deduplicated": self._deduplicated,
+                "over_budget": self._over_budget,
+            }
@@ -0,0 +1,77 @@
+import threading
+from typing import List
+
+from langchain_core.messages import BaseMessage, RemoveMessage, SystemMessage
+
+from ragPipeline.context import estimate_tokens
+
+
+class ConversationWindow:
+    """
+    Keeps a session's history a constant size: the newest `window` messages verbatim, everything
+    older folded into a rolling summary.
+
+    Compaction waits until `compact_every` messages have piled up past the window, then asks the llm
+    to merge just those into the previous summary, so its cost doesn't grow with the conversation and
+    it runs once every few turns rather than on every turn.
+    """
+
+    def __init__(self, window: int = 8, compact_every: int = 4, summary_max_tokens: int = 300):
+        self.window = window
+        self.compact_every = compact_every
+        self.summary_max_tokens = summary_max_tokens
+        self._lock = threading.Lock()
+        self._compactions = 0
+        self._summarized = 0
+
+    def overflow(self, messages: List[BaseMessage]) -> List[BaseMessage]:
+        """
+        Messages due to be folded into the summary, oldest first ([] until enough have piled up).
+        """
+        if len(messages) <= self.window + self.compact_every:
+            return []
+        return messages[: len(messages) - self.window]
+
+    def summary_prompt(self, summary: str, dropped: List[BaseMessage]) -> list:
+        lines = "\n".join(f"{m.type}: {m.content}" for m in dropped)
+        return [{
+            "role": "user",
+            "content": (
+                f"Update the running summary of a clinical decision support conversation with the new lines below. "
+                f"Keep patient identifiers, symptoms, guideline recommendations and decisions; drop pleasantries. "
+                f"Answer with the updated summary only, at most {self.summary_max_tokens * 3 // 4} words.\n"
+                f"Current summary: {summary or '(none)'}\n"
+                f"New lines:\n{lines}"
+            )
+        }]
+
+    def compacted(self, summary: str, dropped: List[BaseMessage]) -> dict:
+        """
+        State update replacing `dropped` with the new summary.
+        """
+        #the llm doesn't always respect the length limit, the summary must not creep up turn by turn
+        summary = summary.strip()[: self.summary_max_tokens * 4]
+        with self._lock:
+            self._compactions += 1
+            self._summarized += len(dropped)
+        return {"summary": summary, "messages": [RemoveMessage(id=m.id) for m in dropped]}
+
+    def history(self, messages: List[BaseMessage], summary: str = "") -> List[BaseMessage]:
+        """
+        What the prompt gets before the current question: the summary, then the recent turns.
+        """
+        recent = list(messages[:-1][-self.window:])
+        if summary:
+            return [SystemMessage(f"Summary of the earlier conversation: {summary}")] + recent
+        return recent
+
+    def tokens(self, messages: List[BaseMessage], summary: str = "") -> int:
+        return sum(estimate_tokens(str(m.content)) for m in self.history(messages, summary))
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "window": self.window,
+                "compactions": self._compactions,
+                "summarized_messages": self._summarized,
+            }
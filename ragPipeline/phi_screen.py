@@ -0,0 +1,167 @@
+import json
+import logging
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# identifiers that are PHI whoever the patient is
+_PHI_PATTERNS: List[Tuple[str, "re.Pattern[str]"]] = [
+    ("mrn", re.compile(r"\b(?:MRN|medical record(?: number| no\.?)?)\s*[:#]?\s*[A-Z0-9-]{4,}\b", re.I)),
+    ("nhs_number", re.compile(r"\b\d{3}[ -]?\d{3}[ -]?\d{4}\b")),
+    ("ssn", re.compile(r"\b\d{3}-\d{2}-\d{4}\b")),
+    ("phone", re.compile(r"(?:\+\d{1,3}[\s.-]?)?\(?\b\d{3,5}\)?[\s.-]\d{3,4}[\s.-]?\d{3,4}\b")),
+    ("date", re.compile(
+        r"\b(?:\d{1,2}[/.-]\d{1,2}[/.-]\d{2,4}|\d{4}-\d{2}-\d{2}"
+        r"|\d{1,2}(?:st|nd|rd|th)? (?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]* \d{4}"
+        r"|(?:jan|feb|mar|apr|may|jun|jul|aug|sep|oct|nov|dec)[a-z]* \d{1,2}(?:st|nd|rd|th)?,? \d{4})\b",
+        re.I,
+    )),
+    ("email", re.compile(r"\b[\w.+-]+@[\w-]+\.[\w.-]+\b")),
+]
+
+
+class AhoCorasick:
+    """
+    Case-insensitive multi-pattern matcher: one pass over the text finds every occurrence of every
+    pattern, however many patients there are. Matches must sit on word boundaries.
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        # node i: goto[i] (char -> node), fail[i], out[i] (patterns ending here)
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[str]] = [[]]
+        for pattern in {p.lower() for p in patterns if p}:
+            node = 0
+            for ch in pattern:
+                nxt = self._goto[node].get(ch)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[node][ch] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append([])
+                node = nxt
+            self._out[node].append(pattern)
+        # breadth-first fail links, outputs inherited along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in self._goto[node].items():
+                queue.append(nxt)
+                fail = self._fail[node]
+                while fail and ch not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(ch, 0)
+                self._out[nxt] = self._out[nxt] + self._out[self._fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+    def find_all(self, text: str) -> List[Tuple[int, str]]:
+        """
+        (start offset, pattern) for every whole-word match.
+        """
+        lowered = text.lower()
+        goto, fail, out = self._goto, self._fail, self._out
+        matches = []
+        node = 0
+        for i, ch in enumerate(lowered):
+            while node and ch not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(ch, 0)
+            if out[node]:
+                for pattern in out[node]:
+                    start, end = i - len(pattern) + 1, i + 1
+                    if (start == 0 or not lowered[start - 1].isalnum()) and (end == len(lowered) or not lowered[end].isalnum()):
+                        matches.append((start, pattern))
+        return matches
+
+
+@dataclass
+class Finding:
+    kind: str
+    text: str
+    start: int
+
+
+def _patient_terms(patients: List[dict]) -> Dict[str, str]:
+    """
+    pattern -> kind, for names (full, and each part of 3+ letters) and patient ids.
+    """
+    terms: Dict[str, str] = {}
+    for patient in patients:
+        name = str(patient.get("name") or "").strip()
+        if name:
+            terms[name.lower()] = "patient_name"
+            for part in name.split():
+                if len(part) >= 3:
+                    terms.setdefault(part.lower(), "patient_name")
+        if patient.get("patient_id"):
+            terms[str(patient["patient_id"]).lower()] = "patient_id"
+    return terms
+
+
+class PhiScreen:
+    """
+    Local PHI pre-screen for generated answers, run before the LLM compliance review.
+
+    Known patient names and ids go through one Aho-Corasick pass; MRNs, NHS numbers, dates, phone
+    numbers and emails through regexes. Clean answers skip the LLM review (fast path), anything
+    flagged is escalated. stats() reports the fast-path rate and screening time per answer.
+    """
+
+    def __init__(self, patients: List[dict]):
+        self._kinds = _patient_terms(patients)
+        self._matcher = AhoCorasick(self._kinds)
+        self._lock = threading.Lock()
+        self._screened = 0
+        self._fast_path = 0
+        self._screen_ms: Deque[float] = deque(maxlen=10_000)
+
+    @classmethod
+    def from_patients_file(cls, path: str) -> "PhiScreen":
+        try:
+            with open(path, "r", encoding="utf-8") as fh:
+                patients = json.load(fh)
+        except FileNotFoundError:
+            logger.warning("Patients file %s not found, PHI screen only uses identifier patterns", path)
+            patients = []
+        return cls(patients)
+
+    def findings(self, text: str) -> List[Finding]:
+        found = [Finding(self._kinds[p], text[s:s + len(p)], s) for s, p in self._matcher.find_all(text)]
+        for kind, pattern in _PHI_PATTERNS:
+            found.extend(Finding(kind, m.group(0), m.start()) for m in pattern.finditer(text))
+        return sorted(found, key=lambda f: f.start)
+
+    def screen(self, text: str) -> List[Finding]:
+        """
+        Findings for `text` (empty = clean), counted towards stats().
+        """
+        start = time.perf_counter()
+        found = self.findings(text)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        with self._lock:
+            self._screened += 1
+            self._fast_path += not found
+            self._screen_ms.append(elapsed_ms)
+        return found
+
+    def stats(self) -> dict:
+        with self._lock:
+            screen_ms = sorted(self._screen_ms)
+            pct = lambda p: screen_ms[min(int(p * len(screen_ms)), len(screen_ms) - 1)] if screen_ms else 0.0
+            return {
+                "screened": self._screened,
+                "fast_path": self._fast_path,
+                "escalated": self._screened - self._fast_path,
+                "fast_path_rate": self._fast_path / self._screened if self._screened else 0.0,
+                "screen_ms_p50": pct(0.50),
+                "screen_ms_p99": pct(0.99),
+            }
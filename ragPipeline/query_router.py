@@ -0,0 +1,101 @@
+import json
+import re
+import threading
+import time
+from collections import Counter
+from typing import List, Tuple
+
+from langchain_core.documents import Document
+
+from ragPipeline.phi_screen import AhoCorasick
+from scripts.patient_store import PatientStore
+
+# anything shaped like a patient id (PT-105, MRN12345); confirmed against the store
+_ID_LIKE = re.compile(r"\b[A-Za-z]{1,5}-?\d{2,}\b")
+# questions that ask for a patient list ("which patients have hemoptysis?"), not for guidance about
+# a symptom ("when should hemoptysis be referred?", "what does NG12 say for patients with fatigue?")
+_FIND_PATIENTS = re.compile(r"\b(?:which|find|list|show|count|how\s+many)\b(?:\s+(?:me|all|the|of|our))*\s+patients?\b", re.I)
+
+
+class QueryRouter:
+    """
+    Finds the patient records a question is about; they are added to the vector retrieval results,
+    never used instead of them, so guideline evidence stays in the prompt.
+
+    A question naming a known patient_id gets those records (hash lookup). With `route_symptoms`, a
+    question that asks to find patients ("which patients have ...") and names known symptoms exactly
+    gets the patients with all of them (posting list intersection, capped at `limit` records plus a
+    count). Everything else routes to "vector" with no records.
+    """
+
+    def __init__(self, store: PatientStore, limit: int = 20, route_symptoms: bool = False):
+        self.store = store
+        self.limit = limit
+        self.route_symptoms = route_symptoms
+        self._symptoms = AhoCorasick(store.vocab["symptom"])
+        self._lock = threading.Lock()
+        self._routes: Counter = Counter()
+        self._lookup_ms = 0.0
+
+    def _document(self, record: dict, route: str) -> Document:
+        # generation in the id so cached answers go stale when patients.json changes
+        return Document(
+            id=f"patient:{record['patient_id']}@{self.store.generation}",
+            page_content=json.dumps(record),
+            metadata={"source": "patients.json", "patient_id": record["patient_id"], "route": route},
+        )
+
+    def _by_id(self, question: str) -> List[Document]:
+        docs, seen = [], set()
+        for candidate in _ID_LIKE.findall(question):
+            record = self.store.get(candidate.upper()) or self.store.get(candidate)
+            if record is not None and record["patient_id"] not in seen:
+                seen.add(record["patient_id"])
+                docs.append(self._document(record, "patient_id"))
+        return docs
+
+    def _by_symptom(self, question: str) -> List[Document]:
+        if not _FIND_PATIENTS.search(question):
+            return []
+        symptoms = sorted({pattern for _, pattern in self._symptoms.find_all(question)})
+        if not symptoms:
+            return []
+        rows = self.store.find(symptoms=symptoms)
+        if not len(rows):
+            return []
+        docs = [self._document(r, "symptom") for r in self.store.records(rows[: self.limit])]
+        if len(rows) > self.limit:
+            docs.insert(0, Document(
+                id=f"patient-count:{'|'.join(symptoms)}@{self.store.generation}",
+                page_content=f"{len(rows)} patients have {', '.join(symptoms)}; the first {self.limit} are listed.",
+                metadata={"source": "patients.json", "route": "symptom"},
+            ))
+        return docs
+
+    def route(self, question: str) -> Tuple[str, List[Document]]:
+        """
+        ("patient_id" | "symptom", records as documents) or ("vector", []); the records go into the
+        context next to the retrieved chunks.
+        """
+        start = time.perf_counter()
+        route, docs = "vector", []
+        if len(self.store):
+            docs = self._by_id(question)
+            if docs:
+                route = "patient_id"
+            elif self.route_symptoms:
+                docs = self._by_symptom(question)
+                route = "symptom" if docs else "vector"
+        with self._lock:
+            self._routes[route] += 1
+            self._lookup_ms += (time.perf_counter() - start) * 1000
+        return route, docs
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = sum(self._routes.values())
+            return {
+                "routed": dict(self._routes),
+                "direct_rate": 1 - self._routes["vector"] / total if total else 0.0,
+                "lookup_ms_avg": self._lookup_ms / total if total else 0.0,
+            }
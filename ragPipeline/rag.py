@@ -1,19 +1,37 @@
 from typing import Annotated
 from langchain_core.documents import Document
 from langchain_core.messages import AIMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langgraph.checkpoint.memory import MemorySaver
+from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
+from langchain_core.runnables import RunnableLambda
 from langgraph.graph import START, StateGraph, END
 from typing_extensions import List, TypedDict
 from langgraph.graph.message import add_messages
+import asyncio
+import hashlib
+import logging
+import os
 import sys
+import time
 from pathlib import Path
 
 sys.path.append(str(Path(__file__).resolve().parent.parent))
 
-from scripts.doc_retrieval import DocumentBaseRetriever
-from scripts.document_loader import DocumentLoader
+from scripts.doc_retrieval import DocumentBaseRetriever, sync_lexical_index
+from scripts.document_loader import VECTOR_STORE
+from scripts.embeddings import EMBEDDINGS
+from scripts.lazy import Lazy, warm_up as build_all
+from scripts.metrics import METRICS, observe_llm, observe_retrieval, timed
 from scripts.model import llm
+from ragPipeline.answer_cache import AnswerCache
+from ragPipeline.checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver, session_config
+from ragPipeline.context import ContextAssembler
+from ragPipeline.conversation import ConversationWindow
+from ragPipeline.phi_screen import PhiScreen
+from ragPipeline.query_router import QueryRouter
+from scripts.patient_store import PatientStore
+from scripts.ng12_rules import RuleTable
+
+logger = logging.getLogger(__name__)
 
 # define our system_prompt
 system_prompt = (
@@ -30,9 +48,67 @@ system_prompt = (
 # invoke a retriever and a prompt
 retriever = DocumentBaseRetriever()
 
+#cache finished answers so repeated questions over the same evidence skip the llm calls
+ANSWER_CACHE = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_SIZE", "512")),
+    ttl_s=float(os.getenv("ANSWER_CACHE_TTL_S", "3600")),
+    embed_query=lambda text: EMBEDDINGS.embed_query(text),
+    #cosine threshold for near-duplicate questions, 0 = exact matches only
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0")),
+)
+
+#stitch overlapping chunks, drop near-duplicates and pack the prompt context into a token budget
+CONTEXT_ASSEMBLER = ContextAssembler(
+    token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+    dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8")),
+)
+
+PATIENTS_FILE = os.getenv("PATIENTS_FILE", "data/patients.json")
+
+#the stores below are built on first use (or by warm_up), importing this module stays cheap
+#local phi pre-screen, only answers it flags go to the llm compliance review
+PHI_SCREEN = Lazy(lambda: PhiScreen.from_patients_file(PATIENTS_FILE), "PHI_SCREEN")
+PHI_SCREEN_ENABLED = os.getenv("PHI_SCREEN", "1") == "1"
+
+#records of the patients a question names (by id, or by symptom for "which patients ..." questions
+#with QUERY_ROUTER_SYMPTOMS=1) are looked up directly and added to the vector search results
+PATIENT_STORE = Lazy(
+    lambda: PatientStore.open_or_build(PATIENTS_FILE, os.getenv("PATIENT_STORE_DIR", "scripts_VS/patient_store")),
+    "PATIENT_STORE",
+)
+QUERY_ROUTER = Lazy(lambda: QueryRouter(
+    PATIENT_STORE,
+    limit=int(os.getenv("PATIENT_LOOKUP_LIMIT", "20")),
+    route_symptoms=os.getenv("QUERY_ROUTER_SYMPTOMS", "0") == "1",
+), "QUERY_ROUTER")
+
+#NG12 recommendations compiled to a rule table (recompiled when the pdf changes) for llm-free assessments
+NG12_PDF = os.getenv("NG12_PDF", "data/NG12_pdf.pdf")
+RULE_TABLE = Lazy(
+    lambda: RuleTable.open_or_build(NG12_PDF, os.getenv("NG12_RULES_TABLE", "scripts_VS/ng12_rules.json")),
+    "RULE_TABLE",
+)
+RULE_FAST_PATH = os.getenv("RULE_FAST_PATH", "1") == "1"
+
+#session history: recent turns verbatim, older ones compacted into a rolling summary
+CONVERSATION = ConversationWindow(
+    window=int(os.getenv("HISTORY_WINDOW", "8")),
+    compact_every=int(os.getenv("HISTORY_COMPACT_EVERY", "4")),
+    summary_max_tokens=int(os.getenv("HISTORY_SUMMARY_TOKENS", "300")),
+)
+
+#node / llm / retriever / embedding latency and token histograms are defined in scripts.metrics;
+#the outcomes below are specific to this graph. All of it is served by GET /metrics
+REVIEWS = METRICS.counter("rag_double_check_reviews", "double_check llm reviews by outcome.", ["issues"])
+METRICS.collect("rag_answer_cache", ANSWER_CACHE.stats)
+METRICS.collect("rag_context", CONTEXT_ASSEMBLER.stats)
+METRICS.collect("rag_conversation", CONVERSATION.stats)
+
+
 prompt = ChatPromptTemplate.from_messages(
     [
         ("system", system_prompt),
+        MessagesPlaceholder("history", optional=True),
         ("human", "{question}")
     ]
 )
@@ -44,92 +120,301 @@ class State(TypedDict):
     answer: str
     issues_report: str
     issues_detected: str
+    cache_hit: bool
+    phi_flagged: bool
+    route: str
+    records: List[Document]
+    summary: str
     messages: Annotated[list, add_messages]
 
 # defining my 4 nodes for retrieval in langgraph for retrieve, generate, double_check, and doc_finalizer
 
-#start with retrieval
+def chunk_ids(docs: List[Document]) -> List[str]:
+    return [doc.id or doc.metadata.get("chunk_id") or doc.page_content for doc in docs]
+
+def cache_evidence(state: State) -> List[str]:
+    """
+    What an answer was generated from besides the question: the retrieved chunk ids, and a
+    fingerprint of the session history/summary the prompt carried. A follow-up ("what should happen
+    next for her?") only reuses an answer given after the same conversation.
+    """
+    evidence = chunk_ids(state["context"])
+    history = CONVERSATION.history(state["messages"], state.get("summary", ""))
+    if history:
+        digest = hashlib.sha256("\x1e".join(f"{m.type}:{m.content}" for m in history).encode("utf-8"))
+        evidence.append(f"history:{digest.hexdigest()}")
+    return evidence
+
+#every llm call goes through these, latency and token counts land in rag_llm_* by calling node;
+#`llm` is looked up per call so a replaced module global (tests, benchmarks) is measured too
+def call_llm(caller: str, prompt):
+    start = time.perf_counter()
+    response = llm.invoke(prompt)
+    observe_llm(caller, start, prompt, response)
+    return response
+
+async def acall_llm(caller: str, prompt):
+    start = time.perf_counter()
+    response = await llm.ainvoke(prompt)
+    observe_llm(caller, start, prompt, response)
+    return response
+
+#fold turns that fell out of the window into the summary, keeps the thread and the prompt bounded
+def compact_history(state: State):
+    dropped = CONVERSATION.overflow(state["messages"])
+    if not dropped:
+        return None
+    return CONVERSATION.compacted(call_llm("compact_history", CONVERSATION.summary_prompt(state.get("summary", ""), dropped)).content, dropped)
+
+async def acompact_history(state: State):
+    dropped = CONVERSATION.overflow(state["messages"])
+    if not dropped:
+        return None
+    return CONVERSATION.compacted((await acall_llm("compact_history", CONVERSATION.summary_prompt(state.get("summary", ""), dropped))).content, dropped)
+
+#look up the patients a question names before retrieval; their records join the retrieved chunks
+def route_query(state: State):
+    question = state["messages"][-1].content
+    route, docs = QUERY_ROUTER.route(question)
+    if docs:
+        logger.debug("patient store: %s, %d records", route, len(docs))
+    return {"question": question, "route": route, "records": docs}
+
+async def aroute_query(state: State):
+    return route_query(state)
+
+def with_records(state: State, retrieved_docs: List[Document]) -> List[Document]:
+    records = state.get("records") or []
+    seen = {doc.id for doc in records}
+    return records + [doc for doc in retrieved_docs if doc.id is None or doc.id not in seen]
+
+#retrieval always runs, a question about a patient still needs the guideline text
 def retrieve(state: State):
-    retrieved_docs = retriever.invoke(state["messages"][-1].content)
-    print(retrieved_docs)
-    return {"context": retrieved_docs}
+    question = state["messages"][-1].content
+    start = time.perf_counter()
+    retrieved_docs = retriever.invoke(question)
+    observe_retrieval("retrieve", start, retrieved_docs)
+    return {"question": question, "context": with_records(state, retrieved_docs)}
+
+async def aretrieve(state: State):
+    question = state["messages"][-1].content
+    start = time.perf_counter()
+    retrieved_docs = await retriever.ainvoke(question)
+    observe_retrieval("retrieve", start, retrieved_docs)
+    return {"question": question, "context": with_records(state, retrieved_docs)}
+
+#reuse a finished answer for the same question over the same retrieved chunks and conversation
+def check_cache(state: State):
+    cached = ANSWER_CACHE.get(state["question"], cache_evidence(state))
+    if cached is None:
+        return {"cache_hit": False}
+    return {
+        "answer": cached["answer"],
+        "issues_report": cached["issues_report"],
+        "issues_detected": cached["issues_detected"],
+        "cache_hit": True,
+        "messages": [AIMessage(cached["final"])]
+    }
+
+async def acheck_cache(state: State):
+    #a near-duplicate lookup may embed the question, keep that off the event loop
+    return await asyncio.to_thread(check_cache, state)
+
+def route_after_cache(state: State):
+    return END if state["cache_hit"] else "generate"
 
 #generate function
+def _generate_messages(state: State):
+    packed = CONTEXT_ASSEMBLER.assemble(state["context"])
+    logger.debug("context: %d tokens (raw %d, %d merged, %d duplicates)", packed.tokens, packed.raw_tokens, packed.merged, packed.deduplicated)
+    return prompt.invoke({
+        "question": state["question"],
+        "context": packed.text,
+        "history": CONVERSATION.history(state["messages"], state.get("summary", "")),
+    })
+
 def generate(state: State):
-    docs_content = "\n\n".join(doc.page_content for doc in state["context"])
-    messages = prompt.invoke(
-        {"question": state["messages"][-1].content, "context": docs_content}
-    )
-    response = llm.invoke(messages)
-    print(response.content)
+    response = call_llm("generate", _generate_messages(state))
+    return {"answer": response.content}
+
+async def agenerate(state: State):
+    response = await acall_llm("generate", _generate_messages(state))
     return {"answer": response.content}
 
+#screen the answer locally before paying for the llm review
+def phi_screen(state: State):
+    if not PHI_SCREEN_ENABLED:
+        return {"phi_flagged": True}
+    findings = PHI_SCREEN.screen(state["answer"])
+    if findings:
+        logger.debug("phi screen flagged: %s", sorted({f.kind for f in findings}))
+        return {"phi_flagged": True}
+    #clean answers skip double_check
+    return {"phi_flagged": False, "issues_report": "", "issues_detected": False}
+
+async def aphi_screen(state: State):
+    return phi_screen(state)
+
+def route_after_screen(state: State):
+    return "double_check" if state["phi_flagged"] else "doc_finalizer"
+
 #add validation content check
 #in production I would implement human in the loop techniques as a verification process, 
 # here in this instance I will just use an llm to implement verfication of content issues
 # implment validation with a thinking step
-def double_check(state: State):
-    result = llm.invoke([{
+def _review_messages(state: State):
+    return [{
         "role": "user",
         "content": (
             f"Review the following clinical decision support project for any violations of HIPAA compliance rules for quality assurance, PHI/PII breach of security, and clinical delivery standards that align with a high level of patient care."
             f"Return 'ISSUES FOUND' followed by any issues detected or 'NO ISSUES': {state['answer']}"
         )
-    }]) 
+    }]
+
+def _parse_review(content: str):
     #extract actual response after thinking block
-    content = result.content
     if "</think>" in content:
         actual_response = content.split("</think>", 1)[1].strip()
     else:
         actual_response = content.strip()
 
     if "ISSUES FOUND" in actual_response:
-        print("issues detected")
+        REVIEWS.inc(issues="found")
         return {
             "issues_report": actual_response.split("ISSUES FOUND", 1)[1].strip(),
             "issues_detected": True
         }
-    print("no issues detected")
+    REVIEWS.inc(issues="none")
     return {
         "issues_report": "",
         "issues_detected": False
     }
 
+def double_check(state: State):
+    return _parse_review(call_llm("double_check", _review_messages(state)).content)
+
+async def adouble_check(state: State):
+    return _parse_review((await acall_llm("double_check", _review_messages(state))).content)
+
 
 # final node to integrate feedback to produce finalized, compliant docs
 #feedback looping functions to mimic feedback loop for patient order placement or clinical decision workflow steps for patient care
+def _revision_messages(state: State):
+    return [{
+        "role": "user",
+        "content": (
+            f"Revise the following patient document to address these feedback points:{state['issues_report']}\n"
+            f"Original Document: {state['answer']}\n"
+            f"Always return the full revised document, even if no changes are needed."
+
+        )
+    }]
+
+def _needs_revision(state: State) -> bool:
+    return "issues_detected" in state and state["issues_detected"]
+
+def _finalized(state: State, final: str):
+    ANSWER_CACHE.put(state["question"], cache_evidence(state), {
+        "answer": state["answer"],
+        "issues_report": state["issues_report"],
+        "issues_detected": state["issues_detected"],
+        "final": final,
+    })
+    return {
+        "messages": [AIMessage(final)]
+    }
+
 def doc_finalizer(state: State):
     """
     Finalize patient user query by integrating feedback.
     """
-    if "issues_detected" in state and state["issues_detected"]:
-        response = llm.invoke(
-            [{
-                "role": "user",
-                "content": (
-                    f"Revise the following patient document to address these feedback points:{state['issues_report']}\n"
-                    f"Original Document: {state['answer']}\n"
-                    f"Always return the full revised document, even if no changes are needed."
-
-                )
-            }]
-        )
-        return {
-            "messages": [AIMessage(response.content)]
-        }
-    return {
-        "messages": [AIMessage(state["answer"])]
-    }
+    if _needs_revision(state):
+        return _finalized(state, call_llm("doc_finalizer", _revision_messages(state)).content)
+    return _finalized(state, state["answer"])
+
+async def adoc_finalizer(state: State):
+    """
+    Async doc_finalizer, the revision call doesn't block the event loop.
+    """
+    if _needs_revision(state):
+        return _finalized(state, (await acall_llm("doc_finalizer", _revision_messages(state))).content)
+    return _finalized(state, state["answer"])
+
+def node(name: str, func, afunc):
+    """
+    Graph node with both bodies timed into rag_node_seconds.
+    """
+    return RunnableLambda(timed(name, func), afunc=timed(name, afunc))
 
 # build our knowledge graph to passs to agent
-graph_builder = StateGraph(State).add_sequence(
-    [retrieve, generate, double_check, doc_finalizer])
+#each node has a sync and an async body: graph.invoke runs the former, graph.ainvoke the latter
+graph_builder = StateGraph(State)
+graph_builder.add_sequence([
+    ("compact_history", node("compact_history", compact_history, acompact_history)),
+    ("route_query", node("route_query", route_query, aroute_query)),
+    ("retrieve", node("retrieve", retrieve, aretrieve)),
+    ("check_cache", node("check_cache", check_cache, acheck_cache)),
+])
+graph_builder.add_sequence([
+    ("generate", node("generate", generate, agenerate)),
+    ("phi_screen", node("phi_screen", phi_screen, aphi_screen)),
+])
+graph_builder.add_sequence([
+    ("double_check", node("double_check", double_check, adouble_check)),
+    ("doc_finalizer", node("doc_finalizer", doc_finalizer, adoc_finalizer)),
+])
 
-graph_builder.add_edge(START, "retrieve")
+graph_builder.add_edge(START, "compact_history")
+graph_builder.add_conditional_edges("check_cache", route_after_cache, ["generate", END])
+graph_builder.add_conditional_edges("phi_screen", route_after_screen, ["double_check", "doc_finalizer"])
 graph_builder.add_edge("doc_finalizer", END)
-memory = MemorySaver()
+
+#one checkpoint thread per chat session, bounded: idle/least recently used threads are evicted and
+#each thread keeps only its newest checkpoints. CHECKPOINTER=sqlite shares them between workers
+CHECKPOINT_MAX_PER_THREAD = int(os.getenv("CHECKPOINT_MAX_PER_THREAD", "4"))
+CHECKPOINT_TTL_S = float(os.getenv("CHECKPOINT_TTL_S", "3600"))
+#backstop only: compact_history keeps a session to HISTORY_WINDOW messages plus the summary
+CHECKPOINT_MAX_MESSAGES = int(os.getenv("CHECKPOINT_MAX_MESSAGES", "200")) or None
+if os.getenv("CHECKPOINTER", "memory") == "sqlite":
+    memory = SQLiteCheckpointSaver(
+        os.getenv("CHECKPOINT_DB", "scripts_VS/checkpoints.sqlite"),
+        max_checkpoints_per_thread=CHECKPOINT_MAX_PER_THREAD,
+        max_messages_per_thread=CHECKPOINT_MAX_MESSAGES,
+        ttl_s=CHECKPOINT_TTL_S,
+        batch_size=int(os.getenv("CHECKPOINT_BATCH_SIZE", "256")),
+    )
+else:
+    memory = BoundedMemorySaver(
+        max_threads=int(os.getenv("CHECKPOINT_MAX_THREADS", "1000")),
+        ttl_s=CHECKPOINT_TTL_S,
+        max_checkpoints_per_thread=CHECKPOINT_MAX_PER_THREAD,
+        max_messages_per_thread=CHECKPOINT_MAX_MESSAGES,
+    )
 graph = graph_builder.compile(checkpointer=memory)
-config = {"configurable": {"thread_id": "abc123"}}
+METRICS.collect("rag_checkpointer", memory.stats)
+#default session for single-user callers (UI/gradio.py); the api passes its own session ids
+config = session_config("default")
+
+
+def warm_up() -> dict:
+    """
+    Build the lazy singletons (clients, stores, rule table, lexical index) now instead of on the
+    first request. Returns build milliseconds per singleton; ones a caller replaced are skipped.
+    """
+    timings = build_all({
+        "llm": llm,
+        "EMBEDDINGS": EMBEDDINGS,
+        "VECTOR_STORE": VECTOR_STORE,
+        "PHI_SCREEN": PHI_SCREEN,
+        "PATIENT_STORE": PATIENT_STORE,
+        "QUERY_ROUTER": QUERY_ROUTER,
+        "RULE_TABLE": RULE_TABLE,
+    })
+    if isinstance(VECTOR_STORE, Lazy):
+        start = time.perf_counter()
+        sync_lexical_index()
+        timings["LEXICAL_INDEX"] = round((time.perf_counter() - start) * 1000, 1)
+    return timings
 
 
 # test query
@@ -1,4 +1,17 @@
-from scripts.doc_retrieval import DocumentBaseRetriever
-from scripts.embeddings import EMBEDDINGS
-from scripts.model import llm
-from scripts.document_loader import load_document 
\ No newline at end of file
+import importlib
+
+#re-exports are resolved on first access (PEP 562): `import scripts.fakes` or `scripts.patient_store`
+#shouldn't drag in the retriever, vector store and google clients
+_EXPORTS = {
+    "DocumentBaseRetriever": "scripts.doc_retrieval",
+    "EMBEDDINGS": "scripts.embeddings",
+    "llm": "scripts.model",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name in _EXPORTS:
+        return getattr(importlib.import_module(_EXPORTS[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,155 @@
+import io
+import math
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+from scripts.mmr import top_k
+
+# like scripts.mmr, everything here expects L2-normalized float32 rows (cosine = dot product)
+
+#rows scored per matmul block when assigning rows to centroids, bounds the (block, nlist) score matrix
+_ASSIGN_BLOCK_FLOATS = 1 << 24
+
+
+def default_nlist(count: int) -> int:
+    """
+    ~4 sqrt(n) lists: a few hundred rows per list at 1M chunks, a handful of lists at 10k.
+    """
+    return max(1, min(count, int(4 * math.sqrt(count))))
+
+
+def _normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Index of the most similar centroid for every row, in blocks so memory stays flat.
+    """
+    out = np.empty(len(vectors), dtype=np.int32)
+    block = max(1, _ASSIGN_BLOCK_FLOATS // max(1, len(centroids)))
+    for start in range(0, len(vectors), block):
+        out[start:start + block] = np.argmax(np.asarray(vectors[start:start + block]) @ centroids.T, axis=1)
+    return out
+
+
+def spherical_kmeans(sample: np.ndarray, nlist: int, iters: int = 8, seed: int = 0) -> np.ndarray:
+    """
+    k-means on the unit sphere (centroids re-normalized each round). Empty lists are re-seeded from
+    random sample rows so every centroid ends up owning rows.
+    """
+    rng = np.random.default_rng(seed)
+    sample = np.asarray(sample, dtype=np.float32)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+    for _ in range(iters):
+        assign = nearest_centroids(sample, centroids)
+        order = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=nlist)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.add.reduceat(sample[order], starts[filled], axis=0)
+        centroids[filled] = _normalize_rows(sums)
+        empty = np.flatnonzero(~filled)
+        if len(empty):
+            centroids[empty] = sample[rng.choice(len(sample), len(empty), replace=False)]
+    return centroids
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over the rows of one vector matrix.
+
+    k-means centroids split the rows into `nlist` lists; a query scores the centroids, then only the
+    rows of its `nprobe` nearest lists, instead of every row. The index itself is just the centroids
+    and one list id per row, so a new index generation after inserts/deletes is the old assignment
+    with deleted rows dropped and new rows assigned to their nearest centroid (`updated`), no
+    retraining. `trained_count` lets the owner retrain once the corpus has outgrown the centroids.
+    """
+
+    def __init__(self, centroids: np.ndarray, assign: np.ndarray, trained_count: int):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assign = np.asarray(assign, dtype=np.int32)
+        self.trained_count = trained_count
+        self._lists: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def __len__(self) -> int:
+        return len(self.assign)
+
+    @classmethod
+    def train(
+        cls,
+        matrix: np.ndarray,
+        nlist: Optional[int] = None,
+        iters: int = 8,
+        sample_per_list: int = 64,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        """
+        Fit centroids on a random sample of `matrix` (`sample_per_list` rows per list) and assign every row.
+        """
+        count = len(matrix)
+        nlist = nlist or default_nlist(count)
+        rng = np.random.default_rng(seed)
+        size = min(count, nlist * sample_per_list)
+        rows = np.sort(rng.choice(count, size, replace=False)) if size < count else np.arange(count)
+        centroids = spherical_kmeans(np.asarray(matrix[rows]), nlist, iters, seed)
+        return cls(centroids, nearest_centroids(matrix, centroids), count)
+
+    def updated(self, keep_rows: np.ndarray, new_vectors: np.ndarray) -> "IVFIndex":
+        """
+        Index for the next generation: kept rows (in their new order) followed by the inserted rows.
+        """
+        assign = self.assign[keep_rows] if len(keep_rows) else np.zeros(0, dtype=np.int32)
+        if len(new_vectors):
+            assign = np.concatenate((assign, nearest_centroids(new_vectors, self.centroids)))
+        return IVFIndex(self.centroids, assign, self.trained_count)
+
+    def _inverted_lists(self) -> Tuple[np.ndarray, np.ndarray]:
+        #(rows grouped by list, list start offsets), built on the first search of this generation
+        if self._lists is None:
+            order = np.argsort(self.assign, kind="stable").astype(np.int64)
+            offsets = np.concatenate(([0], np.cumsum(np.bincount(self.assign, minlength=self.nlist))))
+            self._lists = (order, offsets)
+        return self._lists
+
+    def candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Rows in the `nprobe` lists whose centroids are closest to `query`, ascending.
+        """
+        order, offsets = self._inverted_lists()
+        probes = top_k(self.centroids @ query, nprobe)
+        rows = np.concatenate([order[offsets[p]:offsets[p + 1]] for p in probes])
+        #ascending row order keeps the gather from the mmap'd matrix sequential
+        rows.sort()
+        return rows
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int, nprobe: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (rows, scores) of the approximate top k for one normalized query, best first.
+        """
+        rows = self.candidates(query, nprobe)
+        scores = np.asarray(matrix[rows]) @ query
+        best = top_k(scores, k)
+        return rows[best], scores[best]
+
+    def search_batch(self, matrix: np.ndarray, queries: np.ndarray, k: int, nprobe: int) -> List[Tuple[np.ndarray, np.ndarray]]:
+        return [self.search(matrix, query, k, nprobe) for query in queries]
+
+    def to_bytes(self) -> bytes:
+        buffer = io.BytesIO()
+        np.savez(buffer, centroids=self.centroids, assign=self.assign, trained_count=np.int64(self.trained_count))
+        return buffer.getvalue()
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["assign"], int(data["trained_count"]))
@@ -1,60 +1,277 @@
+import json
+import logging
 import os
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Any
-import tempfile
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
 from langchain_core.callbacks import CallbackManagerForRetrieverRun
 from langchain_core.documents import Document
 from langchain_core.retrievers import BaseRetriever
-from langchain_community.retrievers import BM25Retriever
-from langchain_core.vectorstores import InMemoryVectorStore
-from langchain_text_splitters.character import RecursiveCharacterTextSplitter
+from pydantic import Field
 
 #module imports
-from scripts.embeddings import EMBEDDINGS
 from scripts.document_loader import VECTOR_STORE, split_documents
+from scripts.ingest_manifest import IngestManifest, chunk_id, file_sha256, pdf_page_hashes
+from scripts.ingestion import ingest_pdf
+from scripts.lexical_index import InvertedIndex
 
-def store_documents(docs: List[Document]) -> List[Document]:
+logger = logging.getLogger(__name__)
+
+# sparse--lexical index for exact keyword hits (clinical terms embeddings tend to blur)
+LEXICAL_INDEX = InvertedIndex()
+
+# what has already been indexed--makes re-uploads/reruns a no-op
+MANIFEST = IngestManifest(os.getenv("INGEST_MANIFEST", "scripts_VS/ingest_manifest.json"))
+# streamlit hands us in-memory uploads, spool them here so they can be hashed like any other file
+UPLOAD_CACHE_DIR = Path(os.getenv("UPLOAD_CACHE_DIR", "cache_uploads"))
+
+# dense + sparse searches run side by side
+_SEARCH_POOL = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVER_SEARCH_THREADS", "8")))
+
+
+def sync_lexical_index() -> None:
   """
-  Adding my docs to vector store.
+  Catch the lexical index up with rows other workers published to VECTOR_STORE.
+  """
+  snap = VECTOR_STORE.snapshot()
+  if LEXICAL_INDEX.generation == snap.generation:
+    return
+  live = set()
+  for row in snap.rows():
+    live.add(row["id"])
+    if row["id"] not in LEXICAL_INDEX:
+      LEXICAL_INDEX.add(row["id"], row["text"], row["metadata"])
+  LEXICAL_INDEX.remove([doc_id for doc_id in LEXICAL_INDEX.ids() if doc_id not in live])
+  LEXICAL_INDEX.generation = snap.generation
+
+
+def stage_documents(docs: List[Document]) -> Tuple[List[Document], Optional[np.ndarray]]:
+  """
+  Split and embed docs without making them searchable; publish_documents does that.
   """
   chunks = split_documents(docs)
-  for i, d in enumerate(chunks):
-       d.metadata = {**(d.metadata or {}), "chunk_id": str(i)}
-  VECTOR_STORE.add_documents(chunks)
+  # stable ids: re-indexing the same text at the same source/page replaces the row instead of duplicating it
+  seen: Dict[Tuple[str, int, str], int] = defaultdict(int)
+  for d in chunks:
+       d.metadata = d.metadata or {}
+       key = (str(d.metadata.get("source", "")), int(d.metadata.get("page", 0)), d.page_content)
+       d.metadata["chunk_id"] = chunk_id(*key, occurrence=seen[key])
+       seen[key] += 1
+       d.id = d.metadata["chunk_id"]
+  if not chunks:
+    return chunks, None
+  return chunks, VECTOR_STORE.embed_texts([d.page_content for d in chunks])
+
+
+def publish_documents(chunks: List[Document], vectors: Optional[np.ndarray], delete_ids: Sequence[str] = ()) -> None:
+  """
+  Write staged chunks and drop `delete_ids` in vector store + lexical index, as one index generation.
+  """
+  if not chunks and not delete_ids:
+    return
+  generation = VECTOR_STORE.snapshot().generation
+  VECTOR_STORE.commit(
+    [d.page_content for d in chunks], [d.metadata for d in chunks], [d.id for d in chunks], vectors, delete_ids)
+  # incremental update when nobody else wrote in between, otherwise a full catch-up on next search
+  if LEXICAL_INDEX.generation == generation and VECTOR_STORE.snapshot().generation == generation + 1:
+    LEXICAL_INDEX.remove(delete_ids)
+    LEXICAL_INDEX.add_documents(chunks)
+    LEXICAL_INDEX.generation = generation + 1
+
+
+def store_documents(docs: List[Document]) -> List[Document]:
+  """
+  Adding my docs to vector store + lexical index.
+  """
+  chunks, vectors = stage_documents(docs)
+  publish_documents(chunks, vectors)
+  return chunks
+
+
+def delete_documents(ids: List[str]) -> None:
+  """
+  Drop chunks from vector store + lexical index.
+  """
+  publish_documents([], None, ids)
+
+
+def _json_documents(file_path: str) -> List[Document]:
+  with open(file_path) as f:
+    records = json.load(f)
+  records = records if isinstance(records, list) else [records]
+  return [
+    Document(page_content=json.dumps(r), metadata={"source": file_path, "page": 0, "record": i})
+    for i, r in enumerate(records)
+  ]
+
+
+def index_file(file_path: str, progress: Optional[Callable[[dict], None]] = None) -> List[Document]:
+  """
+  Content-addressed ingestion of one pdf/json file.
+
+  Unchanged files (or byte-identical copies under another name) are skipped. For a changed pdf only
+  pages whose hash changed are re-extracted, and their old chunks are replaced. Nothing is searchable
+  until the whole file is embedded: new chunks and the removal of stale ones are published together.
+  `progress` gets {"pages_total", "pages_done", "chunks"} as extraction and embedding advance.
+  Returns the newly written chunks.
+  """
+  if MANIFEST.is_unchanged(file_path):
+    logger.info("Skipping %s, already indexed", file_path)
+    return []
+  sha256 = file_sha256(file_path)
+  duplicate_of = MANIFEST.source_for_hash(sha256)
+  if duplicate_of is not None and duplicate_of != file_path:
+    logger.info("Skipping %s, same content as %s", file_path, duplicate_of)
+    return []
+
+  previous = MANIFEST.get(file_path) or {"pages": {}, "chunks": {}}
+  if Path(file_path).suffix.lower() == ".json":
+    page_hashes = {0: sha256}
+  else:
+    page_hashes = dict(enumerate(pdf_page_hashes(file_path)))
+  changed = [p for p, h in page_hashes.items() if previous["pages"].get(str(p)) != h]
+  gone = [int(p) for p in previous["pages"] if int(p) not in page_hashes]
+
+  report = {"pages_total": len(changed), "pages_done": 0, "chunks": 0}
+  vectors: List[np.ndarray] = []
+
+  def advance(key: str, amount: int) -> None:
+    report[key] += amount
+    if progress is not None:
+      progress(dict(report))
+
+  def stage(docs: List[Document]) -> List[Document]:
+    staged, staged_vectors = stage_documents(docs)
+    if staged:
+      vectors.append(staged_vectors)
+    advance("chunks", len(staged))
+    return staged
+
+  if not changed:
+    chunks = []
+  elif Path(file_path).suffix.lower() == ".json":
+    chunks = stage(_json_documents(file_path))
+    advance("pages_done", 1)
+  else:
+    # pages are split + embedded while the rest of the pdf is still being extracted
+    chunks = ingest_pdf(file_path, store=stage, pages=changed, on_pages=lambda group: advance("pages_done", len(group)))
+
+  new_ids = defaultdict(list)
+  for c in chunks:
+    new_ids[int(c.metadata.get("page", 0))].append(c.id)
+  stale = {cid for p in changed + gone for cid in previous["chunks"].get(str(p), [])}
+  publish_documents(chunks, np.vstack(vectors) if vectors else None, sorted(stale - {c.id for c in chunks}))
+
+  page_chunks = {int(p): ids for p, ids in previous["chunks"].items() if int(p) in page_hashes}
+  for p in changed:
+    page_chunks[p] = new_ids.get(p, [])
+  with MANIFEST.transaction() as data:
+    IngestManifest.record(data, file_path, sha256, page_hashes, page_chunks)
+  logger.info("Indexed %s: %d/%d pages changed, %d chunks written, %d stale removed",
+              file_path, len(changed), len(page_hashes), len(chunks), len(stale))
   return chunks
 
 
-docs = [Document(page_content=text, metadata={"id": str(i)}) for i, text in enumerate()]
-#dense retriever
-dense_retriever = VECTOR_STORE.as_retriever(search_kwargs={"k": 10})
-#sparse retriever
-sparse_retriever = BM25Retriever.from_documents(documents=documents, k=10)
+def _materialize(upload: Any) -> str:
+  """
+  Path for an uploaded file; in-memory uploads (e.g. streamlit UploadedFile) are spooled to disk once.
+  """
+  if not hasattr(upload, "getvalue"):
+    return str(upload)
+  UPLOAD_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+  path = UPLOAD_CACHE_DIR / Path(upload.name).name
+  payload = upload.getvalue()
+  if not path.exists() or path.read_bytes() != payload:
+    path.write_bytes(payload)
+  return str(path)
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Document]], weights: List[float], k: int = 60) -> List[Tuple[Document, float]]:
+  """
+  Merge ranked lists: score(d) = sum(w / (k + rank)), rank starting at 1.
+  """
+  scores: Dict[str, float] = {}
+  docs: Dict[str, Document] = {}
+  for ranked, weight in zip(ranked_lists, weights):
+    for rank, doc in enumerate(ranked, start=1):
+      key = doc.id or doc.page_content
+      scores[key] = scores.get(key, 0.0) + weight / (k + rank)
+      docs.setdefault(key, doc)
+  order = sorted(scores, key=scores.get, reverse=True)
+  return [(docs[key], scores[key]) for key in order]
+
+
+def _env_float(name: str, default: float) -> float:
+  return float(os.getenv(name, default))
 
 
+def _env_int(name: str, default: int) -> int:
+  return int(os.getenv(name, default))
 
 
 # def retriever from base--> creating BaseRetriever object to call
-dense_retriever = VECTOR_STORE.as_retriever(search_kwargs={"k": 10})
+class DocumentBaseRetriever(BaseRetriever):
+    """
+    Retriever over VECTOR_STORE. `search_mode="hybrid"` fuses dense + BM25 results with RRF,
+    `search_mode="mmr"` is the original dense-only MMR search.
+    """
+    k: int = Field(default_factory=lambda: _env_int("RETRIEVER_K", 4))
+    search_mode: str = Field(default_factory=lambda: os.getenv("RETRIEVER_MODE", "hybrid"))
+    # per-retriever depth + fusion weights
+    dense_k: int = Field(default_factory=lambda: _env_int("RETRIEVER_DENSE_K", 10))
+    sparse_k: int = Field(default_factory=lambda: _env_int("RETRIEVER_SPARSE_K", 10))
+    dense_weight: float = Field(default_factory=lambda: _env_float("RETRIEVER_DENSE_WEIGHT", 1.0))
+    sparse_weight: float = Field(default_factory=lambda: _env_float("RETRIEVER_SPARSE_WEIGHT", 1.0))
+    rrf_k: int = Field(default_factory=lambda: _env_int("RETRIEVER_RRF_K", 60))
+    # mmr mode
+    fetch_k: int = 20
+    lambda_mult: float = 0.5
 
+    def add_uploaded_docs(self, file_paths: List[str]) -> List[Document]:
+        """
+        Load uploaded pdf/json files and index them. Idempotent--already indexed files are skipped.
+        """
+        chunks: List[Document] = []
+        for upload in file_paths:
+            chunks.extend(index_file(_materialize(upload)))
+        return chunks
 
+    def batch_search(self, queries: List[str]) -> List[List[Document]]:
+        """
+        MMR for a batch of queries in one matrix pass (batch assessment + evaluation paths).
+        """
+        return VECTOR_STORE.max_marginal_relevance_search_batch(
+            queries, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult)
 
+    def _dense_search(self, query: str) -> List[Document]:
+        return VECTOR_STORE.similarity_search(query, k=self.dense_k)
 
-#sparse--lexical vector for keyword search
-sparse_retriever = BM25Retriever.from_documents(documents=Docdocsuments, k=10)
+    def _sparse_search(self, query: str) -> List[Document]:
+        sync_lexical_index()
+        return [doc for doc, _ in LEXICAL_INDEX.search(query, k=self.sparse_k)]
 
     def _get_relevant_documents(
               self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
               """
               Sync integration for retriever.
               """
-              if len(self.documents) == 0:
+              if len(VECTOR_STORE) == 0:
                 return []
-              return VECTOR_STORE.max_marginal_relevance_search(query, k=self.k, fetch_k=20, lambda_mult=0.5)
-
-
-    
-    
-
-             
+              if self.search_mode == "mmr":
+                return VECTOR_STORE.max_marginal_relevance_search(
+                  query, k=self.k, fetch_k=self.fetch_k, lambda_mult=self.lambda_mult)
 
+              dense = _SEARCH_POOL.submit(self._dense_search, query)
+              sparse = _SEARCH_POOL.submit(self._sparse_search, query)
+              fused = reciprocal_rank_fusion(
+                [dense.result(), sparse.result()], [self.dense_weight, self.sparse_weight], k=self.rrf_k)
 
+              results = []
+              for doc, score in fused[: self.k]:
+                results.append(Document(
+                  id=doc.id, page_content=doc.page_content, metadata={**doc.metadata, "relevance_score": score}))
+              return results
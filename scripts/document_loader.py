@@ -4,10 +4,11 @@ import re
 from typing import List
 
 from langchain_core.documents import Document
-from langchain_community.document_loaders.pdf import UnstructuredPDFLoader, PyPDFLoader
 from langchain_text_splitters import RecursiveCharacterTextSplitter
-from langchain_core.vectorstores import InMemoryVectorStore
 from scripts.embeddings import EMBEDDINGS
+from scripts.lazy import Lazy
+from scripts.metrics import TimedEmbeddings
+from scripts.vector_index import MmapVectorStore
 from typing import Any
 
 
@@ -23,10 +24,6 @@ _SPACE_BEFORE_DOT = re.compile(r"\s+\.")
 _SPACE_AFTER_DOT = re.compile(r"\.\s+(?=[A-Za-z])")
 _SPACE_AFTER_OPEN = re.compile(r"([(/])\s+")
 
-_SINGLE_LETTER_PREFIX = re.compile(r"(?i)\b([a-z])\s+([a-z]{2,})\b")
-_SINGLE_LETTER_SUFFIX = re.compile(r"(?i)\b([a-z]{2,})\s+([a-z])\b")
-_TWO_LETTER_SUFFIX = re.compile(r"(?i)\b([a-z]{4,})\s+([a-z]{1,2})\b")
-
 _COMMON_WORDS = {
     "and", "the", "for", "with", "from", "this", "that", "have", "has", "was", "were",
     "will", "can", "not", "you", "your", "are", "but", "into", "over", "under", "upon",
@@ -34,7 +31,75 @@ _COMMON_WORDS = {
     "nice", "guideline", "published", "last", "updated"
 }
 
-_MIDWORD_CANDIDATE = re.compile(r"\b([A-Za-z]{3,})\s+([A-Za-z]{3,})\b")
+# de-spacing of split words ("recogni tion and r eferral")
+# the original cleaner ran up to 6 rounds of 4 regex passes over the whole page:
+#   prefix:  single letter + 2+ letters     "r eferral"  -> "referral"
+#   suffix:  2+ letters + single letter     "wor d"      -> "word"
+#   two:     4+ letters + 1-2 letters       "fibr es"    -> "fibres"
+#   mid:     3+ letters + 3+ letters, unless either is a common word, Upper+lower, or < 8 letters total
+# same heuristics, but over word tokens with all 24 passes fused into one streaming sweep: each
+# stage holds at most one token, so the page is repaired in a single linear pass.
+# a rejected mid pair still consumes its second word for that pass, exactly like re.sub did.
+_WORD_SPLIT = re.compile(r"(\w+)")
+_PREFIX, _SUFFIX, _TWO_LETTER, _MIDWORD = range(4)
+_DESPACE_STAGES = [kind for _ in range(6) for kind in (_PREFIX, _SUFFIX, _TWO_LETTER, _MIDWORD)]
+
+
+def _is_candidate(kind: int, la: int, lb: int) -> bool:
+    if kind == _PREFIX:
+        return la == 1 and lb >= 2
+    if kind == _SUFFIX:
+        return la >= 2 and lb == 1
+    if kind == _TWO_LETTER:
+        return la >= 4 and lb <= 2
+    return la >= 3 and lb >= 3
+
+
+def _midword_joins(a: str, b: str) -> bool:
+    if a.lower() in _COMMON_WORDS or b.lower() in _COMMON_WORDS:
+        return False
+    if a[0].isupper() and b[0].islower():
+        return False
+    return len(a) + len(b) >= 8
+
+
+def _despace(text: str) -> str:
+    parts = _WORD_SPLIT.split(text)
+    n_stages = len(_DESPACE_STAGES)
+    held = [None] * n_stages
+    out = []
+
+    # tokens are (gap before word, word, word is all ascii letters)
+    def push(stage, tok):
+        while stage < n_stages:
+            prev = held[stage]
+            if prev is None:
+                held[stage] = tok
+                return
+            if prev[2] and tok[2] and tok[0].isspace():
+                kind = _DESPACE_STAGES[stage]
+                a, b = prev[1], tok[1]
+                if _is_candidate(kind, len(a), len(b)):
+                    held[stage] = None
+                    if kind != _MIDWORD or _midword_joins(a, b):
+                        tok = (prev[0], a + b, True)
+                    else:
+                        push(stage + 1, prev)
+                    stage += 1
+                    continue
+            held[stage] = tok
+            tok = prev
+            stage += 1
+        out.append(tok)
+
+    for i in range(1, len(parts), 2):
+        word = parts[i]
+        push(0, (parts[i - 1], word, word.isascii() and word.isalpha()))
+    for stage in range(n_stages):
+        if held[stage] is not None:
+            tok, held[stage] = held[stage], None
+            push(stage + 1, tok)
+    return "".join([gap + word for gap, word, _ in out]) + parts[-1]
 
 def clean_pdf_text(text: str) -> str:
     text = text.replace("\x00", "")
@@ -42,28 +107,7 @@ def clean_pdf_text(text: str) -> str:
     text = _LINEBREAK.sub("\n", text)
     text = _WS.sub(" ", text)
 
-    for _ in range(6):
-        new_text = text
-        new_text = _SINGLE_LETTER_PREFIX.sub(r"\1\2", new_text)
-        new_text = _SINGLE_LETTER_SUFFIX.sub(r"\1\2", new_text)
-        new_text = _TWO_LETTER_SUFFIX.sub(r"\1\2", new_text)
-
-        def _join(m):
-            a, b = m.group(1), m.group(2)
-            if a.lower() in _COMMON_WORDS:
-                return m.group(0)
-            if a[0].isupper() and b[0].islower():
-                return m.group(0)
-            if b.lower() in _COMMON_WORDS:
-                return m.group(0)
-            if len(a) + len(b) < 8:
-                return m.group(0)
-            return a + b
-
-        new_text2 = _MIDWORD_CANDIDATE.sub(_join, new_text)
-        if new_text2 == text:
-            break
-        text = new_text2
+    text = _despace(text)
 
     text = _SPACE_AFTER_OPEN.sub(r"\1", text)
     text = _SPACE_BEFORE_PUNCT.sub(r"\1", text)
@@ -75,6 +119,8 @@ def clean_pdf_text(text: str) -> str:
 def load_pdfs(file_path: str) -> List[Document]:
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"PDF not found: {file_path}")
+    #langchain_community's loaders (and unstructured behind them) are only needed when a pdf is loaded
+    from langchain_community.document_loaders.pdf import UnstructuredPDFLoader, PyPDFLoader
 
     try:
         loader = UnstructuredPDFLoader(
@@ -105,7 +151,9 @@ def load_pdfs(file_path: str) -> List[Document]:
 def split_documents(documents: List[Document]) -> List[Document]:
     splitter = RecursiveCharacterTextSplitter(
         chunk_size=600,
-        chunk_overlap=128
+        chunk_overlap=128,
+        #start_index lets the context assembler stitch neighbouring chunks back together
+        add_start_index=True
     )
     chunks = splitter.split_documents(documents)
     return [c for c in chunks if c.page_content and c.page_content.strip()]
@@ -116,15 +164,20 @@ def load_and_chunk_pdf(file_path: str) -> List[Document]:
     logger.info("Created %d chunks from %s", len(chunks), file_path)
     return chunks
 
-# setup our vector store for retriver
-VECTOR_STORE = InMemoryVectorStore(embedding=EMBEDDINGS)
-
-def store_documents(docs: List[Document]) -> None:
-    """
-    Adding my docs to vector store.
-    """
-    chunks = split_documents(docs)
-    VECTOR_STORE.add_documents(chunks)
+# setup our vector store for retriver--persisted + mmap'd so every worker shares one index on disk
+#embedding calls are timed into rag_embedding_seconds (GET /metrics)
+#past VECTOR_ANN_MIN_ROWS chunks searches go through an IVF index (0 = always exact)
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", "scripts_VS/vector_index")
+VECTOR_STORE = Lazy(lambda: MmapVectorStore(
+    embedding=TimedEmbeddings(EMBEDDINGS),
+    index_dir=VECTOR_INDEX_DIR,
+    ann_min_rows=int(os.getenv("VECTOR_ANN_MIN_ROWS", "20000")) or None,
+    nprobe=int(os.getenv("VECTOR_ANN_NPROBE", "16")),
+    ann_nlist=int(os.getenv("VECTOR_ANN_NLIST", "0")) or None,
+), "VECTOR_STORE")
+
+#indexing (stable chunk ids, ingest manifest, lexical index sync) lives in scripts.doc_retrieval:
+#index_file for files, store_documents for documents already loaded
 
 # load test for chunk tuning
 if __name__ == "__main__":
@@ -0,0 +1,174 @@
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Deque, Dict, List, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+_QUERY, _DOCUMENT = "query", "document"
+
+
+def _query_batch_fn(embeddings: Embeddings) -> Callable[[List[str]], List[List[float]]]:
+    """
+    Batched query embedding. Gemini embeds documents and queries with different task types, so a
+    query batch goes through embed_documents(task_type="retrieval_query") where the model supports
+    it (unwrapping a CacheBackedEmbeddings, which doesn't cache queries anyway), otherwise one
+    embed_query per text.
+    """
+    target = getattr(embeddings, "underlying_embeddings", embeddings)
+    try:
+        accepts_task_type = "task_type" in inspect.signature(target.embed_documents).parameters
+    except (TypeError, ValueError):
+        accepts_task_type = False
+    if accepts_task_type:
+        return lambda texts: target.embed_documents(texts, task_type="retrieval_query")
+    return lambda texts: [embeddings.embed_query(t) for t in texts]
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Coalesces embedding requests from all callers (chats, uploads) into micro-batches.
+
+    Texts are queued per kind (query/document) and flushed when `max_batch_size` unique texts are
+    waiting or the oldest has waited `max_wait_ms`. Identical texts waiting in the same window are
+    embedded once. At most `max_in_flight` batches run against the model at a time; while that
+    limit is hit the queue keeps filling, so batches get fuller under load.
+    Callers get futures (`submit`) or use the normal Embeddings methods, which wait on them.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int = 64,
+        max_wait_ms: float = 10.0,
+        max_in_flight: int = 4,
+    ):
+        self.embeddings = embeddings
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.max_in_flight = max_in_flight
+        self._batch_fns = {_DOCUMENT: embeddings.embed_documents, _QUERY: _query_batch_fn(embeddings)}
+        # kind -> text -> (futures waiting on it, enqueue time)
+        self._pending: Dict[str, "OrderedDict[str, Tuple[List[Future], float]]"] = {
+            _QUERY: OrderedDict(), _DOCUMENT: OrderedDict()}
+        self._cond = threading.Condition()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._pool = ThreadPoolExecutor(max_workers=max_in_flight, thread_name_prefix="embed-batch")
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._requests = 0
+        self._unique = 0
+        self._fill_total = 0.0
+        self._queue_ms: Deque[float] = deque(maxlen=10_000)
+        self._closed = False
+        self._flusher = threading.Thread(target=self._run, name="embed-scheduler", daemon=True)
+        self._flusher.start()
+
+    # producer side
+    def submit(self, texts: List[str], kind: str = _DOCUMENT) -> List[Future]:
+        now = time.perf_counter()
+        futures = [Future() for _ in texts]
+        with self._cond:
+            pending = self._pending[kind]
+            for text, future in zip(texts, futures):
+                if text in pending:
+                    pending[text][0].append(future)
+                else:
+                    pending[text] = ([future], now)
+            self._cond.notify()
+        with self._stats_lock:
+            self._requests += len(texts)
+        return futures
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [f.result() for f in self.submit(list(texts), _DOCUMENT)]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text], _QUERY)[0].result()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return list(await asyncio.gather(*(asyncio.wrap_future(f) for f in self.submit(list(texts), _DOCUMENT))))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return await asyncio.wrap_future(self.submit([text], _QUERY)[0])
+
+    # flusher side
+    def _take_batch(self) -> Tuple[str, List[str], List[Tuple[List[Future], float]]]:
+        """
+        Block until some queue is due (full or past its deadline), then pop a batch from it.
+        """
+        with self._cond:
+            while True:
+                if self._closed and not any(self._pending.values()):
+                    return "", [], []
+                now = time.perf_counter()
+                wait = self.max_wait_s
+                for kind, pending in self._pending.items():
+                    if not pending:
+                        continue
+                    oldest = next(iter(pending.values()))[1]
+                    if len(pending) >= self.max_batch_size or now - oldest >= self.max_wait_s or self._closed:
+                        texts = list(pending)[: self.max_batch_size]
+                        return kind, texts, [pending.pop(t) for t in texts]
+                    wait = min(wait, self.max_wait_s - (now - oldest))
+                self._cond.wait(timeout=wait if any(self._pending.values()) else None)
+
+    def _run(self) -> None:
+        while True:
+            # wait for an in-flight slot first so the queue keeps filling meanwhile
+            self._slots.acquire()
+            kind, texts, waiters = self._take_batch()
+            if not texts:
+                self._slots.release()
+                return
+            dispatched = time.perf_counter()
+            with self._stats_lock:
+                self._batches += 1
+                self._unique += len(texts)
+                self._fill_total += len(texts) / self.max_batch_size
+                self._queue_ms.extend((dispatched - t) * 1000 for _, t in waiters)
+            self._pool.submit(self._execute, kind, texts, waiters)
+
+    def _execute(self, kind: str, texts: List[str], waiters: List[Tuple[List[Future], float]]) -> None:
+        try:
+            vectors = self._batch_fns[kind](texts)
+            for (futures, _), vector in zip(waiters, vectors):
+                for f in futures:
+                    f.set_result(vector)
+        except Exception as e:
+            logger.exception("Embedding batch of %d %s texts failed", len(texts), kind)
+            for futures, _ in waiters:
+                for f in futures:
+                    f.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        self._flusher.join()
+        self._pool.shutdown(wait=True)
+
+    def stats(self) -> dict:
+        """
+        Batch fill ratio (unique texts per batch / max_batch_size), dedupe savings, queueing latency.
+        """
+        with self._stats_lock:
+            queue_ms = sorted(self._queue_ms)
+            pct = lambda p: queue_ms[min(int(p * len(queue_ms)), len(queue_ms) - 1)] if queue_ms else 0.0
+            return {
+                "requests": self._requests,
+                "unique_texts": self._unique,
+                "batches": self._batches,
+                "batch_fill_ratio": self._fill_total / self._batches if self._batches else 0.0,
+                "dedupe_ratio": 1 - self._unique / self._requests if self._requests else 0.0,
+                "queue_ms_p50": pct(0.50),
+                "queue_ms_p99": pct(0.99),
+            }
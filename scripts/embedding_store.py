@@ -0,0 +1,274 @@
+import argparse
+import fcntl
+import json
+import logging
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.stores import BaseStore
+
+logger = logging.getLogger(__name__)
+
+# packed cache file:
+#   32-byte header: magic, version, dim, dtype code, key width
+#   records, fixed width: [key utf-8, null padded to key_width][dim x float32|float16]
+# appended in write order; a later record for the same key wins.
+_MAGIC = b"EMBPACK1"
+_HEADER = struct.Struct("<8sHIBH")
+_HEADER_SIZE = 32
+_DTYPES = {0: np.float32, 1: np.float16}
+_DTYPE_CODES = {"float32": 0, "float16": 1}
+
+
+class PackedEmbeddingStore(BaseStore[str, List[float]]):
+    """
+    Embedding cache in a single append-only file of fixed-width vectors with an in-memory hash index.
+
+    Opening the cache is one sequential read of the whole file. Writes are appended under an
+    flock so several workers can share one file; each worker picks up the others' appends on a miss.
+    When the file grows past `max_bytes` it is compacted down to the most recently used entries.
+    """
+
+    def __init__(
+        self,
+        path: str = "scripts_VS/embeddings.pack",
+        encoding: str = "float32",
+        max_bytes: Optional[int] = None,
+        key_width: int = 96,
+    ):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.path.with_suffix(".lock")
+        self.encoding = encoding
+        self.max_bytes = max_bytes
+        self.key_width = key_width
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    # file layout
+    def _reset(self) -> None:
+        self.dim: Optional[int] = None
+        self._tick = 0
+        self._loaded_bytes = 0
+        self._inode = None
+        self._reset_index()
+
+    def _reset_index(self) -> None:
+        # row buffers grow by doubling; rows [0, _size) are live
+        self._size = 0
+        self._keys = np.zeros(0, dtype=f"S{self.key_width}")
+        self._vectors: Optional[np.ndarray] = None
+        self._last_used = np.zeros(0, dtype=np.int64)
+        self._index: Dict[bytes, int] = {}
+
+    def _record_dtype(self) -> np.dtype:
+        return np.dtype([("key", f"S{self.key_width}"), ("vec", _DTYPES[_DTYPE_CODES[self.encoding]], (self.dim,))])
+
+    def _read_header(self, fh) -> None:
+        magic, _, dim, code, key_width = _HEADER.unpack(fh.read(_HEADER.size))
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a packed embedding cache")
+        self.dim, self.encoding, self.key_width = dim, {v: k for k, v in _DTYPE_CODES.items()}[code], key_width
+        fh.seek(_HEADER_SIZE)
+
+    def _header_bytes(self) -> bytes:
+        header = _HEADER.pack(_MAGIC, 1, self.dim, _DTYPE_CODES[self.encoding], self.key_width)
+        return header.ljust(_HEADER_SIZE, b"\0")
+
+    def _append_records(self, records: np.ndarray) -> None:
+        start, end = self._size, self._size + len(records)
+        if self._vectors is None or end > len(self._vectors):
+            capacity = max(end, 2 * self._size, 1024)
+            keys = np.zeros(capacity, dtype=self._keys.dtype)
+            vectors = np.zeros((capacity, self.dim), dtype=records["vec"].dtype)
+            last_used = np.zeros(capacity, dtype=np.int64)
+            keys[:start] = self._keys[:start]
+            last_used[:start] = self._last_used[:start]
+            if self._vectors is not None:
+                vectors[:start] = self._vectors[:start]
+            self._keys, self._vectors, self._last_used = keys, vectors, last_used
+        self._keys[start:end] = records["key"]
+        self._vectors[start:end] = records["vec"]
+        self._last_used[start:end] = 0
+        self._size = end
+        for i, key in enumerate(records["key"].tolist(), start=start):
+            self._index[key] = i
+
+    def _load(self) -> None:
+        """
+        (Re)load the whole cache with one sequential read.
+        """
+        with self._lock:
+            self._reset()
+            if not self.path.exists():
+                return
+            with open(self.path, "rb") as fh:
+                self._inode = os.fstat(fh.fileno()).st_ino
+                self._read_header(fh)
+                payload = fh.read()
+            self._reset_index()
+            usable = len(payload) - len(payload) % self._record_dtype().itemsize
+            self._append_records(np.frombuffer(payload[:usable], dtype=self._record_dtype()))
+            self._loaded_bytes = _HEADER_SIZE + usable
+
+    def _catch_up(self) -> None:
+        """
+        Read records other workers appended (or reload if the file was compacted/replaced).
+        """
+        try:
+            st = self.path.stat()
+        except FileNotFoundError:
+            return
+        if st.st_ino != self._inode:
+            self._load()
+            return
+        if st.st_size <= self._loaded_bytes:
+            return
+        with self._lock, open(self.path, "rb") as fh:
+            fh.seek(self._loaded_bytes)
+            payload = fh.read()
+            usable = len(payload) - len(payload) % self._record_dtype().itemsize
+            self._append_records(np.frombuffer(payload[:usable], dtype=self._record_dtype()))
+            self._loaded_bytes += usable
+
+    def _encode_key(self, key: str) -> bytes:
+        raw = key.encode("utf-8")
+        if len(raw) > self.key_width:
+            raise ValueError(f"cache key longer than {self.key_width} bytes: {key!r}")
+        return raw
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    # BaseStore
+    def mget(self, keys: Sequence[str]) -> List[Optional[List[float]]]:
+        encoded = [self._encode_key(k) for k in keys]
+        if any(k not in self._index for k in encoded):
+            self._catch_up()
+        with self._lock:
+            rows = [self._index.get(k) for k in encoded]
+            hits = [r for r in rows if r is not None]
+            if not hits:
+                return [None] * len(keys)
+            self._tick += 1
+            self._last_used[hits] = self._tick
+            vectors = self._vectors[hits].astype(np.float32).tolist()
+        it = iter(vectors)
+        return [next(it) if r is not None else None for r in rows]
+
+    def mset(self, key_value_pairs: Sequence[Tuple[str, List[float]]]) -> None:
+        if not key_value_pairs:
+            return
+        vectors = np.asarray([v for _, v in key_value_pairs], dtype=np.float32)
+        with self._lock, open(self._lock_path, "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                if self.dim is None:
+                    self.dim = vectors.shape[1]
+                    with open(self.path, "wb") as fh:
+                        fh.write(self._header_bytes())
+                    self._inode = self.path.stat().st_ino
+                    self._loaded_bytes = _HEADER_SIZE
+                elif vectors.shape[1] != self.dim:
+                    raise ValueError(f"Embedding dim {vectors.shape[1]} does not match cache dim {self.dim}")
+
+                records = np.zeros(len(key_value_pairs), dtype=self._record_dtype())
+                records["key"] = [self._encode_key(k) for k, _ in key_value_pairs]
+                records["vec"] = vectors
+                with open(self.path, "ab") as fh:
+                    fh.write(records.tobytes())
+                self._append_records(records)
+                self._loaded_bytes += records.nbytes
+                self._tick += 1
+                self._last_used[self._size - len(records):self._size] = self._tick
+
+                if self.max_bytes and self._loaded_bytes > self.max_bytes:
+                    self._compact(int(self.max_bytes * 0.8))
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def mdelete(self, keys: Sequence[str]) -> None:
+        drop = {self._encode_key(k) for k in keys}
+        with self._lock, open(self._lock_path, "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                self._catch_up()
+                if drop & self._index.keys():
+                    self._compact(None, drop)
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def yield_keys(self, prefix: Optional[str] = None) -> Iterator[str]:
+        self._catch_up()
+        for key in list(self._index):
+            key = key.decode("utf-8")
+            if prefix is None or key.startswith(prefix):
+                yield key
+
+    # eviction
+    def _compact(self, target_bytes: Optional[int], drop: frozenset = frozenset()) -> None:
+        """
+        Rewrite the file with only live entries (latest record per key), most recently used first
+        to fit in `target_bytes`. Caller holds the write lock.
+        """
+        live = np.array(sorted(i for k, i in self._index.items() if k not in drop), dtype=np.int64)
+        if target_bytes is not None:
+            budget = max((target_bytes - _HEADER_SIZE) // self._record_dtype().itemsize, 0)
+            # most recently used, ties (never read in this process) broken by write order
+            order = np.lexsort((live, self._last_used[live]))[::-1]
+            live = np.sort(live[order[:budget]])
+
+        records = np.zeros(len(live), dtype=self._record_dtype())
+        records["key"] = self._keys[live]
+        records["vec"] = self._vectors[live]
+        tmp = self.path.with_suffix(".tmp")
+        with open(tmp, "wb") as fh:
+            fh.write(self._header_bytes())
+            fh.write(records.tobytes())
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, self.path)
+
+        last_used = self._last_used[live]
+        self._reset_index()
+        self._append_records(records)
+        self._last_used[:len(live)] = last_used
+        self._inode = self.path.stat().st_ino
+        self._loaded_bytes = _HEADER_SIZE + records.nbytes
+        logger.info("Compacted embedding cache %s to %d entries", self.path, len(records))
+
+def migrate_local_file_store(src_dir: str, store: PackedEmbeddingStore, batch_size: int = 1024) -> int:
+    """
+    Copy a LocalFileStore embedding cache (one json file per vector, file name = cache key) into `store`.
+    """
+    src = Path(src_dir)
+    batch: List[Tuple[str, List[float]]] = []
+    migrated = 0
+    for path in sorted(src.rglob("*")):
+        if not path.is_file():
+            continue
+        batch.append((path.relative_to(src).as_posix(), json.loads(path.read_bytes())))
+        if len(batch) >= batch_size:
+            store.mset(batch)
+            migrated += len(batch)
+            batch = []
+    if batch:
+        store.mset(batch)
+        migrated += len(batch)
+    logger.info("Migrated %d cached embeddings from %s to %s", migrated, src, store.path)
+    return migrated
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate a LocalFileStore embedding cache to a packed cache file.")
+    parser.add_argument("src_dir", nargs="?", default="scripts_VS/vector_embed")
+    parser.add_argument("dst", nargs="?", default="scripts_VS/embeddings.pack")
+    parser.add_argument("--float16", action="store_true")
+    args = parser.parse_args()
+    migrate_local_file_store(args.src_dir, PackedEmbeddingStore(args.dst, encoding="float16" if args.float16 else "float32"))
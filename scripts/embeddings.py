@@ -1,26 +1,71 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain.embeddings import CacheBackedEmbeddings
-from langchain.storage import LocalFileStore
+import hashlib
 import os
-import pathlib as Path
 import pathlib
+import uuid
+from functools import partial
 from dotenv import load_dotenv
+
+from scripts.embedding_scheduler import EmbeddingScheduler
+from scripts.embedding_store import PackedEmbeddingStore, migrate_local_file_store
+from scripts.lazy import Lazy
 #add sha256 encoder to mimic live setting where data privacy is key--with proprietary PHI data
 
 load_dotenv()
 
-#create caching for my embeddings to lower costs 
-cache_dir = pathlib.Path("scripts_VS/vector_embed")
-cache_dir.mkdir(parents=True, exist_ok=True)
-store = LocalFileStore(str(cache_dir))
-
-underlying_embeddings = GoogleGenerativeAIEmbeddings(
-    model="models/text-embedding-004", 
-    google_api_key=os.getenv("GOOGLE_API_KEY")
-)
-#prevent unecessary costs by caching my emdbeddings
-EMBEDDINGS = CacheBackedEmbeddings.from_bytes_store(
-    underlying_embeddings,
-    store,
-    namespace=underlying_embeddings.model 
-)
+#create caching for my embeddings to lower costs
+#one packed file of fixed-width vectors instead of one file per vector (LocalFileStore)
+legacy_cache_dir = pathlib.Path("scripts_VS/vector_embed")
+cache_path = pathlib.Path(os.getenv("EMBED_CACHE_PATH", "scripts_VS/embeddings.pack"))
+
+#cache keys are the model name + a uuid5 of the text's sha1: the format CacheBackedEmbeddings.from_bytes_store
+#writes, so keys already in the packed file (and migrated LocalFileStore ones) keep hitting
+_KEY_NAMESPACE = uuid.UUID("00000000-0000-0000-0000-0000000007c1")
+
+
+def cache_key(model: str, text: str) -> str:
+    return model + str(uuid.uuid5(_KEY_NAMESPACE, hashlib.sha1(text.encode("utf-8")).hexdigest()))
+
+
+def build_embeddings():
+    """
+    Cache-backed, micro-batched Gemini embeddings. The google client and langchain's cache layer are
+    imported here, not at module import: most processes that import this module never embed anything.
+    """
+    from langchain_google_genai import GoogleGenerativeAIEmbeddings
+    from langchain.embeddings import CacheBackedEmbeddings
+    from langchain.storage.encoder_backed import EncoderBackedStore
+
+    is_new_cache = not cache_path.exists()
+    store = PackedEmbeddingStore(
+        str(cache_path),
+        encoding="float16" if os.getenv("EMBED_CACHE_FLOAT16", "0") == "1" else "float32",
+        max_bytes=int(os.getenv("EMBED_CACHE_MAX_BYTES", "0")) or None,
+    )
+    # one-time carry over of the old one-file-per-vector cache
+    if is_new_cache and legacy_cache_dir.is_dir():
+        migrate_local_file_store(str(legacy_cache_dir), store)
+
+    underlying_embeddings = GoogleGenerativeAIEmbeddings(
+        model="models/text-embedding-004",
+        google_api_key=os.getenv("GOOGLE_API_KEY")
+    )
+    #prevent unecessary costs by caching my emdbeddings
+    cached_embeddings = CacheBackedEmbeddings(
+        underlying_embeddings,
+        EncoderBackedStore(
+            store,
+            partial(cache_key, underlying_embeddings.model),
+            lambda vector: vector,
+            lambda vector: vector,
+        ),
+    )
+    #coalesce query/document embeddings from concurrent chats + uploads into micro-batches
+    return EmbeddingScheduler(
+        cached_embeddings,
+        max_batch_size=int(os.getenv("EMBED_BATCH_SIZE", "64")),
+        max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", "10")),
+        max_in_flight=int(os.getenv("EMBED_MAX_IN_FLIGHT", "4")),
+    )
+
+
+EMBEDDINGS = Lazy(build_embeddings, "EMBEDDINGS")
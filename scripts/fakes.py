@@ -0,0 +1,99 @@
+import asyncio
+import hashlib
+import math
+import re
+import threading
+import time
+from typing import Any, AsyncIterator, List, Optional
+
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+class HashingEmbeddings(Embeddings):
+    """
+    Deterministic, offline stand-in for the Gemini embedder (benchmarks + local runs).
+
+    Feature-hashes word unigrams/bigrams into `size` dims, so texts sharing words land close together
+    and retrieval quality numbers still mean something. `latency_s`/`per_text_latency_s` simulate the
+    network round trip; `calls`/`texts` count what reached the "model".
+    """
+
+    def __init__(self, size: int = 256, latency_s: float = 0.0, per_text_latency_s: float = 0.0):
+        self.size = size
+        self.latency_s = latency_s
+        self.per_text_latency_s = per_text_latency_s
+        self.calls = 0
+        self.texts = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vec = [0.0] * self.size
+        tokens = _TOKEN.findall(text.lower())
+        for feature in tokens + [a + " " + b for a, b in zip(tokens, tokens[1:])]:
+            h = int.from_bytes(hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little")
+            vec[h % self.size] += 1.0 if (h >> 32) & 1 else -1.0
+        norm = math.sqrt(sum(v * v for v in vec)) or 1.0
+        return [v / norm for v in vec]
+
+    def _call(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            self.texts += len(texts)
+        if self.latency_s or self.per_text_latency_s:
+            time.sleep(self.latency_s + self.per_text_latency_s * len(texts))
+        return [self._embed(t) for t in texts]
+
+    def embed_documents(self, texts: List[str], task_type: Optional[str] = None) -> List[List[float]]:
+        # task_type mirrors GoogleGenerativeAIEmbeddings; hashing gives the same vector either way
+        return self._call(list(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._call([text])[0]
+
+
+class SlowFakeChatModel(BaseChatModel):
+    """
+    Offline stand-in for the Gemini chat model: the first token arrives after `latency_s` and each
+    further word after `token_latency_s`, blocking (time.sleep) on the sync path and yielding
+    (asyncio.sleep) on the async path, like a real network call. astream yields word by word.
+    Compliance review prompts get "NO ISSUES"; `calls` counts requests.
+    """
+
+    latency_s: float = 0.5
+    token_latency_s: float = 0.0
+    reply: str = "Refer using a suspected cancer pathway referral (NG12 1.1.1)."
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "slow-fake-chat"
+
+    def _respond(self, messages: List[BaseMessage]) -> List[str]:
+        self.calls += 1
+        text = "NO ISSUES" if "ISSUES FOUND" in str(messages[-1].content) else self.reply
+        return re.findall(r"\S+\s*", text)
+
+    def _generate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        words = self._respond(messages)
+        time.sleep(self.latency_s + self.token_latency_s * max(len(words) - 1, 0))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("".join(words)))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> ChatResult:
+        words = self._respond(messages)
+        await asyncio.sleep(self.latency_s + self.token_latency_s * max(len(words) - 1, 0))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage("".join(words)))])
+
+    async def _astream(self, messages: List[BaseMessage], stop: Optional[List[str]] = None, run_manager: Any = None, **kwargs: Any) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_s)
+        for i, word in enumerate(self._respond(messages)):
+            if i:
+                await asyncio.sleep(self.token_latency_s)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word))
+            if run_manager:
+                await run_manager.on_llm_new_token(word, chunk=chunk)
+            yield chunk
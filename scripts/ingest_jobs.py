@@ -0,0 +1,159 @@
+import logging
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+class IngestJobs:
+    """
+    Background indexing for uploads. `submit` returns a job id straight away; `max_workers` threads
+    take jobs off a queue of at most `max_pending` and run `index(path, progress)` on them. A full
+    queue raises JobQueueFull instead of piling up work (the api answers 503).
+
+    An upload arrives as a staged file that the job moves onto its destination when it starts, under
+    a per-destination lock: a re-upload of the same name can't swap the file under a running job.
+    A destination's lock is dropped once no job holds or waits for it. The last `keep_finished` finished jobs stay queryable.
+    """
+
+    def __init__(
+        self,
+        index: Callable[[str, Callable[[dict], None]], List[Document]],
+        max_workers: int = 2,
+        max_pending: int = 16,
+        keep_finished: int = 256,
+    ):
+        self.index = index
+        self.max_workers = max_workers
+        self.keep_finished = keep_finished
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue(maxsize=max_pending)
+        self._lock = threading.Lock()
+        self._jobs: "OrderedDict[str, dict]" = OrderedDict()
+        #destination -> (lock, jobs holding or waiting for it)
+        self._path_locks: Dict[str, Tuple[threading.Lock, int]] = {}
+        self._workers: List[threading.Thread] = []
+        self._finished = 0
+        self._failed = 0
+
+    def _start_workers(self) -> None:
+        #threads start with the first upload, processes that never ingest don't carry them
+        if self._workers:
+            return
+        for i in range(self.max_workers):
+            worker = threading.Thread(target=self._run, name=f"ingest-{i}", daemon=True)
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, staged_path: str, path: str) -> dict:
+        """
+        Queue `staged_path` to be moved to `path` and indexed; returns the job's status.
+        """
+        job_id = uuid.uuid4().hex
+        job = {
+            "job_id": job_id,
+            "file": os.path.basename(path),
+            "status": QUEUED,
+            "pages_total": 0,
+            "pages_done": 0,
+            "chunks": 0,
+            "error": None,
+            "submitted_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "_staged": staged_path,
+            "_path": path,
+        }
+        with self._lock:
+            self._start_workers()
+            self._jobs[job_id] = job
+            try:
+                self._queue.put_nowait(job_id)
+            except queue.Full:
+                del self._jobs[job_id]
+                raise JobQueueFull(f"{self._queue.maxsize} uploads already waiting to be indexed")
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return {k: v for k, v in job.items() if not k.startswith("_")} if job else None
+
+    def _update(self, job_id: str, **fields) -> None:
+        with self._lock:
+            self._jobs[job_id].update(fields)
+
+    def _run(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                self._execute(job_id)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, job_id: str) -> None:
+        with self._lock:
+            staged, path = self._jobs[job_id]["_staged"], self._jobs[job_id]["_path"]
+            path_lock, users = self._path_locks.get(path, (None, 0))
+            path_lock = path_lock or threading.Lock()
+            self._path_locks[path] = (path_lock, users + 1)
+        with path_lock:
+            self._update(job_id, status=RUNNING, started_at=time.time())
+            try:
+                os.replace(staged, path)
+                chunks = self.index(path, lambda report: self._update(job_id, **report))
+                self._update(job_id, status=DONE, chunks=len(chunks))
+            except Exception as e:
+                logger.exception("Indexing %s failed", path)
+                self._update(job_id, status=FAILED, error=str(e))
+        with self._lock:
+            path_lock, users = self._path_locks[path]
+            if users == 1:
+                del self._path_locks[path]
+            else:
+                self._path_locks[path] = (path_lock, users - 1)
+            self._jobs[job_id]["finished_at"] = time.time()
+            self._finished += 1
+            self._failed += self._jobs[job_id]["status"] == FAILED
+            self._trim()
+
+    def _trim(self) -> None:
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in (DONE, FAILED)]
+        for job_id in finished[: max(0, len(finished) - self.keep_finished)]:
+            del self._jobs[job_id]
+
+    def close(self, timeout: Optional[float] = None) -> None:
+        """
+        Let the queued jobs finish, then stop the workers.
+        """
+        for _ in self._workers:
+            self._queue.put(None)
+        for worker in self._workers:
+            worker.join(timeout)
+        self._workers = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+            return {
+                "queued": statuses.count(QUEUED),
+                "running": statuses.count(RUNNING),
+                "finished": self._finished,
+                "failed": self._failed,
+                "workers": len(self._workers),
+                "path_locks": len(self._path_locks),
+            }
@@ -0,0 +1,120 @@
+import fcntl
+import hashlib
+import json
+import os
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+from pypdf import PdfReader
+from pypdf.generic import StreamObject
+
+
+def file_sha256(file_path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def pdf_page_hashes(file_path: str) -> List[str]:
+    """
+    One hash per page over the raw content stream + any image/form xobjects it draws,
+    cheap enough to run without extracting any text.
+    """
+    hashes = []
+    for page in PdfReader(file_path).pages:
+        digest = hashlib.sha256()
+        contents = page.get_contents()
+        if contents is not None:
+            digest.update(contents.get_data())
+        xobjects = (page.get("/Resources") or {}).get("/XObject") or {}
+        for name in sorted(xobjects):
+            obj = xobjects[name].get_object()
+            digest.update(name.encode())
+            if not isinstance(obj, StreamObject):
+                continue
+            try:
+                digest.update(obj.get_data())
+            except NotImplementedError:
+                #a filter pypdf can't decode (JBIG2 images): fall back on the stream's dictionary
+                digest.update(repr(sorted((str(k), str(v)) for k, v in obj.items())).encode())
+        hashes.append(digest.hexdigest())
+    return hashes
+
+
+def chunk_id(source: str, page: int, text: str, occurrence: int = 0) -> str:
+    """
+    Stable chunk id: the same text at the same place in the same source always maps to the same id.
+    """
+    payload = f"{source}\x1f{page}\x1f{occurrence}\x1f{text}".encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()[:32]
+
+
+class IngestManifest:
+    """
+    What has been indexed, per source file: content hash, per-page hashes and chunk ids per page.
+    Shared by workers through a json file guarded by flock and replaced atomically.
+
+    {"files": {source: {"sha256", "size", "mtime_ns", "pages": {page: hash}, "chunks": {page: [ids]}}}}
+    """
+
+    def __init__(self, path: str = "scripts_VS/ingest_manifest.json"):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock_path = self.path.with_suffix(".lock")
+
+    def _read(self) -> dict:
+        try:
+            return json.loads(self.path.read_text())
+        except FileNotFoundError:
+            return {"files": {}}
+
+    @contextmanager
+    def transaction(self) -> Iterator[dict]:
+        """
+        Exclusive read-modify-write of the manifest across threads and processes.
+        """
+        with open(self._lock_path, "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                data = self._read()
+                yield data
+                tmp = self.path.with_suffix(".tmp")
+                tmp.write_text(json.dumps(data))
+                os.replace(tmp, self.path)
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+
+    def get(self, source: str) -> Optional[dict]:
+        return self._read()["files"].get(source)
+
+    def source_for_hash(self, sha256: str) -> Optional[str]:
+        for source, entry in self._read()["files"].items():
+            if entry["sha256"] == sha256:
+                return source
+        return None
+
+    def is_unchanged(self, source: str) -> bool:
+        """
+        Fast check via size + mtime, falling back to the content hash.
+        """
+        entry = self.get(source)
+        if entry is None or not os.path.exists(source):
+            return False
+        st = os.stat(source)
+        if entry.get("size") == st.st_size and entry.get("mtime_ns") == st.st_mtime_ns:
+            return True
+        return entry["sha256"] == file_sha256(source)
+
+    @staticmethod
+    def record(data: dict, source: str, sha256: str, pages: Dict[int, str], chunks: Dict[int, List[str]]) -> None:
+        st = os.stat(source)
+        data["files"][source] = {
+            "sha256": sha256,
+            "size": st.st_size,
+            "mtime_ns": st.st_mtime_ns,
+            "pages": {str(p): h for p, h in pages.items()},
+            "chunks": {str(p): ids for p, ids in chunks.items()},
+        }
@@ -0,0 +1,162 @@
+import logging
+import multiprocessing
+import os
+import re
+import tempfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Callable, Iterator, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+from pypdf import PdfReader, PdfWriter
+
+from scripts.document_loader import clean_pdf_text
+
+logger = logging.getLogger(__name__)
+
+# pages that need the hi_res/table-structure pass. Matched against whitespace-stripped lowercase
+# text since pypdf splits words at random ("Possible cancer Recommendation" -> "Possible canc er ...")
+_TABLE_MARKERS = re.compile(r"possiblecancer.{0,40}recommendation|table\d+")
+_WHITESPACE = re.compile(r"\s+")
+
+PAGES_PER_TASK = int(os.getenv("PDF_PAGES_PER_TASK", "4"))
+FAST_PATH = os.getenv("PDF_FAST_PATH", "0") == "1"
+#ingestion runs on IngestJobs threads inside the api process (grpc, http clients): a forked worker
+#could inherit a lock another thread held at fork time and hang, so workers start from a fresh interpreter
+POOL_CONTEXT = multiprocessing.get_context(os.getenv("PDF_POOL_START_METHOD", "spawn"))
+
+
+def page_has_table(text: str) -> bool:
+    return bool(_TABLE_MARKERS.search(_WHITESPACE.sub("", text).lower()))
+
+
+def page_groups(pages: Sequence[int], pages_per_task: int) -> List[Tuple[int, ...]]:
+    pages = sorted(pages)
+    return [tuple(pages[i:i + pages_per_task]) for i in range(0, len(pages), pages_per_task)]
+
+
+def _pypdf_page_doc(file_path: str, page: int, text: str) -> Document:
+    return Document(
+        page_content=clean_pdf_text(text) or text,
+        metadata={"source": file_path, "page": page, "page_number": page + 1},
+    )
+
+
+def _hi_res_page_docs(file_path: str, reader: PdfReader, pages: Sequence[int]) -> List[Document]:
+    """
+    Run unstructured hi_res on just `pages` by writing them to a temporary pdf, then map the
+    element page numbers back onto the original file.
+    """
+    from langchain_community.document_loaders.pdf import UnstructuredPDFLoader
+
+    writer = PdfWriter()
+    for page in pages:
+        writer.add_page(reader.pages[page])
+    with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as tmp:
+        writer.write(tmp)
+    try:
+        loader = UnstructuredPDFLoader(
+            file_path=tmp.name,
+            mode="elements",
+            strategy="hi_res",
+            infer_table_structure=True
+        )
+        docs = loader.load()
+    finally:
+        os.unlink(tmp.name)
+
+    for d in docs:
+        page = pages[min(max(int(d.metadata.get("page_number", 1)) - 1, 0), len(pages) - 1)]
+        d.metadata.update({"source": file_path, "page": page, "page_number": page + 1})
+        d.metadata.pop("filename", None)
+        d.metadata.pop("file_directory", None)
+    return docs
+
+
+def extract_pages(file_path: str, pages: Sequence[int], fast_path: bool = False) -> Tuple[Tuple[int, ...], List[Document]]:
+    """
+    Extract the given (0-based) pages of a pdf. Runs inside the ingestion process pool.
+
+    With `fast_path`, text-only pages go through pypdf + clean_pdf_text and only pages that look
+    like tables pay for the hi_res pass.
+    """
+    reader = PdfReader(file_path)
+    texts = {page: reader.pages[page].extract_text() or "" for page in pages}
+    if fast_path:
+        hi_res_pages = [page for page, text in texts.items() if page_has_table(text)]
+    else:
+        hi_res_pages = list(texts)
+
+    docs: List[Document] = []
+    if hi_res_pages:
+        try:
+            docs.extend(_hi_res_page_docs(file_path, reader, hi_res_pages))
+        except ImportError as e:
+            logger.warning("Unstructured not available (%s). Falling back to pypdf for pages %s.", e, hi_res_pages)
+            hi_res_pages = []
+    for page, text in texts.items():
+        if page not in hi_res_pages and text.strip():
+            docs.append(_pypdf_page_doc(file_path, page, text))
+    docs.sort(key=lambda d: d.metadata["page"])
+    return tuple(pages), docs
+
+
+def stream_pdf_pages(
+    file_path: str,
+    pages_per_task: int = PAGES_PER_TASK,
+    max_workers: Optional[int] = None,
+    fast_path: bool = FAST_PATH,
+    pages: Optional[Sequence[int]] = None,
+) -> Iterator[Tuple[Tuple[int, ...], List[Document]]]:
+    """
+    Extract a pdf (or just `pages` of it) in page groups across a process pool, yielding
+    (pages, docs) as soon as each group finishes (completion order, not page order).
+    """
+    if not os.path.exists(file_path):
+        raise FileNotFoundError(f"PDF not found: {file_path}")
+    if pages is None:
+        pages = range(len(PdfReader(file_path).pages))
+    groups = page_groups(pages, pages_per_task)
+    if len(groups) <= 1 or max_workers == 1:
+        for group in groups:
+            yield extract_pages(file_path, group, fast_path)
+        return
+
+    workers = max_workers or min(len(groups), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=POOL_CONTEXT) as pool:
+        futures = [pool.submit(extract_pages, file_path, group, fast_path) for group in groups]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def ingest_pdf(
+    file_path: str,
+    store: Callable[[List[Document]], List[Document]],
+    pages_per_task: int = PAGES_PER_TASK,
+    max_workers: Optional[int] = None,
+    fast_path: bool = FAST_PATH,
+    flush_pages: int = 16,
+    pages: Optional[Sequence[int]] = None,
+    on_pages: Optional[Callable[[Tuple[int, ...]], None]] = None,
+) -> List[Document]:
+    """
+    Stream extracted pages into `store` (split + embed + index) while later pages are still
+    being extracted. Pages are handed over in groups of ~`flush_pages` so every flush is one
+    index snapshot rather than one per page. `pages` limits ingestion to those pages;
+    `on_pages` is called with each extracted page group (progress reporting).
+    """
+    chunks: List[Document] = []
+    pending: List[Document] = []
+    pending_pages = 0
+    for group, docs in stream_pdf_pages(file_path, pages_per_task, max_workers, fast_path, pages):
+        logger.info("Extracted pages %d-%d of %s", group[0] + 1, group[-1] + 1, file_path)
+        if on_pages is not None:
+            on_pages(group)
+        pending.extend(docs)
+        pending_pages += len(group)
+        if pending_pages >= flush_pages:
+            chunks.extend(store(pending))
+            pending, pending_pages = [], 0
+    if pending:
+        chunks.extend(store(pending))
+    logger.info("Ingested %d chunks from %s", len(chunks), file_path)
+    return chunks
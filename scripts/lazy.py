@@ -0,0 +1,66 @@
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class Lazy(Generic[T]):
+    """
+    Module-level singleton built on first use instead of at import.
+
+    Attribute access goes through to the built object, so `from scripts.model import llm` and
+    `llm.invoke(...)` keep working; importing the module no longer constructs clients, opens stores
+    or parses the guideline. Every public name belongs to the wrapped object (stores have their own
+    get/build), so Lazy's own API is underscored: `_resolve()` builds it once, thread-safe.
+    """
+
+    def __init__(self, factory: Callable[[], T], name: str = ""):
+        self._factory = factory
+        self._name = name or getattr(factory, "__name__", "lazy")
+        self._lock = threading.Lock()
+        self._value: Any = None
+        self._built = False
+        self._build_ms = 0.0
+
+    def _resolve(self) -> T:
+        if not self._built:
+            with self._lock:
+                if not self._built:
+                    start = time.perf_counter()
+                    self._value = self._factory()
+                    self._build_ms = (time.perf_counter() - start) * 1000
+                    self._built = True
+        return self._value
+
+    def __getattr__(self, name: str) -> Any:
+        #only reached for attributes Lazy itself doesn't have; private/dunder lookups (copy, pickle)
+        #must not build, and must not recurse before __init__ has run
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self._resolve(), name)
+
+    def __len__(self) -> int:
+        return len(self._resolve())
+
+    def __iter__(self):
+        return iter(self._resolve())
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self._resolve()
+
+    def __repr__(self) -> str:
+        return f"Lazy({self._name}, built={self._built})"
+
+
+def warm_up(singletons: Dict[str, Any]) -> Dict[str, float]:
+    """
+    Build every Lazy in `singletons` now; returns build milliseconds per name (0 if already built).
+    """
+    timings = {}
+    for name, value in singletons.items():
+        if isinstance(value, Lazy):
+            was_built = value._built
+            value._resolve()
+            timings[name] = 0.0 if was_built else round(value._build_ms, 1)
+    return timings
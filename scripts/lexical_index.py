@@ -0,0 +1,124 @@
+import math
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from langchain_core.documents import Document
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "has", "have", "in", "is", "it",
+    "of", "on", "or", "that", "the", "their", "this", "to", "was", "were", "what", "which", "with",
+}
+
+
+# NG12 is British English, patient notes are often US ("haemoptysis" vs "hemoptysis"). Only these
+# medical stems are folded: a blanket ae/oe -> e would merge "shoe"/"she", "canoe"/"cane", ...
+_UK_STEMS = {
+    "haem": "hem", "aemi": "emi", "oesoph": "esoph", "oedem": "edem", "oestr": "estr", "paed": "ped",
+    "faec": "fec", "gynaec": "gynec", "coeliac": "celiac", "rrhoea": "rrhea",
+}
+_UK_STEM = re.compile("|".join(_UK_STEMS))
+
+
+def _fold_spelling(token: str) -> str:
+    token = _UK_STEM.sub(lambda m: _UK_STEMS[m.group(0)], token)
+    if len(token) > 5 and token.endswith("our"):
+        token = token[:-3] + "or"
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    return [_fold_spelling(t) for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS]
+
+
+class InvertedIndex:
+    """
+    Incremental BM25 inverted index over chunk text, keyed by the same ids as VECTOR_STORE.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # vector store generation this index was last brought in line with
+        self.generation: Optional[int] = None
+        self._lock = threading.RLock()
+        self._postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self._doc_len: List[int] = []
+        self._docs: List[Optional[Document]] = []
+        # slots of removed documents, reused by add so re-indexing doesn't grow the lists
+        self._free: List[int] = []
+        self._slot: Dict[str, int] = {}
+        self._total_len = 0
+
+    def __len__(self) -> int:
+        return len(self._slot)
+
+    def __contains__(self, doc_id: str) -> bool:
+        return doc_id in self._slot
+
+    def ids(self) -> List[str]:
+        return list(self._slot)
+
+    def add(self, doc_id: str, text: str, metadata: Optional[dict] = None) -> None:
+        with self._lock:
+            if doc_id in self._slot:
+                self.remove([doc_id])
+            tokens = tokenize(text)
+            doc = Document(id=doc_id, page_content=text, metadata=metadata or {})
+            if self._free:
+                slot = self._free.pop()
+                self._docs[slot] = doc
+                self._doc_len[slot] = len(tokens)
+            else:
+                slot = len(self._docs)
+                self._docs.append(doc)
+                self._doc_len.append(len(tokens))
+            self._slot[doc_id] = slot
+            self._total_len += len(tokens)
+            counts: Dict[str, int] = defaultdict(int)
+            for t in tokens:
+                counts[t] += 1
+            for t, tf in counts.items():
+                self._postings[t][slot] = tf
+
+    def add_documents(self, documents: Iterable[Document]) -> None:
+        for doc in documents:
+            self.add(doc.id, doc.page_content, doc.metadata)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for doc_id in ids:
+                slot = self._slot.pop(doc_id, None)
+                if slot is None:
+                    continue
+                for t in set(tokenize(self._docs[slot].page_content)):
+                    postings = self._postings.get(t)
+                    if postings is not None:
+                        postings.pop(slot, None)
+                        if not postings:
+                            del self._postings[t]
+                self._total_len -= self._doc_len[slot]
+                self._docs[slot] = None
+                self._doc_len[slot] = 0
+                self._free.append(slot)
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[Document, float]]:
+        with self._lock:
+            n = len(self._slot)
+            if n == 0:
+                return []
+            avgdl = self._total_len / n or 1.0
+            scores: Dict[int, float] = defaultdict(float)
+            for t in set(tokenize(query)):
+                postings = self._postings.get(t)
+                if not postings:
+                    continue
+                idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                for slot, tf in postings.items():
+                    norm = self.k1 * (1 - self.b + self.b * self._doc_len[slot] / avgdl)
+                    scores[slot] += idf * tf * (self.k1 + 1) / (tf + norm)
+            top = sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+            return [(self._docs[slot], score) for slot, score in top]
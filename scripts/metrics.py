@@ -0,0 +1,286 @@
+import functools
+import inspect
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+#seconds; the llm calls land in the upper buckets, lookups and cache hits in the lower ones
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+TOKEN_BUCKETS = tuple(2 ** i for i in range(4, 16))
+COUNT_BUCKETS = (0, 1, 2, 4, 8, 16, 32, 64, 128)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _labels(self, key: Tuple[str, ...], extra: str = "") -> str:
+        pairs = [f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, key)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+    def _samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"] + self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._series[key] = self._series.get(key, 0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._series.get(self._key(labels), 0)
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted(self._series.items())
+        return [f"{self.name}_total{self._labels(key)} {_number(value)}" for key, value in series]
+
+
+class Histogram(_Metric):
+    """
+    Fixed-bucket histogram: an observation is one bisect and three increments under a lock, the
+    cumulative bucket counts Prometheus wants are only computed when /metrics is scraped.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        slot = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][slot] += 1
+            series[1] += value
+            series[2] += 1
+
+    def summary(self, **labels: Any) -> dict:
+        """
+        count / sum / mean for one label set, for stats() and the benchmarks.
+        """
+        with self._lock:
+            series = self._series.get(self._key(labels))
+            count, total = (series[2], series[1]) if series else (0, 0.0)
+        return {"count": count, "sum": total, "mean": total / count if count else 0.0}
+
+    def _samples(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, (list(counts), total, count)) for key, (counts, total, count) in self._series.items())
+        lines = []
+        for key, (counts, total, count) in series:
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_number(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {count}")
+        return lines
+
+
+class Registry:
+    """
+    Named metrics plus gauge collectors (the caches' and stores' stats() dicts), rendered in the
+    Prometheus text format for GET /metrics.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: Dict[str, Callable[[], dict]] = {}
+
+    def _get_or_create(self, cls, name: str, *args, **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, *args, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets)
+
+    def collect(self, prefix: str, stats: Callable[[], dict]) -> None:
+        """
+        Export the numeric entries of `stats()` as gauges `<prefix>_<key>`, read at scrape time.
+        """
+        self._collectors[prefix] = stats
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors.items())
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        for prefix, stats in collectors:
+            try:
+                values = stats()
+            except Exception:
+                #a collector that can't report (store not built, closed) must not break the scrape
+                continue
+            for key, value in sorted(values.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f"{prefix}_{key}"
+                lines += [f"# TYPE {name} gauge", f"{name} {_number(value)}"]
+        return "\n".join(lines) + "\n"
+
+
+METRICS = Registry()
+
+NODE_SECONDS = METRICS.histogram("rag_node_seconds", "Wall time per rag graph node.", ["node"])
+NODE_ERRORS = METRICS.counter("rag_node_errors", "Rag graph node calls that raised.", ["node"])
+LLM_SECONDS = METRICS.histogram("rag_llm_seconds", "Wall time per llm call, by caller (graph node or route).", ["caller"])
+LLM_TOKENS = METRICS.histogram("rag_llm_tokens", "Tokens per llm call (usage metadata, estimated if absent).", ["caller", "kind"], TOKEN_BUCKETS)
+RETRIEVER_SECONDS = METRICS.histogram("rag_retriever_seconds", "Wall time per retriever call.", ["caller"])
+RETRIEVED_DOCS = METRICS.histogram("rag_retrieved_docs", "Documents returned per retriever call.", ["caller"], COUNT_BUCKETS)
+EMBEDDING_SECONDS = METRICS.histogram("rag_embedding_seconds", "Wall time per embedding call.", ["op"])
+EMBEDDED_TEXTS = METRICS.counter("rag_embedded_texts", "Texts sent for embedding.", ["op"])
+
+
+def _estimate_tokens(text: str) -> int:
+    #same ~4 characters per token heuristic as ragPipeline.context, without importing the pipeline
+    return (len(text) + 3) // 4
+
+
+def timed(name: str, func: Callable) -> Callable:
+    """
+    Wrap a graph node body (sync or async) so each call records its wall time in rag_node_seconds.
+    functools.wraps keeps the signature RunnableLambda inspects.
+    """
+    if inspect.iscoroutinefunction(func):
+        @functools.wraps(func)
+        async def awrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return await func(*args, **kwargs)
+            except Exception:
+                NODE_ERRORS.inc(node=name)
+                raise
+            finally:
+                NODE_SECONDS.observe(time.perf_counter() - start, node=name)
+        return awrapper
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return func(*args, **kwargs)
+        except Exception:
+            NODE_ERRORS.inc(node=name)
+            raise
+        finally:
+            NODE_SECONDS.observe(time.perf_counter() - start, node=name)
+    return wrapper
+
+
+def _prompt_text(prompt: Any) -> str:
+    if hasattr(prompt, "to_messages"):
+        prompt = prompt.to_messages()
+    if isinstance(prompt, (list, tuple)):
+        return "".join(str(m.get("content", "") if isinstance(m, dict) else getattr(m, "content", m)) for m in prompt)
+    return str(prompt)
+
+
+def observe_llm(caller: str, start: float, prompt: Any, response: Any) -> None:
+    """
+    Record one llm call started at `start` (perf_counter): latency and input/output tokens, from the
+    response's usage_metadata or estimated from the text when the model doesn't report usage.
+    """
+    LLM_SECONDS.observe(time.perf_counter() - start, caller=caller)
+    usage = getattr(response, "usage_metadata", None)
+    if usage:
+        input_tokens, output_tokens = usage.get("input_tokens", 0), usage.get("output_tokens", 0)
+    else:
+        input_tokens = _estimate_tokens(_prompt_text(prompt))
+        output_tokens = _estimate_tokens(str(getattr(response, "content", "")))
+    LLM_TOKENS.observe(input_tokens, caller=caller, kind="input")
+    LLM_TOKENS.observe(output_tokens, caller=caller, kind="output")
+
+
+def observe_retrieval(caller: str, start: float, docs: list) -> None:
+    RETRIEVER_SECONDS.observe(time.perf_counter() - start, caller=caller)
+    RETRIEVED_DOCS.observe(len(docs), caller=caller)
+
+
+class TimedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper recording call latency and text counts; everything else goes to `inner`.
+    """
+
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+
+    def __getattr__(self, name: str) -> Any:
+        if name == "inner":
+            raise AttributeError(name)
+        return getattr(self.inner, name)
+
+    def _timed(self, op: str, count: int, call: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return call()
+        finally:
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, op=op)
+            EMBEDDED_TEXTS.inc(count, op=op)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._timed("documents", len(texts), lambda: self.inner.embed_documents(texts))
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._timed("query", 1, lambda: self.inner.embed_query(text))
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        start = time.perf_counter()
+        try:
+            return await self.inner.aembed_documents(texts)
+        finally:
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, op="documents")
+            EMBEDDED_TEXTS.inc(len(texts), op="documents")
+
+    async def aembed_query(self, text: str) -> List[float]:
+        start = time.perf_counter()
+        try:
+            return await self.inner.aembed_query(text)
+        finally:
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, op="query")
+            EMBEDDED_TEXTS.inc(1, op="query")
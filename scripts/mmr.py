@@ -0,0 +1,76 @@
+from typing import List
+
+import numpy as np
+
+# all functions here expect L2-normalized float32 rows, so cosine similarity is a plain dot product
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k best scores (descending) along the last axis, via argpartition.
+    Works for a (n,) score vector or a (batch, n) score matrix.
+    """
+    n = scores.shape[-1]
+    k = min(k, n)
+    if k <= 0:
+        return np.zeros(scores.shape[:-1] + (0,), dtype=np.int64)
+    if k < n:
+        part = np.argpartition(-scores, k - 1, axis=-1)[..., :k]
+    else:
+        part = np.broadcast_to(np.arange(n), scores.shape).copy()
+    part_scores = np.take_along_axis(scores, part, axis=-1)
+    order = np.argsort(-part_scores, axis=-1, kind="stable")
+    return np.take_along_axis(part, order, axis=-1)
+
+
+def mmr_select(relevance: np.ndarray, candidates: np.ndarray, k: int, lambda_mult: float = 0.5) -> np.ndarray:
+    """
+    Batched MMR over pre-fetched candidates.
+
+    relevance: (batch, f) query/candidate similarity
+    candidates: (batch, f, d) candidate vectors
+    returns (batch, min(k, f)) positions into the candidate axis, in selection order
+
+    Keeps a running max-similarity-to-selected vector per query, so each round costs one
+    (batch, f, d) @ (batch, d) product instead of recomputing all pairwise scores.
+    """
+    batch, f = relevance.shape
+    k = min(k, f)
+    selected = np.zeros((batch, k), dtype=np.int64)
+    if k == 0:
+        return selected
+    rows = np.arange(batch)
+    taken = np.zeros((batch, f), dtype=bool)
+    # first pick is the most relevant candidate (matches langchain's maximal_marginal_relevance)
+    pick = np.argmax(relevance, axis=1)
+    max_sim = np.einsum("bfd,bd->bf", candidates, candidates[rows, pick])
+    for i in range(k):
+        if i:
+            score = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+            score[taken] = -np.inf
+            pick = np.argmax(score, axis=1)
+            np.maximum(max_sim, np.einsum("bfd,bd->bf", candidates, candidates[rows, pick]), out=max_sim)
+        selected[:, i] = pick
+        taken[rows, pick] = True
+    return selected
+
+
+def batch_mmr(
+    queries: np.ndarray,
+    matrix: np.ndarray,
+    k: int = 4,
+    fetch_k: int = 20,
+    lambda_mult: float = 0.5,
+) -> List[np.ndarray]:
+    """
+    MMR for a batch of normalized queries (b, d) against the normalized chunk matrix (n, d).
+    Returns one array of row indices into `matrix` per query.
+    """
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    if matrix.shape[0] == 0:
+        return [np.zeros(0, dtype=np.int64) for _ in range(len(queries))]
+    scores = queries @ np.asarray(matrix).T
+    cand = top_k(scores, fetch_k)
+    relevance = np.take_along_axis(scores, cand, axis=1)
+    picks = mmr_select(relevance, np.asarray(matrix[cand.ravel()]).reshape(*cand.shape, -1), k, lambda_mult)
+    return list(np.take_along_axis(cand, picks, axis=1))
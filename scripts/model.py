@@ -1,19 +1,24 @@
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
-from langchain_google_genai import ChatGoogleGenerativeAI
 from dotenv import load_dotenv
 import os
 
+from scripts.lazy import Lazy
+
 load_dotenv()
 
-from langchain.embeddings import CacheBackedEmbeddings
 # Get the key (Works on Mac via .env and on Render via Dashboard)
 api_key = os.getenv("GOOGLE_API_KEY")
 
-# invoke my model in google
-llm = ChatGoogleGenerativeAI(
-    model="gemini-1.5-flash",
-    google_api_key=api_key,
-    temperature=0,
-    max_output_tokens=2048,
-    streaming=False  
-)
\ No newline at end of file
+def build_llm():
+    #the google client pulls in grpc/protobuf, only pay for it when the model is first used
+    from langchain_google_genai import ChatGoogleGenerativeAI
+
+    # invoke my model in google
+    return ChatGoogleGenerativeAI(
+        model="gemini-1.5-flash",
+        google_api_key=api_key,
+        temperature=0,
+        max_output_tokens=2048,
+        streaming=False  
+    )
+
+llm = Lazy(build_llm, "llm")
@@ -0,0 +1,586 @@
+import argparse
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Set
+
+from langchain_core.documents import Document
+
+from scripts.ingest_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# NG12 recommendations compiled into a symptom/age/sex/smoking rule table with page citations.
+# pypdf + clean_pdf_text glues words together at random ("withunexplainedhaemoptysis",
+# "dysphagiaor"), so everything is compared "squashed": lowercase, ae/oe folded, "unexplained"
+# dropped, letters and digits only. A symptom then matches a guideline term regardless of where
+# the pdf put its spaces. "or" between alternatives is split off before squashing (squashed, it
+# can't be told apart from "colorectal" or "tremor"); a term that still reads like guideline prose
+# is not "clean", and a patient with a symptom only such terms match is left to the LLM.
+TABLE_VERSION = 2
+
+_FOOTER = re.compile(r"Suspected\s*cancer:\s*recognition\s*and\s*referral\s*\(NG12\)\s*©.*$", re.S)
+_REC_START = re.compile(r"^(1\.\d+\.\d+)\s+(?=[A-Z])")
+_YEAR_TAG = re.compile(r"\[(?:19|20)\d\d[^\]]*\]")
+_SENTENCE_END = re.compile(r"\.\s+(?=[A-Z])")
+_NON_ALNUM = re.compile(r"[^a-z0-9]")
+_AGE_PHRASE = re.compile(r"(?:are\s*)?aged\s*(?:under\s*)?\d+(?:\s*(?:and|or)\s*over|\s*to\s*\d+)?", re.I)
+_PARENTHESES = re.compile(r"\([^)]*\)")
+_ARTICLE = re.compile(r"\b(?:an?|the|are)\b", re.I)
+
+
+def _loose(*words: str) -> str:
+    # the same words with pypdf's stray spaces allowed anywhere ("2 or mor eof th e following")
+    return r"\s*".join(re.escape(c) for c in "".join(words))
+
+
+_COUNT = re.compile(
+    rf"(\d+|{_loose('one')}|{_loose('two')}|{_loose('three')}|{_loose('any')}|{_loose('either')})\s*"
+    rf"(?:{_loose('ormore')}\s*)?{_loose('of')}\s*(?:{_loose('the')}\s*)?{_loose('following')}",
+    re.I,
+)
+_COUNT_WORDS = {"one": 1, "two": 2, "three": 3, "any": 1, "either": 1}
+_MODIFIER = re.compile(r"(?:a|an)?(?:persistent|recurrent|progressive|new|red|visible|either)")
+_LEADING_FILLER = ("they", "have", "has", "with", "and", "either", "who", "presenting")
+_TRAILING_FILLER = ("or", "and", "with")
+# symptoms that really do end in "or", not a glued "... or" between alternatives
+_ENDS_IN_OR = ("pallor", "tremor", "tumor")
+# vowel-initial words that start with "an"; any other leading "an" is a glued article
+_AN_WORDS = ("anemi", "anal", "anorexia", "anus", "aneurysm", "anxiety")
+# words that start with "a" + consonant; any other leading "a" is a glued article ("arectalmass")
+_A_WORDS = ("abdom", "abnorm", "absen", "acute", "allerg", "alter", "appetite", "arm", "arthr", "asbestos", "ascites",
+            "ataxia", "axilla")
+# "X or unexplained Y" / "X, or Y" between alternatives, matched before squashing so the "or" survives
+# (after a modifier it is part of the symptom: "persistent or unexplained bone pain")
+_OR_ALTERNATIVE = re.compile(
+    r"(?<!persistent)(?<!persistent\s)(?<!recurrent)(?<!recurrent\s)\s*or\s*(?=un\s*explained)|,\s*or\s+", re.I
+)
+# qualifiers that narrow a symptom without being one ("anaemia even in the absence of iron deficiency")
+_QUALIFIER = re.compile(r"\s*(?:even\s*in\s*the|,?\s*particularly).*$", re.I | re.S)
+# wording left in a term the compiler couldn't reduce to a symptom; such terms never vouch for a patient
+_UNCLEAN = ("that", "which", "these", "their", "specified", "recommendation", "consistentwith", "suggest",
+            "raises", "after", "lasting", "when", "who", "asacause", "forfirsttime", "report")
+# conditions a patient record can't evidence; clauses that need them never fast-path
+_UNCHECKABLE = ("asbestos", "xray", "examination", "dermoscopy", "resultof", "bloodtest", "ca125", "ultrasound")
+
+# action -> (assessment decision, strength). Strongest matching recommendation wins.
+ACTIONS = {
+    "refer": ("urgent_referral", 5),
+    "consider_refer": ("urgent_referral", 4),
+    "offer_urgent_investigation": ("urgent_investigation", 3),
+    "consider_urgent_investigation": ("urgent_investigation", 2),
+    "non_urgent": ("non_urgent_investigation", 1),
+}
+
+
+def squash(text: str) -> str:
+    text = _NON_ALNUM.sub("", str(text).lower().replace("ae", "e").replace("oe", "e"))
+    #"unexplained or persistent X" / "persistent or unexplained X" -> the qualifier that remains
+    return re.sub(r"(?:an)?(?:unexplainedor|orunexplained|unexplained)", "", text)
+
+
+def _strip_fillers(term: str) -> str:
+    changed = True
+    while changed:
+        changed = False
+        for word in _LEADING_FILLER:
+            if term.startswith(word):
+                term, changed = term[len(word):], True
+        if term.startswith("an") and term[2:3] in "aeiou" and not term.startswith(_AN_WORDS):
+            term, changed = term[2:], True
+        elif term.startswith("a") and term[1:2] not in "aeioun" and not term.startswith(_A_WORDS):
+            term, changed = term[1:], True
+    for word in _TRAILING_FILLER:
+        if term.endswith(word) and len(term) > len(word) + 3 and not term.endswith(_ENDS_IN_OR):
+            term = term[: -len(word)]
+    return term
+
+
+def clean_term(term: str) -> bool:
+    """
+    Whether a compiled term reads as a symptom rather than leftover guideline wording.
+    """
+    return term.isalpha() and len(term) <= 48 and not any(word in term for word in _UNCLEAN)
+
+
+def term_matches(symptom: str, term: str) -> bool:
+    """
+    Squashed patient symptom against a squashed guideline term: equal, more specific than the term
+    ("persistentcough" / "cough"), or the term is the symptom plus an alternative or qualifier
+    ("breastlumpwithorwithoutpain", "lymphadenopathyorsplenomegaly").
+    """
+    if len(symptom) < 4:
+        return False
+    if symptom == term or term in symptom:
+        return True
+    if term.startswith(symptom) and term[len(symptom):].startswith(("or", "with")):
+        return True
+    return term.endswith(symptom) and term[: -len(symptom)].endswith("or")
+
+
+def _action(head: str) -> Optional[str]:
+    h = squash(head)[:160]
+    pathway = "suspectedcancerpathway" in h or "immediatespecialist" in h or "veryurgentreferral" in h
+    if h.startswith(("refer", "makeareferral")):
+        return "refer" if pathway else None
+    if h.startswith("consider"):
+        if pathway or "urgentreferral" in h.replace("nonurgent", ""):
+            return "consider_refer"
+        if "nonurgent" in h or "routine" in h or "directaccess" in h and "urgent" not in h:
+            return "non_urgent"
+        if "urgent" in h:
+            return "consider_urgent_investigation"
+        return None
+    if h.startswith("offer"):
+        return "offer_urgent_investigation" if "urgent" in h else "non_urgent"
+    return None
+
+
+def _conditions(text: str) -> dict:
+    s = squash(text)
+    cond: Dict[str, object] = {}
+    for lo in re.findall(r"aged(\d+)(?:and|or)over", s):
+        cond["min_age"] = max(int(lo), cond.get("min_age", 0))
+    for hi in re.findall(r"agedunder(\d+)", s):
+        cond["max_age"] = int(hi) - 1
+    for lo, hi in re.findall(r"aged(\d+)to(\d+)", s):
+        cond["min_age"], cond["max_age"] = int(lo), int(hi)
+    if "childrenandyoungpeople" in s or "inchildren" in s:
+        cond.setdefault("max_age", 24)
+    elif "adult" in s:
+        cond.setdefault("min_age", 18)
+    if "women" in s or "awoman" in s:
+        cond["sex"] = "female"
+    elif re.search(r"(?:in|for)men", s):
+        cond["sex"] = "male"
+    if "eversmoked" in s:
+        cond["ever_smoked"] = True
+    return cond
+
+
+def _merge(*conds: dict) -> dict:
+    out: Dict[str, object] = {}
+    for cond in conds:
+        for key, value in cond.items():
+            if key == "min_age":
+                out[key] = max(value, out.get(key, 0))
+            elif key == "max_age":
+                out[key] = min(value, out.get(key, 200))
+            else:
+                out[key] = value
+    return out
+
+
+def _alternatives(text: str) -> List[str]:
+    """
+    The first sentence of `text` split into its "or" alternatives, qualifiers dropped. A lone
+    modifier is glued back onto the next alternative.
+    """
+    text = _SENTENCE_END.split(_YEAR_TAG.sub(" ", text), maxsplit=1)[0]
+    pieces, carry = [], ""
+    for piece in _OR_ALTERNATIVE.split(text):
+        piece = carry + piece
+        if _MODIFIER.fullmatch(_strip_fillers(squash(piece))):
+            carry = piece + " "
+            continue
+        carry = ""
+        pieces.append(_QUALIFIER.sub("", piece))
+    return pieces
+
+
+def _term_options(text: str) -> List[List[str]]:
+    """
+    One list of terms (all needed) per alternative in `text`.
+    """
+    return [terms for alternative in _alternatives(text) if (terms := _terms(alternative))]
+
+
+def _items(texts: Sequence[str]) -> List[str]:
+    # a symptom list: every alternative of every item counts as one item
+    return [t for text in texts for option in _term_options(text) for t in option]
+
+
+def _terms(text: str) -> List[str]:
+    """
+    Squashed symptom terms from a phrase: age/smoking wording removed, split on commas and "and".
+    A lone modifier ("persistent and unexplained lump") is glued back onto the next piece.
+    """
+    text = _SENTENCE_END.split(_YEAR_TAG.sub(" ", text), maxsplit=1)[0]
+    text = _AGE_PHRASE.sub(" ", _PARENTHESES.sub(" ", text))
+    text = _ARTICLE.sub(" ", re.sub(r"ever\s*smoked", " ", text, flags=re.I))
+    terms, carry = [], ""
+    for piece in re.split(r",|:|\band\b", text):
+        term = _strip_fillers(carry + squash(piece))
+        if not term:
+            continue
+        if _MODIFIER.fullmatch(term):
+            carry = term
+            continue
+        carry = ""
+        if len(term) >= 4 and term not in ("theyhave", "peoplewith"):
+            terms.append(term)
+    return terms
+
+
+def _clause(cond: dict, all_of: List[str], any_of: Sequence[str] = (), min_count: int = 0) -> Optional[dict]:
+    if not all_of and not any_of:
+        return None
+    return {**cond, "all_of": list(all_of), "any_of": list(any_of), "min_count": min_count if any_of else 0}
+
+
+def _clauses(cond: dict, text: str, any_of: Sequence[str] = (), min_count: int = 0) -> List[Optional[dict]]:
+    # "A or B" in the required part is one clause per alternative
+    return [_clause(cond, all_of, any_of, min_count) for all_of in _term_options(text) or [[]]]
+
+
+def _split_counted(text: str) -> List[tuple]:
+    """
+    (text before, min_count) for every "N or more of the following" / "any of the following".
+    """
+    out, prev = [], 0
+    for m in _COUNT.finditer(text):
+        count = _NON_ALNUM.sub("", m.group(1).lower())
+        out.append((text[prev:m.start()], int(count) if count.isdigit() else _COUNT_WORDS[count]))
+        prev = m.end()
+    return out
+
+
+def _subject(head: str) -> str:
+    """
+    The part of a single-sentence recommendation describing the patient ("if they are aged 40 and
+    over and have jaundice" -> "aged40andoverandhavejaundice").
+    """
+    head = _PARENTHESES.sub(" ", _SENTENCE_END.split(_YEAR_TAG.sub(" ", head), maxsplit=1)[0])
+    s = re.sub(r"within\d+\w*", "", squash(_ARTICLE.sub(" ", head)))
+    cut = [s.find(t) + len(t) for t in ("ifthey", "inpeoplewith", "peoplewith", "inpeople", "presentingwith", "with")
+           if s.find(t) > 0]
+    return s[min(cut):] if cut else ""
+
+
+def _squashed_terms(segment: str) -> List[str]:
+    segment = re.sub(r"aged(?:under)?\d+(?:andover|orover|to\d+)?", "", segment)
+    segment = segment.replace("eversmoked", "")
+    segment = re.sub(r"(?:children|youngpeople|adults|women|men|people)(?=with|aged|$)", "", segment)
+    term = _strip_fillers(segment)
+    return [term] if len(term) >= 4 and not _MODIFIER.fullmatch(term) else []
+
+
+def compile_recommendation(rec: dict) -> Optional[dict]:
+    """
+    One extracted recommendation -> a rule {id, page, action, text, clauses}, or None when it isn't
+    a referral/investigation trigger the patient fields can evaluate. Each clause is satisfied when
+    its age/sex/smoking conditions hold, every `all_of` term matches a symptom and at least
+    `min_count` of `any_of` do.
+    """
+    action = _action(rec["head"])
+    if action is None:
+        return None
+    head, bullets = rec["head"], rec["bullets"]
+    head_cond = _conditions(_SENTENCE_END.split(head, maxsplit=1)[0])
+    head_cond.pop("ever_smoked", None)
+    clauses = []
+    counted = _split_counted(head)
+    if not counted and "thefollowing" in squash(head):
+        #"Offer the following to assess for ...": the bullets are tests, not symptoms
+        bullets = []
+    if counted and bullets:
+        #the bullets are the symptom list, the head says how many of them are needed
+        items = _items([text for text, _ in bullets])
+        for i, (segment, count) in enumerate(counted):
+            #the first segment also carries the action ("an urgent chest X-ray"), only its subject counts
+            if any(word in (_subject(segment) if i == 0 else squash(segment)) for word in _UNCHECKABLE):
+                continue
+            smoking = {"ever_smoked": True} if "eversmoked" in squash(segment) else {}
+            clauses.append(_clause(_merge(head_cond, smoking), [], items, count))
+    elif bullets:
+        #bullets are alternatives; one ending in "any of the following" takes the sub-bullets
+        #(its own, or the list after the last bullet when several bullets share it)
+        shared = next((subs for _, subs in reversed(bullets) if subs), [])
+        for text, subs in bullets:
+            if any(word in squash(text) for word in _UNCHECKABLE):
+                continue
+            cond = _merge(head_cond, _conditions(text))
+            bullet_counted = _split_counted(text)
+            if bullet_counted:
+                segment, count = bullet_counted[0]
+                clauses += _clauses(cond, segment, _items(subs or shared), count)
+            elif subs:
+                clauses += _clauses(cond, text, _items(subs), 1)
+            else:
+                clauses += _clauses(cond, text)
+    else:
+        #single-sentence recommendation: the subject follows "with"/"if they", later alternatives stand alone
+        for i, alternative in enumerate(_alternatives(head)):
+            subject = _subject(alternative) if i == 0 else squash(_ARTICLE.sub(" ", _PARENTHESES.sub(" ", alternative)))
+            clauses.append(_clause(head_cond, _squashed_terms(subject)))
+    clauses = [c for c in clauses if c is not None and not any(
+        word in term for term in c["all_of"] + c["any_of"] for word in _UNCHECKABLE)]
+    if not clauses:
+        return None
+    return {
+        "id": rec["id"],
+        "page": rec["page"],
+        "source": rec.get("source"),
+        "action": action,
+        "decision": ACTIONS[action][0],
+        "text": rec["text"],
+        "clauses": clauses,
+    }
+
+
+def extract_recommendations(pages: List[Document]) -> List[dict]:
+    """
+    Numbered NG12 recommendations (1.x.y) from cleaned page documents, in document order: head
+    sentence, bullets with their sub-bullets, full text and the page the recommendation starts on.
+    Recommendations quoted in the symptom tables ("[1.1.2]") are not picked up.
+    """
+    recs: List[dict] = []
+    current = None
+    for doc in sorted(pages, key=lambda d: d.metadata.get("page", 0)):
+        text = _FOOTER.sub("", doc.page_content)
+        for raw in text.split("\n"):
+            line = raw.strip()
+            if not line:
+                continue
+            start = _REC_START.match(line)
+            if start:
+                current = {"id": start.group(1), "page": doc.metadata.get("page", 0), "source": doc.metadata.get("source"),
+                           "head": line[start.end():], "bullets": [], "lines": [line], "closed": False}
+                recs.append(current)
+            elif current is None or current["closed"]:
+                continue
+            elif line.startswith("•"):
+                current["bullets"].append([line[1:].strip(), []])
+                current["lines"].append(line)
+            elif line.startswith(("－", "–")) and current["bullets"]:
+                current["bullets"][-1][1].append(line[1:].strip())
+                current["lines"].append(line)
+            else:
+                if current["bullets"] and current["bullets"][-1][1]:
+                    current["bullets"][-1][1][-1] += " " + line
+                elif current["bullets"]:
+                    current["bullets"][-1][0] += " " + line
+                else:
+                    current["head"] += " " + line
+                current["lines"].append(line)
+            if current is not None and _YEAR_TAG.search(current["lines"][-1]):
+                current["closed"] = True
+    for rec in recs:
+        rec["text"] = " ".join(rec.pop("lines"))
+        rec["text"] = rec["text"][: _YEAR_TAG.search(rec["text"]).end()] if _YEAR_TAG.search(rec["text"]) else rec["text"]
+        rec["bullets"] = [(b, subs) for b, subs in rec["bullets"]]
+        rec.pop("closed")
+    return recs
+
+
+def build_rules(pages: List[Document]) -> List[dict]:
+    """
+    Compiled rules for every recommendation in `pages` that a patient record can trigger.
+    """
+    recs = extract_recommendations(pages)
+    rules = [r for r in (compile_recommendation(rec) for rec in recs) if r is not None]
+    logger.info("Compiled %d rules from %d NG12 recommendations", len(rules), len(recs))
+    return rules
+
+
+def guideline_pages(pdf_path: str) -> List[Document]:
+    """
+    Page documents exactly as the ingestion fast path produces them (pypdf + clean_pdf_text).
+    """
+    from pypdf import PdfReader
+    from scripts.ingestion import _pypdf_page_doc
+
+    reader = PdfReader(pdf_path)
+    return [_pypdf_page_doc(pdf_path, i, page.extract_text() or "") for i, page in enumerate(reader.pages)]
+
+
+def _ever_smoked(patient: dict) -> Optional[bool]:
+    history = squash(patient.get("smoking_history") or "")
+    if not history:
+        return None
+    return not history.startswith(("never", "non"))
+
+
+class RuleTable:
+    """
+    NG12 recommendations as a symptom-indexed rule table, so most assessments need no LLM call.
+
+    Rules are compiled once per version of the guideline pdf and persisted as json next to the
+    vector index. At load every clause term goes into an inverted index; a patient's symptoms are
+    resolved to terms through a memo (the symptom vocabulary is small), and only the rules those
+    terms point at are evaluated.
+    """
+
+    def __init__(self, rules: List[dict], source: Optional[str] = None, sha256: Optional[str] = None):
+        self.rules = rules
+        self.source = source
+        self.sha256 = sha256
+        self._by_term: Dict[str, Set[int]] = defaultdict(set)
+        for i, rule in enumerate(rules):
+            for clause in rule["clauses"]:
+                for term in clause["all_of"] + clause["any_of"]:
+                    self._by_term[term].add(i)
+        self._terms = sorted(self._by_term)
+        self._clean = {term for term in self._terms if clean_term(term)}
+        self._memo: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._outcomes: Counter = Counter()
+        self._eval_us = 0.0
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    @classmethod
+    def load(cls, table_path: str) -> "RuleTable":
+        with open(table_path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+        return cls(data["rules"], data.get("source"), data.get("sha256"))
+
+    @classmethod
+    def build(cls, pdf_path: str, table_path: str) -> "RuleTable":
+        table = cls(build_rules(guideline_pages(pdf_path)), pdf_path, file_sha256(pdf_path))
+        path = Path(table_path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix(".tmp")
+        with open(tmp, "w", encoding="utf-8") as fh:
+            json.dump({"version": TABLE_VERSION, "source": pdf_path, "sha256": table.sha256, "rules": table.rules}, fh, indent=1)
+        os.replace(tmp, path)
+        return table
+
+    @classmethod
+    def open_or_build(cls, pdf_path: str, table_path: str = "scripts_VS/ng12_rules.json") -> "RuleTable":
+        """
+        The persisted table, recompiled first if the guideline pdf changed. An empty table if
+        neither exists (every assessment then goes to the LLM).
+        """
+        if not os.path.exists(pdf_path):
+            if os.path.exists(table_path):
+                return cls.load(table_path)
+            logger.warning("NG12 pdf %s not found, rule fast path disabled", pdf_path)
+            return cls([])
+        if os.path.exists(table_path):
+            try:
+                with open(table_path, "r", encoding="utf-8") as fh:
+                    data = json.load(fh)
+                if data.get("version") == TABLE_VERSION and data.get("sha256") == file_sha256(pdf_path):
+                    return cls(data["rules"], data.get("source"), data.get("sha256"))
+            except (OSError, ValueError, KeyError):
+                logger.warning("Rebuilding unreadable rule table %s", table_path)
+        return cls.build(pdf_path, table_path)
+
+    def _symptom_terms(self, symptom: str) -> tuple:
+        key = squash(symptom)
+        terms = self._memo.get(key)
+        if terms is None:
+            terms = tuple(t for t in self._terms if term_matches(key, t))
+            self._memo[key] = terms
+        return terms
+
+    @staticmethod
+    def _conditions_hold(clause: dict, patient: dict) -> bool:
+        age = patient.get("age")
+        if "min_age" in clause and (age is None or age < clause["min_age"]):
+            return False
+        if "max_age" in clause and (age is None or age > clause["max_age"]):
+            return False
+        if "sex" in clause and squash(patient.get("gender") or "") not in (clause["sex"], clause["sex"][0]):
+            return False
+        return not clause.get("ever_smoked") or bool(_ever_smoked(patient))
+
+    def covers(self, patient: dict) -> bool:
+        """
+        True when every symptom of the patient resolves to a cleanly compiled term. Otherwise a
+        symptom the table can't read would be silently ignored, and the decision may under-triage.
+        """
+        symptoms = patient.get("symptoms") or []
+        covered = bool(symptoms) and all(self._clean.intersection(self._symptom_terms(s)) for s in symptoms)
+        if not covered:
+            with self._lock:
+                self._outcomes["uncovered"] += 1
+        return covered
+
+    def matches(self, patient: dict) -> List[dict]:
+        """
+        Every rule the patient satisfies, strongest action first, with the symptoms that matched.
+        """
+        matched_terms: Dict[str, str] = {}
+        for symptom in patient.get("symptoms") or []:
+            for term in self._symptom_terms(symptom):
+                matched_terms.setdefault(term, symptom)
+        candidates = sorted({i for term in matched_terms for i in self._by_term[term]})
+        found = []
+        for i in candidates:
+            rule = self.rules[i]
+            for clause in rule["clauses"]:
+                if not self._conditions_hold(clause, patient):
+                    continue
+                if not all(t in matched_terms for t in clause["all_of"]):
+                    continue
+                hits = [t for t in clause["any_of"] if t in matched_terms]
+                if len(hits) < clause["min_count"]:
+                    continue
+                symptoms = sorted({matched_terms[t] for t in clause["all_of"] + hits})
+                found.append({"rule": rule, "symptoms": symptoms})
+                break
+        found.sort(key=lambda m: (-ACTIONS[m["rule"]["action"]][1], -len(m["symptoms"])))
+        return found
+
+    def evaluate(self, patient: dict) -> Optional[dict]:
+        """
+        Decision JSON in the /assess shape from the strongest matching recommendation, or None
+        when no rule matches (the caller falls back to the LLM).
+        """
+        start = time.perf_counter()
+        found = self.matches(patient)
+        decision = None
+        if found:
+            best = found[0]["rule"]
+            decision = {
+                "decision": best["decision"],
+                "rationale": (
+                    f"NG12 {best['id']} ({best['action'].replace('_', ' ')}) applies: "
+                    f"{', '.join(found[0]['symptoms'])}, age {patient.get('age')}."
+                ),
+                "citations": [
+                    {"source": m["rule"].get("source") or self.source, "page": m["rule"]["page"],
+                     "recommendation": m["rule"]["id"], "excerpt": m["rule"]["text"][:300]}
+                    for m in found
+                ],
+                "matched_rules": [m["rule"]["id"] for m in found],
+                "decided_by": "rule_table",
+            }
+        with self._lock:
+            self._outcomes["matched" if decision else "no_match"] += 1
+            self._eval_us += (time.perf_counter() - start) * 1e6
+        return decision
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._outcomes["matched"] + self._outcomes["no_match"]
+            return {
+                "rules": len(self.rules),
+                "uncovered": self._outcomes["uncovered"],
+                "evaluated": total,
+                "matched": self._outcomes["matched"],
+                "match_rate": self._outcomes["matched"] / total if total else 0.0,
+                "eval_us_avg": self._eval_us / total if total else 0.0,
+            }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the NG12 rule table from the guideline pdf.")
+    parser.add_argument("pdf", nargs="?", default="data/NG12_pdf.pdf")
+    parser.add_argument("--table", default="scripts_VS/ng12_rules.json")
+    parser.add_argument("--show", action="store_true", help="print every compiled rule")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    table = RuleTable.build(args.pdf, args.table)
+    if args.show:
+        for rule in table.rules:
+            print(rule["id"], rule["action"], json.dumps(rule["clauses"]))
+    print(json.dumps({"rules": len(table), "table": args.table}))
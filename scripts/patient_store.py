@@ -0,0 +1,306 @@
+import argparse
+import fcntl
+import hashlib
+import json
+import logging
+import os
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+from scripts.ingest_manifest import file_sha256
+
+logger = logging.getLogger(__name__)
+
+# on-disk layout of one store directory, one generation per version of the source file:
+#   MANIFEST.json                    -> live generation, vocabularies, source fingerprint (os.replace)
+#   ids-<gen>.bin                    -> fixed-width patient ids in row order
+#   idhash-<gen>.i64                 -> open addressing table, slot -> row + 1 (0 = empty), linear probing
+#   records-<gen>.jsonl / .off       -> full records, decoded lazily by row (uint64 offsets, rows + 1)
+#   age-<gen>.u8                     -> age column
+#   <field>-<gen>.indptr / .rows     -> CSR postings per vocabulary term, field in symptom|smoking|age_band
+MANIFEST_NAME = "MANIFEST.json"
+LOCK_NAME = ".write.lock"
+POSTING_FIELDS = ("symptom", "smoking", "age_band")
+AGE_BAND_YEARS = 5
+
+
+def normalize_term(value: str) -> str:
+    return " ".join(str(value).lower().split())
+
+
+def age_band(age: int) -> str:
+    lo = (int(age) // AGE_BAND_YEARS) * AGE_BAND_YEARS
+    return f"{lo}-{lo + AGE_BAND_YEARS - 1}"
+
+
+def _id_hash(patient_id: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(patient_id, digest_size=8).digest(), "little")
+
+
+def _iter_source(path: Path) -> Iterator[dict]:
+    """
+    Records from a json array (data/patients.json) or json lines file.
+    """
+    with open(path, "r", encoding="utf-8") as fh:
+        if path.suffix == ".jsonl":
+            for line in fh:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(fh)
+
+
+def _csr(pairs_term: np.ndarray, pairs_row: np.ndarray, vocab_size: int):
+    order = np.lexsort((pairs_row, pairs_term))
+    indptr = np.zeros(vocab_size + 1, dtype=np.uint64)
+    np.cumsum(np.bincount(pairs_term, minlength=vocab_size), out=indptr[1:])
+    return indptr, pairs_row[order].astype(np.uint32)
+
+
+class PatientStore:
+    """
+    Read-only patient records built from data/patients.json, for direct lookups without the retriever.
+
+    Records are keyed by patient_id through an on-disk hash table and indexed by symptom, smoking
+    history and age band as CSR posting lists. Everything is opened with mmap and records are
+    decoded one row at a time, so a million patients cost page cache, not Python objects.
+    """
+
+    def __init__(self, store_dir: str = "scripts_VS/patient_store"):
+        self.store_dir = Path(store_dir)
+        self.manifest: Optional[dict] = None
+        self._open()
+
+    @classmethod
+    def open_or_build(cls, source: str, store_dir: str = "scripts_VS/patient_store") -> "PatientStore":
+        """
+        Open the store, rebuilding it first if `source` changed since the last build.
+        """
+        store = cls(store_dir)
+        if Path(source).exists() and not store.is_current(source):
+            store.build(source)
+        return store
+
+    # read side
+    def _open(self) -> None:
+        try:
+            self.manifest = json.loads((self.store_dir / MANIFEST_NAME).read_text())
+        except FileNotFoundError:
+            self.manifest = None
+            self.count = 0
+            self.vocab: Dict[str, Dict[str, int]] = {f: {} for f in POSTING_FIELDS}
+            return
+        m, d = self.manifest, self.store_dir
+        self.count = m["count"]
+        self.vocab = {f: {term: i for i, term in enumerate(m["vocab"][f])} for f in POSTING_FIELDS}
+        self._id_width = m["id_width"]
+        self._ids = np.memmap(d / m["files"]["ids"], dtype=f"S{self._id_width}", mode="r") if self.count else np.zeros(0, dtype="S1")
+        self._table = np.memmap(d / m["files"]["idhash"], dtype=np.int64, mode="r")
+        self._offsets = np.memmap(d / m["files"]["offsets"], dtype=np.uint64, mode="r")
+        self._records = np.memmap(d / m["files"]["records"], dtype=np.uint8, mode="r") if self.count else np.zeros(0, dtype=np.uint8)
+        self.ages = np.memmap(d / m["files"]["age"], dtype=np.uint8, mode="r") if self.count else np.zeros(0, dtype=np.uint8)
+        self._postings = {}
+        for f in POSTING_FIELDS:
+            indptr = np.memmap(d / m["files"][f"{f}_indptr"], dtype=np.uint64, mode="r")
+            rows = np.memmap(d / m["files"][f"{f}_rows"], dtype=np.uint32, mode="r") if int(indptr[-1]) else np.zeros(0, dtype=np.uint32)
+            self._postings[f] = (indptr, rows)
+
+    @property
+    def generation(self) -> str:
+        return self.manifest["generation"] if self.manifest else ""
+
+    def is_current(self, source: str) -> bool:
+        if self.manifest is None:
+            return False
+        st = os.stat(source)
+        if [st.st_size, st.st_mtime_ns] == self.manifest["source_stat"]:
+            return True
+        return file_sha256(source) == self.manifest["source_sha256"]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def row_of(self, patient_id: str) -> Optional[int]:
+        """
+        O(1) expected: hash into the table and probe until the id or an empty slot.
+        """
+        if not self.count:
+            return None
+        key = str(patient_id).encode("utf-8")
+        if len(key) > self._id_width:
+            return None
+        mask = len(self._table) - 1
+        slot = _id_hash(key) & mask
+        while True:
+            row = int(self._table[slot]) - 1
+            if row < 0:
+                return None
+            if self._ids[row] == key:
+                return row
+            slot = (slot + 1) & mask
+
+    def record(self, row: int) -> dict:
+        start, end = int(self._offsets[row]), int(self._offsets[row + 1])
+        return json.loads(self._records[start:end].tobytes())
+
+    def records(self, rows: Iterable[int]) -> List[dict]:
+        return [self.record(int(r)) for r in rows]
+
+    def get(self, patient_id: str) -> Optional[dict]:
+        row = self.row_of(patient_id)
+        return None if row is None else self.record(row)
+
+    def postings(self, field: str, term: str) -> np.ndarray:
+        """
+        Sorted rows having `term` in `field` (symptom, smoking or age_band).
+        """
+        i = self.vocab[field].get(normalize_term(term))
+        if i is None:
+            return np.zeros(0, dtype=np.uint32)
+        indptr, rows = self._postings[field]
+        return np.asarray(rows[int(indptr[i]):int(indptr[i + 1])])
+
+    def find(
+        self,
+        symptoms: Sequence[str] = (),
+        smoking: Optional[str] = None,
+        min_age: Optional[int] = None,
+        max_age: Optional[int] = None,
+    ) -> np.ndarray:
+        """
+        Rows matching every given filter (all symptoms, the smoking history, the age range).
+        """
+        lists = [self.postings("symptom", s) for s in symptoms]
+        if smoking is not None:
+            lists.append(self.postings("smoking", smoking))
+        age_filter = min_age is not None or max_age is not None
+        lo = min_age if min_age is not None else 0
+        hi = max_age if max_age is not None else 255
+        if not lists:
+            if not age_filter:
+                return np.arange(self.count, dtype=np.uint32)
+            # age only: union of the overlapping bands
+            bands = [b for b in self.vocab["age_band"] if int(b.split("-")[0]) <= hi and int(b.split("-")[1]) >= lo]
+            lists.append(np.unique(np.concatenate([self.postings("age_band", b) for b in bands])) if bands else np.zeros(0, dtype=np.uint32))
+        lists.sort(key=len)
+        result = lists[0]
+        for other in lists[1:]:
+            if not len(result):
+                break
+            result = np.intersect1d(result, other, assume_unique=True)
+        if age_filter and len(result):
+            # exact range on the age column (edge bands only partly overlap it)
+            ages = self.ages[result]
+            result = result[(ages >= lo) & (ages <= hi)]
+        return result
+
+    # write side
+    def build(self, source: str) -> None:
+        """
+        Build a new generation from `source` next to the live one and publish it.
+        """
+        source_path = Path(source)
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.store_dir / LOCK_NAME, "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                self._build(source_path)
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+        self._open()
+
+    def _build(self, source: Path) -> None:
+        st = source.stat()
+        sha = file_sha256(str(source))
+        gen = sha[:16]
+        d = self.store_dir
+        files = {
+            "ids": f"ids-{gen}.bin", "idhash": f"idhash-{gen}.i64", "records": f"records-{gen}.jsonl",
+            "offsets": f"records-{gen}.off", "age": f"age-{gen}.u8",
+        }
+        for f in POSTING_FIELDS:
+            files[f"{f}_indptr"] = f"{f}-{gen}.indptr"
+            files[f"{f}_rows"] = f"{f}-{gen}.rows"
+
+        ids: List[bytes] = []
+        ages: List[int] = []
+        offsets = [0]
+        vocab: Dict[str, Dict[str, int]] = {f: {} for f in POSTING_FIELDS}
+        pairs: Dict[str, tuple] = {f: ([], []) for f in POSTING_FIELDS}
+
+        def add_term(field: str, value: str, row: int) -> None:
+            term = normalize_term(value)
+            code = vocab[field].setdefault(term, len(vocab[field]))
+            pairs[field][0].append(code)
+            pairs[field][1].append(row)
+
+        with open(d / files["records"], "wb") as out:
+            for row, record in enumerate(_iter_source(source)):
+                ids.append(str(record["patient_id"]).encode("utf-8"))
+                age = int(record.get("age") or 0)
+                ages.append(min(max(age, 0), 255))
+                for symptom in set(normalize_term(s) for s in record.get("symptoms") or []):
+                    add_term("symptom", symptom, row)
+                if record.get("smoking_history"):
+                    add_term("smoking", record["smoking_history"], row)
+                add_term("age_band", age_band(age), row)
+                payload = json.dumps(record, separators=(",", ":")).encode("utf-8")
+                out.write(payload)
+                offsets.append(offsets[-1] + len(payload))
+            out.flush()
+            os.fsync(out.fileno())
+
+        count = len(ids)
+        id_width = max((len(i) for i in ids), default=1)
+        np.asarray(ids, dtype=f"S{id_width}").tofile(d / files["ids"])
+        np.asarray(offsets, dtype=np.uint64).tofile(d / files["offsets"])
+        np.asarray(ages, dtype=np.uint8).tofile(d / files["age"])
+
+        # load factor <= 0.5 keeps probe chains short
+        table = np.zeros(1 << max(int(2 * count - 1).bit_length(), 3), dtype=np.int64)
+        mask = len(table) - 1
+        for row, key in enumerate(ids):
+            slot = _id_hash(key) & mask
+            while table[slot]:
+                if ids[table[slot] - 1] == key:
+                    raise ValueError(f"Duplicate patient_id {key.decode()!r} in {source}")
+                slot = (slot + 1) & mask
+            table[slot] = row + 1
+        table.tofile(d / files["idhash"])
+
+        for f in POSTING_FIELDS:
+            terms, rows = pairs[f]
+            indptr, postings = _csr(np.asarray(terms, dtype=np.int64), np.asarray(rows, dtype=np.int64), len(vocab[f]))
+            indptr.tofile(d / files[f"{f}_indptr"])
+            postings.tofile(d / files[f"{f}_rows"])
+
+        manifest = {
+            "generation": gen,
+            "count": count,
+            "id_width": id_width,
+            "source": str(source),
+            "source_sha256": sha,
+            "source_stat": [st.st_size, st.st_mtime_ns],
+            "vocab": {f: sorted(vocab[f], key=vocab[f].get) for f in POSTING_FIELDS},
+            "files": files,
+        }
+        tmp = d / (MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(manifest))
+        os.replace(tmp, d / MANIFEST_NAME)
+
+        # drop older generations, open mmaps in other processes keep their inodes alive
+        live = set(files.values()) | {MANIFEST_NAME, LOCK_NAME}
+        for path in d.iterdir():
+            if path.name not in live:
+                path.unlink(missing_ok=True)
+        logger.info("Built patient store %s: %d patients from %s", d, count, source)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build the patient store from a patients json / jsonl file.")
+    parser.add_argument("source", nargs="?", default="data/patients.json")
+    parser.add_argument("store_dir", nargs="?", default="scripts_VS/patient_store")
+    args = parser.parse_args()
+    PatientStore(args.store_dir).build(args.source)
@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+from collections import Counter
+from typing import List, Optional, Tuple
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler for one thread: a daemon thread reads the target's stack every `interval_s`
+    via sys._current_frames, nothing is installed in the profiled code. The result is in collapsed
+    form, "outer;...;inner count" per distinct stack, which flamegraph.pl and speedscope read.
+
+    On the event loop thread this sees whatever coroutine is running, concurrent requests included,
+    and not work handed to asyncio.to_thread; profile on a quiet worker for clean stacks.
+    """
+
+    def __init__(self, thread_id: Optional[int] = None, interval_s: float = 0.005, max_depth: int = 64):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval_s = interval_s
+        self.max_depth = max_depth
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.elapsed_s = 0.0
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    def _stack(self, frame) -> Tuple[str, ...]:
+        names = []
+        while frame is not None and len(names) < self.max_depth:
+            code = frame.f_code
+            names.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{frame.f_lineno})")
+            frame = frame.f_back
+        return tuple(reversed(names))
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[self._stack(frame)] += 1
+            self.samples += 1
+
+    def start(self) -> "SamplingProfiler":
+        self._started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> "SamplingProfiler":
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.elapsed_s = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self) -> "SamplingProfiler":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+    def collapsed(self) -> str:
+        return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+    def top(self, n: int = 10) -> List[Tuple[str, int]]:
+        """
+        Frames that were innermost (running, not waiting on a callee) in the most samples.
+        """
+        leaves: Counter = Counter()
+        for stack, count in self.stacks.items():
+            if stack:
+                leaves[stack[-1]] += count
+        return leaves.most_common(n)
@@ -0,0 +1,470 @@
+import fcntl
+import json
+import logging
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from scripts.ann_index import IVFIndex
+from scripts.mmr import batch_mmr, mmr_select, top_k
+
+logger = logging.getLogger(__name__)
+
+# on-disk layout of one index directory:
+#   MANIFEST.json          -> points at the live generation (swapped atomically with os.replace)
+#   vectors-<gen>.f32      -> contiguous row-major float32 matrix, rows are L2 normalized
+#   chunks-<gen>.jsonl     -> one json object per row: id, text, metadata
+#   chunks-<gen>.off       -> uint64 byte offsets into the jsonl sidecar (rows + 1 entries)
+#   ivf-<gen>.npz          -> optional IVF centroids + per-row list ids, once the index is big enough
+MANIFEST_NAME = "MANIFEST.json"
+LOCK_NAME = ".write.lock"
+_DTYPE = np.float32
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    matrix = np.asarray(matrix, dtype=_DTYPE)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _fsync_write(path: Path, payload: bytes) -> None:
+    with open(path, "wb") as fh:
+        fh.write(payload)
+        fh.flush()
+        os.fsync(fh.fileno())
+
+
+class _Snapshot:
+    """
+    Read-only view over one generation of the index. Rows are decoded lazily from the sidecar.
+    """
+
+    def __init__(self, index_dir: Path, manifest: dict):
+        self.generation = manifest["generation"]
+        self.count = manifest["count"]
+        self.dim = manifest["dim"]
+        if self.count:
+            self.matrix = np.memmap(
+                index_dir / manifest["vectors"], dtype=_DTYPE, mode="r", shape=(self.count, self.dim)
+            )
+            self._offsets = np.memmap(index_dir / manifest["offsets"], dtype=np.uint64, mode="r")
+            self._chunks = np.memmap(index_dir / manifest["chunks"], dtype=np.uint8, mode="r")
+        else:
+            self.matrix = np.zeros((0, self.dim), dtype=_DTYPE)
+            self._offsets = np.zeros(1, dtype=np.uint64)
+            self._chunks = np.zeros(0, dtype=np.uint8)
+        self.ann = IVFIndex.load(index_dir / manifest["ann"]) if manifest.get("ann") else None
+        self._id_to_row = None
+
+    def row(self, i: int) -> dict:
+        start, end = int(self._offsets[i]), int(self._offsets[i + 1])
+        return json.loads(self._chunks[start:end].tobytes())
+
+    def document(self, i: int) -> Document:
+        row = self.row(i)
+        return Document(id=row["id"], page_content=row["text"], metadata=row["metadata"])
+
+    def rows(self) -> Iterable[dict]:
+        for i in range(self.count):
+            yield self.row(i)
+
+    @property
+    def id_to_row(self) -> dict:
+        # only built when someone asks for ids (get_by_ids/delete/upsert), keeps startup cheap
+        if self._id_to_row is None:
+            self._id_to_row = {row["id"]: i for i, row in enumerate(self.rows())}
+        return self._id_to_row
+
+
+_EMPTY_MANIFEST = {"generation": 0, "count": 0, "dim": 0}
+
+
+class MmapVectorStore(VectorStore):
+    """
+    Persistent vector store: a float32 matrix + chunk metadata sidecar opened with mmap.
+
+    Every worker opening the same `index_dir` shares the page cache read-only. Writers build a
+    complete new generation next to the live one and publish it by swapping the manifest, so
+    readers always see either the old or the new snapshot, never a partial one.
+
+    Past `ann_min_rows` rows each generation also gets an IVF index (scripts.ann_index): searches
+    score the `nprobe` nearest lists instead of every row. Inserts extend the previous generation's
+    lists; the centroids are retrained once the index is `ann_retrain_factor` times the size they
+    were trained on. `ann_min_rows=None` keeps every search exact.
+    """
+
+    def __init__(
+        self,
+        embedding: Embeddings,
+        index_dir: str = "scripts_VS/vector_index",
+        ann_min_rows: Optional[int] = None,
+        nprobe: int = 16,
+        ann_nlist: Optional[int] = None,
+        ann_retrain_factor: float = 4.0,
+    ):
+        self.embedding = embedding
+        self.ann_min_rows = ann_min_rows
+        self.nprobe = nprobe
+        self.ann_nlist = ann_nlist
+        self.ann_retrain_factor = ann_retrain_factor
+        self.index_dir = Path(index_dir)
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._manifest_stat = None
+        self._snapshot = _Snapshot(self.index_dir, _EMPTY_MANIFEST)
+        self.refresh()
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self.embedding
+
+    def __len__(self) -> int:
+        return self.snapshot().count
+
+    # snapshot management
+    def _read_manifest(self) -> Optional[dict]:
+        path = self.index_dir / MANIFEST_NAME
+        try:
+            return json.loads(path.read_text())
+        except FileNotFoundError:
+            return None
+
+    def refresh(self) -> _Snapshot:
+        """
+        Re-open the index if another process (or thread) published a new generation.
+        """
+        path = self.index_dir / MANIFEST_NAME
+        try:
+            st = path.stat()
+            stat_key = (st.st_ino, st.st_mtime_ns, st.st_size)
+        except FileNotFoundError:
+            return self._snapshot
+        if stat_key == self._manifest_stat:
+            return self._snapshot
+
+        with self._lock:
+            # a writer can retire the files between reading the manifest and opening them; retry
+            for _ in range(5):
+                manifest = self._read_manifest()
+                if manifest is None:
+                    return self._snapshot
+                if manifest["generation"] == self._snapshot.generation:
+                    break
+                try:
+                    self._snapshot = _Snapshot(self.index_dir, manifest)
+                    break
+                except FileNotFoundError:
+                    continue
+            self._manifest_stat = stat_key
+            return self._snapshot
+
+    def snapshot(self) -> _Snapshot:
+        return self.refresh()
+
+    def _publish(self, base: _Snapshot, keep_rows: np.ndarray, new_rows: List[dict], new_vectors: np.ndarray) -> None:
+        """
+        Write generation `base.generation + 1` = kept rows of `base` + new rows, then swap the manifest.
+        """
+        generation = base.generation + 1
+        dim = new_vectors.shape[1] if len(new_rows) else base.dim
+        count = len(keep_rows) + len(new_rows)
+        vectors_name = f"vectors-{generation:06d}.f32"
+        chunks_name = f"chunks-{generation:06d}.jsonl"
+        offsets_name = f"chunks-{generation:06d}.off"
+
+        vectors_path = self.index_dir / vectors_name
+        with open(vectors_path, "wb") as fh:
+            if len(keep_rows):
+                np.ascontiguousarray(base.matrix[keep_rows], dtype=_DTYPE).tofile(fh)
+            if len(new_rows):
+                np.ascontiguousarray(new_vectors, dtype=_DTYPE).tofile(fh)
+            fh.flush()
+            os.fsync(fh.fileno())
+
+        offsets = [0]
+        with open(self.index_dir / chunks_name, "wb") as fh:
+            rows = (base.row(int(i)) for i in keep_rows)
+            for row in (*rows, *new_rows):
+                line = json.dumps(row, ensure_ascii=False).encode("utf-8") + b"\n"
+                fh.write(line)
+                offsets.append(offsets[-1] + len(line))
+            fh.flush()
+            os.fsync(fh.fileno())
+        _fsync_write(self.index_dir / offsets_name, np.asarray(offsets, dtype=np.uint64).tobytes())
+
+        manifest = {
+            "generation": generation,
+            "count": count,
+            "dim": dim,
+            "vectors": vectors_name,
+            "chunks": chunks_name,
+            "offsets": offsets_name,
+        }
+        ann = self._next_ann(base, keep_rows, new_vectors, vectors_path, count, dim)
+        if ann is not None:
+            manifest["ann"] = f"ivf-{generation:06d}.npz"
+            _fsync_write(self.index_dir / manifest["ann"], ann.to_bytes())
+        tmp_manifest = self.index_dir / f"{MANIFEST_NAME}.tmp"
+        _fsync_write(tmp_manifest, json.dumps(manifest).encode("utf-8"))
+        os.replace(tmp_manifest, self.index_dir / MANIFEST_NAME)
+        self._retire(generation)
+        logger.info("Published vector index generation %d (%d chunks)", generation, count)
+
+    def _next_ann(
+        self, base: _Snapshot, keep_rows: np.ndarray, new_vectors: np.ndarray, vectors_path: Path, count: int, dim: int
+    ) -> Optional[IVFIndex]:
+        if self.ann_min_rows is None or count < self.ann_min_rows:
+            return None
+        if base.ann is not None and count <= base.ann.trained_count * self.ann_retrain_factor:
+            return base.ann.updated(keep_rows, np.asarray(new_vectors, dtype=_DTYPE))
+        matrix = np.memmap(vectors_path, dtype=_DTYPE, mode="r", shape=(count, dim))
+        ann = IVFIndex.train(matrix, nlist=self.ann_nlist)
+        logger.info("Trained IVF index: %d lists over %d chunks", ann.nlist, count)
+        return ann
+
+    def _retire(self, live_generation: int) -> None:
+        # keep the previous generation around for readers that are mid-refresh
+        for path in self.index_dir.iterdir():
+            stem = path.name.split(".", 1)[0]
+            if "-" not in stem:
+                continue
+            try:
+                gen = int(stem.rsplit("-", 1)[1])
+            except ValueError:
+                continue
+            if gen < live_generation - 1:
+                path.unlink(missing_ok=True)
+
+    def _write(self, mutate: Callable[[_Snapshot], Tuple[np.ndarray, List[dict], np.ndarray]]) -> None:
+        with open(self.index_dir / LOCK_NAME, "a") as lock_fh:
+            fcntl.flock(lock_fh, fcntl.LOCK_EX)
+            try:
+                base = self.refresh()
+                keep_rows, new_rows, new_vectors = mutate(base)
+                self._publish(base, keep_rows, new_rows, new_vectors)
+            finally:
+                fcntl.flock(lock_fh, fcntl.LOCK_UN)
+        self.refresh()
+
+    # writes
+    def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """
+        Normalized embedding matrix for `texts`, for callers that embed first and `commit` later.
+        """
+        return _normalize(self.embedding.embed_documents(texts))
+
+    def commit(
+        self,
+        texts: List[str],
+        metadatas: List[dict],
+        ids: List[str],
+        vectors: np.ndarray,
+        delete_ids: Sequence[str] = (),
+    ) -> None:
+        """
+        Publish pre-embedded rows (replacing rows with the same ids) and drop `delete_ids` as one
+        generation: readers see all of it or none of it.
+        """
+        if not texts and not delete_ids:
+            return
+        new_rows = [
+            {"id": doc_id, "text": text, "metadata": metadata or {}}
+            for doc_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+
+        def mutate(base: _Snapshot):
+            if new_rows and base.count and base.dim != vectors.shape[1]:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} does not match index dim {base.dim}")
+            dropped = set(ids) | set(delete_ids)
+            keep = np.arange(base.count, dtype=np.int64)
+            if base.count and dropped & base.id_to_row.keys():
+                keep = np.array(
+                    [row for doc_id, row in base.id_to_row.items() if doc_id not in dropped], dtype=np.int64
+                )
+                keep.sort()
+            return keep, new_rows, vectors if new_rows else np.zeros((0, base.dim), dtype=_DTYPE)
+
+        self._write(mutate)
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        if not texts:
+            return []
+        metadatas = metadatas or [{} for _ in texts]
+        if ids and len(ids) != len(texts):
+            raise ValueError(f"ids must be the same length as texts. Got {len(ids)} ids and {len(texts)} texts.")
+        ids_ = [i if i else str(uuid.uuid4()) for i in (ids or [None] * len(texts))]
+
+        # embed before taking the write lock, this is the slow part
+        self.commit(texts, metadatas, ids_, self.embed_texts(texts))
+        return ids_
+
+    def delete(self, ids: Optional[Sequence[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        drop = set(ids)
+
+        def mutate(base: _Snapshot):
+            keep = np.array(
+                sorted(row for doc_id, row in base.id_to_row.items() if doc_id not in drop), dtype=np.int64
+            )
+            return keep, [], np.zeros((0, base.dim), dtype=_DTYPE)
+
+        self._write(mutate)
+        return True
+
+    def get_by_ids(self, ids: Sequence[str], /) -> List[Document]:
+        snap = self.snapshot()
+        return [snap.document(snap.id_to_row[i]) for i in ids if i in snap.id_to_row]
+
+    # reads
+    def _scores(self, snap: _Snapshot, embedding: List[float]) -> np.ndarray:
+        query = _normalize(embedding)[0]
+        return np.asarray(snap.matrix @ query)
+
+    def _top_rows(
+        self,
+        snap: _Snapshot,
+        scores: np.ndarray,
+        k: int,
+        filter: Optional[Callable[[Document], bool]] = None,
+    ) -> List[int]:
+        if filter is None:
+            return [int(i) for i in top_k(scores, k)]
+        order = np.argsort(-scores)
+        rows = []
+        for i in order:
+            if filter(snap.document(int(i))):
+                rows.append(int(i))
+                if len(rows) == k:
+                    break
+        return rows
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[Callable[[Document], bool]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        snap = self.snapshot()
+        if snap.count == 0:
+            return []
+        if filter is None and snap.ann is not None:
+            rows, scores = snap.ann.search(snap.matrix, _normalize(embedding)[0], k, nprobe or self.nprobe)
+            return [(snap.document(int(i)), float(score)) for i, score in zip(rows, scores)]
+        scores = self._scores(snap, embedding)
+        return [(snap.document(i), float(scores[i])) for i in self._top_rows(snap, scores, k, filter)]
+
+    def similarity_search_by_vector(self, embedding: List[float], k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score_by_vector(embedding, k, **kwargs)]
+
+    def similarity_search_with_score(self, query: str, k: int = 4, **kwargs: Any) -> List[Tuple[Document, float]]:
+        return self.similarity_search_with_score_by_vector(self.embedding.embed_query(query), k, **kwargs)
+
+    def similarity_search(self, query: str, k: int = 4, **kwargs: Any) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, **kwargs)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        # scores are already cosine similarities
+        return lambda score: score
+
+    def _mmr_over(
+        self, snap: _Snapshot, candidates: np.ndarray, relevance: np.ndarray, k: int, lambda_mult: float
+    ) -> List[Document]:
+        if len(candidates) == 0:
+            return []
+        picks = mmr_select(relevance[None, :], np.asarray(snap.matrix[candidates])[None], k, lambda_mult)[0]
+        return [snap.document(int(candidates[i])) for i in picks]
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        filter: Optional[Callable[[Document], bool]] = None,
+        nprobe: Optional[int] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        snap = self.snapshot()
+        if snap.count == 0:
+            return []
+        if filter is None and snap.ann is not None:
+            #the fetch_k candidates come from the probed lists, mmr re-ranks only those
+            candidates, relevance = snap.ann.search(snap.matrix, _normalize(embedding)[0], fetch_k, nprobe or self.nprobe)
+            return self._mmr_over(snap, candidates, relevance, k, lambda_mult)
+        if filter is None:
+            rows = batch_mmr(_normalize(embedding), snap.matrix, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)[0]
+            return [snap.document(int(i)) for i in rows]
+
+        scores = self._scores(snap, embedding)
+        candidates = np.asarray(self._top_rows(snap, scores, fetch_k, filter), dtype=np.int64)
+        return self._mmr_over(snap, candidates, scores[candidates], k, lambda_mult)
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+        **kwargs: Any,
+    ) -> List[Document]:
+        return self.max_marginal_relevance_search_by_vector(
+            self.embedding.embed_query(query), k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs
+        )
+
+    def max_marginal_relevance_search_batch(
+        self,
+        queries: List[str],
+        k: int = 4,
+        fetch_k: int = 20,
+        lambda_mult: float = 0.5,
+    ) -> List[List[Document]]:
+        """
+        MMR for many queries in one pass over the matrix (batch assessment / evaluation).
+        """
+        snap = self.snapshot()
+        if snap.count == 0 or not queries:
+            return [[] for _ in queries]
+        vectors = _normalize([self.embedding.embed_query(q) for q in queries])
+        if snap.ann is not None:
+            return [
+                self._mmr_over(snap, candidates, relevance, k, lambda_mult)
+                for candidates, relevance in snap.ann.search_batch(snap.matrix, vectors, fetch_k, self.nprobe)
+            ]
+        rows = batch_mmr(vectors, snap.matrix, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult)
+        return [[snap.document(int(i)) for i in r] for r in rows]
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        *,
+        ids: Optional[List[str]] = None,
+        index_dir: str = "scripts_VS/vector_index",
+        **kwargs: Any,
+    ) -> "MmapVectorStore":
+        store = cls(embedding=embedding, index_dir=index_dir)
+        store.add_texts(texts, metadatas, ids=ids)
+        return store
@@ -1,65 +1,158 @@
-import os
-import sys
+import json
+import uuid
 import requests
 import streamlit as st
-from langchain_core.messages import HumanMessage
-
-sys.path.append(os.path.dirname(os.path.abspath(__file__)))
-
-
-from ragPipeline.rag import retriever, graph, config
-from scripts.document_loader import DocumentLoader
-
-GOOGLE_API_KEY = st.secrets["GOOGLE_API_KEY"]
-GOOGLE_APPLICATION_CREDENTIALS = st.secrets["GOOGLE_APPLICATION_CREDENTIALS"]
-GOOGLE_CLOUD_PROJECT = st.secrets["GOOGLE_CLOUD_PROJECT"]
-GCLOUD_PROJECT = st.secrets["GCLOUD_PROJECT"]
-GOOGLE_CLOUD_LOCATION = st.secrets["GOOGLE_CLOUD_LOCATION"]
-CHROMA_API_KEY = st.secrets["CHROMA_API_KEY"]
-CHROMA_TENANT = st.secrets["CHROMA_TENANT"]
-CHROMA_DATABASE = st.secrets["CHROMA_DATABASE"]
+from requests.adapters import HTTPAdapter
 
+#thin client of the FastAPI backend: no llm, embeddings or vector store in this process, a rerun
+#(every keystroke / widget change) only re-renders state already held in st.session_state
 
 if "FASTAPI_URL" in st.secrets:
     FASTAPI_URL = st.secrets["FASTAPI_URL"]
 else:
     FASTAPI_URL = "http://127.0.0.1:8002"
 
+#(connect, read) seconds; the read timeout applies between streamed chunks, not to the whole reply
+TIMEOUT = (3.05, 120)
+UPLOAD_POLL_SECONDS = 2
+#transcript messages re-sent when the backend has dropped the session (idle ttl / lru eviction)
+HISTORY_RESEND_MESSAGES = 40
+
+
+@st.cache_resource
+def http_session() -> requests.Session:
+    """
+    One keep-alive connection pool to the backend per Streamlit process, shared by every browser session and rerun.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=16)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
 
 st.set_page_config(page_title="Cancer Risk Agentic Hub", page_icon=":robot:", layout="wide")
 
 # init sesseion state for chat history
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
-if 'uploaded_files' not in st.session_state:
-    st.session_state.uploaded_files = []
+#the backend keeps the conversation, chat_history is only for display
+if "session_id" not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+#(file name, size) -> upload job from the backend, so a rerun never re-sends a file
+if "upload_jobs" not in st.session_state:
+    st.session_state.upload_jobs = {}
 
 # when reruns occur, you can still keep the same chat history
 for message in st.session_state.chat_history:
-    print(f"message: {message}")
     with st.chat_message(message["role"]):
         st.markdown(message["content"])
 
-# set docs for retriever to process when user uploads files
-docs = retriever.add_uploaded_docs(st.session_state.uploaded_files)
+def session_expired(session_id):
+    """
+    True when the backend no longer has a session this page still shows a transcript for.
+    """
+    if not st.session_state.chat_history:
+        return False
+    try:
+        return http_session().get(f"{FASTAPI_URL}/sessions/{session_id}", timeout=TIMEOUT).status_code == 404
+    except requests.RequestException:
+        return False
 
 #how retriever process human message
-def process_message(message, history):
+def process_message(message, session_id):
     """
-    Takes user message + hisotry, sends it to FastAPI and returns the reply.
+    Takes user message + session id, sends it to FastAPI and yields (event, data) as the reply streams in.
     """
     payload = {
         "message": message,
-        "history": history
+        "session_id": session_id
     }
+    #the server rebuilds an expired session from the transcript, otherwise the model would lose it silently
+    if session_expired(session_id):
+        payload["history"] = st.session_state.chat_history[-HISTORY_RESEND_MESSAGES:]
     try:
-        response = requests.post(f"{FASTAPI_URL}/chat", json=payload)
-        response.raise_for_status()
-        return response.json()["reply"]
+        with http_session().post(f"{FASTAPI_URL}/chat/stream", json=payload, stream=True, timeout=TIMEOUT) as response:
+            response.raise_for_status()
+            event = "message"
+            for line in response.iter_lines(decode_unicode=True):
+                if line.startswith("event: "):
+                    event = line[len("event: "):]
+                elif line.startswith("data: "):
+                    yield event, json.loads(line[len("data: "):])
     except Exception as e:
-        return f"Error connecting to backend: {e}"
+        yield "error", {"detail": f"Error connecting to backend: {e}"}
+
+def render_reply(message, session_id):
+    """
+    Render the reply token by token, swap in the revised text if the compliance check corrected it.
+    """
+    placeholder = st.empty()
+    reply = ""
+    for event, data in process_message(message, session_id):
+        if event == "token":
+            reply += data["text"]
+            placeholder.markdown(reply + "▌")
+        elif event == "correction":
+            reply = data["text"]
+            placeholder.markdown(reply)
+            st.caption("Revised after compliance review.")
+        elif event == "done":
+            reply = data["reply"] or reply
+            if data.get("session") == "restored":
+                st.caption("Session expired on the server, restored from this conversation.")
+            elif data.get("session") == "new" and st.session_state.chat_history:
+                st.caption("Session expired on the server, earlier messages are no longer taken into account.")
+        elif event == "error":
+            reply = data["detail"]
+    placeholder.markdown(reply)
+    return reply
+
+def upload_file(file):
+    """
+    Send one file to POST /upload; returns the backend's job (indexing runs there in the background).
+    """
+    files = {"file": (file.name, file.getvalue(), file.type)}
+    try:
+        response = http_session().post(f"{FASTAPI_URL}/upload", files=files, timeout=TIMEOUT)
+    except requests.RequestException as e:
+        return {"file": file.name, "status": "failed", "error": f"Error connecting to backend: {e}"}
+    if response.status_code == 503:
+        #queue full: not recorded as uploaded, the next rerun sends it again
+        st.warning(f"{file.name}: {response.json()['detail']}")
+        return None
+    if not response.ok:
+        return {"file": file.name, "status": "failed", "error": response.text}
+    return response.json()
+
+def refresh_job(job):
+    if job["status"] in ("done", "failed"):
+        return job
+    try:
+        response = http_session().get(f"{FASTAPI_URL}/upload/{job['job_id']}", timeout=TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except requests.RequestException:
+        #backend restarted or briefly unreachable, keep the last known status
+        return job
+
+@st.fragment(run_every=UPLOAD_POLL_SECONDS)
+def upload_status():
+    """
+    Indexing progress of this session's uploads; polls on its own timer without rerunning the page.
+    """
+    jobs = st.session_state.upload_jobs
+    for key, job in jobs.items():
+        jobs[key] = job = refresh_job(job)
+        if job["status"] == "done":
+            st.caption(f"✅ {job['file']}: {job['chunks']} new chunks searchable")
+        elif job["status"] == "failed":
+            st.caption(f"❌ {job['file']}: {job['error']}")
+        else:
+            total = job.get("pages_total") or 0
+            progress = job.get("pages_done", 0) / total if total else 0.0
+            st.progress(progress, text=f"{job['file']}: {job['status']}, page {job.get('pages_done', 0)} of {total or '?'}")
 
-# this ignores the previous messages--TODO: change the prompt to provide access to previous messsages
 st.markdown("""
 # Cancer Risk Agentic Hub: Clinicial Decision Support
 ### *Your Personal AI Assistant for Cancer Risk Assessment*
@@ -67,19 +160,17 @@ st.markdown("""
 
 col1, col2 = st.columns([2, 1])
 
-#column 1 
+#column 1
 with col1:
     st.subheader("Chat Interface")
-    #react to user input 
+    #react to user input
     if user_message:= st.chat_input("Enter your message:"):
         #display user message in chat container
         with st.chat_message("User"):
             st.markdown(user_message)
         #add user message
-        response = process_message(user_message, st.session_state.chat_history)
-
         with st.chat_message("Clinical AI assistant"):
-            st.markdown(response)
+            response = render_reply(user_message, st.session_state.session_id)
 
         #store both messages
         st.session_state.chat_history.append({"role": "user", "content": user_message})
@@ -94,10 +185,12 @@ with col2:
         type=["pdf", "json"],
         accept_multiple_files=True
     )
-    if uploaded_files_uploader:
-        for file in uploaded_files_uploader:
-            if file.name not in [f.name for f in st.session_state.uploaded_files]:
-                # send to fastapi
-                files = {"file": (file.name, file.getvalue(), file.type)}
-                requests.post(f"{FASTAPI_URL}/upload", files=files)
-                st.session_state.uploaded_files.append(file)
\ No newline at end of file
+    #only files this session hasn't sent yet go to the backend
+    for file in uploaded_files_uploader or []:
+        key = (file.name, file.size)
+        if key not in st.session_state.upload_jobs:
+            job = upload_file(file)
+            if job is not None:
+                st.session_state.upload_jobs[key] = job
+    if st.session_state.upload_jobs:
+        upload_status()
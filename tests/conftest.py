@@ -0,0 +1,87 @@
+"""
+Shared fixtures: the chat graph wired to offline fakes (no Gemini, no vector store on disk).
+"""
+import os
+import uuid
+from pathlib import Path
+from typing import List
+
+os.environ.setdefault("GOOGLE_API_KEY", "offline-tests")
+
+import pytest
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+NG12_CHUNKS = [
+    Document(id="ng12-p3-0", page_content="Refer people using a suspected cancer pathway referral for lung cancer if they are aged 40 and over with unexplained haemoptysis."),
+    Document(id="ng12-p3-1", page_content="Offer an urgent chest X-ray to people aged 40 and over with persistent cough, fatigue or shortness of breath who have ever smoked."),
+]
+
+
+class StaticRetriever(BaseRetriever):
+    """
+    Returns the same guideline chunks for every question and records the queries it was asked.
+    """
+
+    queries: List[str] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self.queries.append(query)
+        return list(NG12_CHUNKS)
+
+
+PATIENTS = Path(__file__).resolve().parents[1] / "data" / "patients.json"
+
+
+@pytest.fixture(scope="session")
+def patient_store(tmp_path_factory):
+    """
+    data/patients.json built into a temporary store directory, not scripts_VS/.
+    """
+    from scripts.patient_store import PatientStore
+
+    return PatientStore.open_or_build(str(PATIENTS), str(tmp_path_factory.mktemp("patient_store")))
+
+
+@pytest.fixture
+def offline_rag(monkeypatch, patient_store):
+    """
+    ragPipeline.rag with a zero-latency fake llm, a static retriever, an empty answer cache and the
+    query router over the temporary patient store.
+    """
+    import ragPipeline.rag as rag
+    from ragPipeline.answer_cache import AnswerCache
+    from ragPipeline.query_router import QueryRouter
+    from scripts.fakes import SlowFakeChatModel
+
+    monkeypatch.setattr(rag, "llm", SlowFakeChatModel(latency_s=0))
+    monkeypatch.setattr(rag, "retriever", StaticRetriever(queries=[]))
+    monkeypatch.setattr(rag, "ANSWER_CACHE", AnswerCache())
+    monkeypatch.setattr(rag, "QUERY_ROUTER", QueryRouter(patient_store))
+    return rag
+
+
+@pytest.fixture
+def thread_config():
+    return {"configurable": {"thread_id": f"test-{uuid.uuid4().hex}"}}
+
+
+@pytest.fixture
+def vector_store(tmp_path, monkeypatch):
+    """
+    An empty on-disk MmapVectorStore with hashing embeddings, installed as scripts.doc_retrieval's
+    VECTOR_STORE together with a fresh lexical index and ingest manifest.
+    """
+    from scripts import doc_retrieval
+    from scripts.fakes import HashingEmbeddings
+    from scripts.ingest_manifest import IngestManifest
+    from scripts.lexical_index import InvertedIndex
+    from scripts.vector_index import MmapVectorStore
+
+    store = MmapVectorStore(embedding=HashingEmbeddings(), index_dir=str(tmp_path / "vector_index"))
+    monkeypatch.setattr(doc_retrieval, "VECTOR_STORE", store)
+    monkeypatch.setattr(doc_retrieval, "LEXICAL_INDEX", InvertedIndex())
+    monkeypatch.setattr(doc_retrieval, "MANIFEST", IngestManifest(str(tmp_path / "ingest_manifest.json")))
+    monkeypatch.setattr(doc_retrieval, "UPLOAD_CACHE_DIR", tmp_path / "uploads")
+    return store
@@ -0,0 +1,140 @@
+"""
+IVF index: recall@k against an exact scan at a fixed seed, incremental `updated` generations, the
+saved index round trip, and the MmapVectorStore ANN path.
+"""
+import numpy as np
+import pytest
+
+from benchmarks.bench_ann import clustered
+from scripts.ann_index import IVFIndex, default_nlist, nearest_centroids, spherical_kmeans
+from scripts.mmr import top_k
+from scripts.fakes import HashingEmbeddings
+from scripts.vector_index import MmapVectorStore
+
+K = 10
+
+
+@pytest.fixture(scope="module")
+def corpus():
+    rng = np.random.default_rng(0)
+    matrix = clustered(5000, 32, clusters=40, rng=rng)
+    picks = rng.integers(0, len(matrix), 50)
+    queries = matrix[picks] + 0.3 * rng.standard_normal((50, 32), dtype=np.float32) / np.sqrt(32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return matrix, queries
+
+
+@pytest.fixture(scope="module")
+def index(corpus):
+    return IVFIndex.train(corpus[0], nlist=64)
+
+
+def _recall(index, matrix, queries, nprobe):
+    hits = 0
+    for query in queries:
+        rows, _ = index.search(matrix, query, K, nprobe)
+        hits += len(set(rows.tolist()) & set(top_k(matrix @ query, K).tolist()))
+    return hits / (K * len(queries))
+
+
+def test_recall_at_k_against_exact(index, corpus):
+    matrix, queries = corpus
+    recalls = [_recall(index, matrix, queries, nprobe) for nprobe in (1, 4, 8)]
+    assert recalls == sorted(recalls)
+    assert recalls[-1] >= 0.95
+
+
+def test_probing_every_list_is_exact(index, corpus):
+    matrix, queries = corpus
+    for query in queries[:10]:
+        rows, scores = index.search(matrix, query, K, nprobe=index.nlist)
+        exact = top_k(matrix @ query, K)
+        assert rows.tolist() == exact.tolist()
+        assert np.allclose(scores, (matrix @ query)[exact])
+
+
+def test_training_assigns_rows_to_nearest_centroid(index, corpus):
+    matrix, _ = corpus
+    assert index.nlist == 64 and len(index) == len(matrix) and index.trained_count == len(matrix)
+    assert np.array_equal(index.assign, np.argmax(matrix @ index.centroids.T, axis=1))
+    assert np.allclose(np.linalg.norm(index.centroids, axis=1), 1.0, atol=1e-5)
+    #empty lists are re-seeded, every centroid owns rows
+    assert np.bincount(index.assign, minlength=index.nlist).min() > 0
+
+
+def test_training_is_deterministic(corpus):
+    sample = corpus[0][:1000]
+    assert np.array_equal(spherical_kmeans(sample, 16, seed=3), spherical_kmeans(sample, 16, seed=3))
+    assert default_nlist(1) == 1 and default_nlist(10_000) == 400
+
+
+def test_updated_keeps_assignment_and_assigns_new_rows(index, corpus):
+    matrix, _ = corpus
+    rng = np.random.default_rng(1)
+    keep = np.sort(rng.choice(len(matrix), 4000, replace=False))
+    new = clustered(200, 32, clusters=5, rng=rng)
+    updated = index.updated(keep, new)
+
+    assert len(updated) == 4200 and updated.trained_count == index.trained_count
+    assert np.array_equal(updated.assign[:4000], index.assign[keep])
+    assert np.array_equal(updated.assign[4000:], nearest_centroids(new, index.centroids))
+    assert updated.centroids is index.centroids
+
+    next_matrix = np.vstack([matrix[keep], new])
+    query = new[7]
+    rows, _ = updated.search(next_matrix, query, K, nprobe=updated.nlist)
+    assert rows.tolist() == top_k(next_matrix @ query, K).tolist()
+    assert rows[0] == 4007
+
+
+def test_updated_to_empty(index):
+    assert len(index.updated(np.zeros(0, dtype=np.int64), np.zeros((0, 32), dtype=np.float32))) == 0
+
+
+def test_save_and_load_round_trip(index, corpus, tmp_path):
+    path = tmp_path / "ivf.npz"
+    path.write_bytes(index.to_bytes())
+    loaded = IVFIndex.load(path)
+    assert np.array_equal(loaded.centroids, index.centroids)
+    assert np.array_equal(loaded.assign, index.assign)
+    assert loaded.trained_count == index.trained_count
+
+    matrix, queries = corpus
+    for query in queries[:5]:
+        assert loaded.search(matrix, query, K, 4)[0].tolist() == index.search(matrix, query, K, 4)[0].tolist()
+
+
+def _texts(count, offset=0):
+    words = ["cough", "haemoptysis", "dysphagia", "lump", "fatigue", "weight", "bleeding", "pain"]
+    return [f"{words[i % 8]} {words[(i // 8) % 8]} {words[(i // 64) % 8]} note {i}" for i in range(offset, offset + count)]
+
+
+def _ann_store(path):
+    return MmapVectorStore(HashingEmbeddings(size=64), index_dir=str(path), ann_min_rows=100, nprobe=4, ann_nlist=8)
+
+
+def test_vector_store_builds_ann_past_min_rows(tmp_path):
+    store = _ann_store(tmp_path / "index")
+    store.add_texts(_texts(50), ids=[f"a{i}" for i in range(50)])
+    assert store.snapshot().ann is None
+    assert not list((tmp_path / "index").glob("ivf-*.npz"))
+
+    store.add_texts(_texts(150, 50), ids=[f"a{i}" for i in range(50, 200)])
+    snap = store.snapshot()
+    assert snap.ann is not None and snap.ann.nlist == 8 and len(snap.ann) == 200
+
+    #inserts below the retrain factor extend the old lists, deletes drop their rows
+    store.delete([f"a{i}" for i in range(20)])
+    store.add_texts(_texts(30, 200), ids=[f"a{i}" for i in range(200, 230)])
+    after = store.snapshot().ann
+    assert len(after) == 210 and after.trained_count == 200
+    assert np.array_equal(after.centroids, snap.ann.centroids)
+
+    reopened = _ann_store(tmp_path / "index")
+    assert np.array_equal(reopened.snapshot().ann.assign, after.assign)
+
+    query = store.embeddings.embed_query("haemoptysis cough note")
+    approx = [score for _, score in store.similarity_search_with_score_by_vector(query, k=5, nprobe=8)]
+    exact = [score for _, score in store.similarity_search_with_score_by_vector(query, k=5, filter=lambda doc: True)]
+    #hashed texts tie on score, compare the scores rather than which tied row won
+    assert np.allclose(approx, exact)
@@ -0,0 +1,102 @@
+"""
+AnswerCache: exact and near-duplicate hits only over the same evidence, TTL/LRU eviction, and (in
+the graph) no reuse of an answer across different session histories.
+"""
+import time
+import uuid
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from ragPipeline.answer_cache import AnswerCache, normalize_question
+from scripts.fakes import HashingEmbeddings
+
+ANSWER = {"answer": "Refer urgently (NG12 1.1.1).", "issues_report": "", "issues_detected": False, "final": "Refer urgently (NG12 1.1.1)."}
+EVIDENCE = ["ng12-p3-0", "ng12-p3-1"]
+
+
+def test_hit_on_same_question_and_evidence():
+    cache = AnswerCache()
+    cache.put("When should haemoptysis be referred?", EVIDENCE, ANSWER)
+    assert cache.get("when should  HEMOPTYSIS be referred", list(reversed(EVIDENCE))) == ANSWER
+    assert cache.stats()["hits"] == 1
+
+
+def test_returned_answers_are_copies():
+    cache = AnswerCache()
+    cache.put("q", EVIDENCE, ANSWER)
+    cache.get("q", EVIDENCE)["final"] = "changed"
+    assert cache.get("q", EVIDENCE) == ANSWER
+
+
+def test_normalize_question_folds_case_punctuation_and_spelling():
+    assert normalize_question("Haemoptysis?") == normalize_question("hemoptysis")
+
+
+@pytest.mark.parametrize("evidence", [["ng12-p3-0"], EVIDENCE + ["ng12-p4-0"], ["ng12-p3-0", "ng12-p9-9"]])
+def test_miss_when_evidence_differs(evidence):
+    cache = AnswerCache()
+    cache.put("When should haemoptysis be referred?", EVIDENCE, ANSWER)
+    assert cache.get("When should haemoptysis be referred?", evidence) is None
+    assert cache.stats()["misses"] == 1
+
+
+def test_ttl_expiry():
+    cache = AnswerCache(ttl_s=0.05)
+    cache.put("q", EVIDENCE, ANSWER)
+    time.sleep(0.1)
+    assert cache.get("q", EVIDENCE) is None
+    assert cache.stats()["expirations"] == 1
+    assert len(cache) == 0
+
+
+def test_lru_eviction_keeps_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("first", EVIDENCE, ANSWER)
+    cache.put("second", EVIDENCE, ANSWER)
+    cache.get("first", EVIDENCE)
+    cache.put("third", EVIDENCE, ANSWER)
+    assert cache.get("second", EVIDENCE) is None
+    assert cache.get("first", EVIDENCE) == cache.get("third", EVIDENCE) == ANSWER
+    assert cache.stats()["evictions"] == 1
+
+
+def test_similar_question_hits_within_the_same_evidence_only():
+    embeddings = HashingEmbeddings()
+    cache = AnswerCache(embed_query=embeddings.embed_query, similarity_threshold=0.7)
+    cache.put("when should unexplained haemoptysis in smokers be referred urgently", EVIDENCE, ANSWER)
+    similar = "when should unexplained haemoptysis in smokers be referred urgently please"
+    assert cache.get(similar, EVIDENCE) == ANSWER
+    assert cache.stats()["similar_hits"] == 1
+    assert cache.get(similar, ["ng12-p3-0"]) is None
+    assert cache.get("what is the dose of paracetamol", EVIDENCE) is None
+
+
+def test_similarity_lookup_skips_embedding_without_candidates():
+    embeddings = HashingEmbeddings()
+    cache = AnswerCache(embed_query=embeddings.embed_query, similarity_threshold=0.7)
+    assert cache.get("anything", EVIDENCE) is None
+    assert embeddings.calls == 0
+
+
+def _turn(rag, config, text):
+    return rag.graph.invoke({"messages": [HumanMessage(text)]}, config=config)
+
+
+def test_follow_up_misses_after_a_different_conversation(offline_rag):
+    first = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    second = {"configurable": {"thread_id": uuid.uuid4().hex}}
+    _turn(offline_rag, first, "assess a 55 year old with haemoptysis")
+    _turn(offline_rag, second, "assess a 30 year old with dysphagia")
+    assert not _turn(offline_rag, first, "what should happen next for them?")["cache_hit"]
+    assert not _turn(offline_rag, second, "what should happen next for them?")["cache_hit"]
+
+
+def test_identical_conversations_share_answers(offline_rag):
+    answers = []
+    for _ in range(2):
+        config = {"configurable": {"thread_id": uuid.uuid4().hex}}
+        first = _turn(offline_rag, config, "assess a 55 year old with haemoptysis")
+        follow_up = _turn(offline_rag, config, "what should happen next for them?")
+        answers.append((first["cache_hit"], follow_up["cache_hit"]))
+    assert answers == [(False, False), (True, True)]
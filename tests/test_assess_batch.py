@@ -0,0 +1,108 @@
+"""
+POST /assess/batch: one guideline retrieval per symptom signature, resume cursor on every result.
+"""
+import asyncio
+import json
+from typing import List
+
+import pytest
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+
+from app.routers import assess
+from scripts.fakes import SlowFakeChatModel
+from scripts.patient_store import PatientStore
+
+DECISION = json.dumps({"decision": "urgent_referral", "rationale": "Meets NG12 1.1.1.", "citations": []})
+SIGNATURES = [["fatigue"], ["Dysphagia"], ["persistent cough", "fatigue"], ["fatigue", "persistent cough"]]
+
+
+class CountingRetriever(BaseRetriever):
+    latency_s: float = 0.01
+    queries: List[str] = []
+
+    def _get_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        raise AssertionError("the batch path retrieves asynchronously")
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager) -> List[Document]:
+        self.queries.append(query)
+        await asyncio.sleep(self.latency_s)
+        return [Document(id="ng12-p3-0", page_content="Refer people aged 40 and over with unexplained haemoptysis.")]
+
+
+@pytest.fixture
+def batch_rag(offline_rag, tmp_path, monkeypatch):
+    source = tmp_path / "patients.jsonl"
+    with open(source, "w") as fh:
+        for i in range(40):
+            fh.write(json.dumps({"patient_id": f"PT-{i}", "age": 50, "symptoms": SIGNATURES[i % 4]}) + "\n")
+    store = PatientStore(str(tmp_path / "store"))
+    store.build(str(source))
+    monkeypatch.setattr(offline_rag, "PATIENT_STORE", store)
+    monkeypatch.setattr(offline_rag, "RULE_FAST_PATH", False)
+    monkeypatch.setattr(offline_rag, "llm", SlowFakeChatModel(latency_s=0.005, reply=DECISION))
+    monkeypatch.setattr(offline_rag, "retriever", CountingRetriever(queries=[]))
+    return offline_rag
+
+
+async def _collect(request: assess.BatchAssessRequest, stop_after: int = 0) -> List[dict]:
+    events, results = [], 0
+    stream = assess.assess_batch(request, progress_every=5)
+    async for event in stream:
+        events.append(event)
+        results += event["type"] != "progress"
+        if stop_after and results >= stop_after:
+            await stream.aclose()
+            break
+    return events
+
+
+def test_one_retrieval_per_symptom_signature(batch_rag):
+    ids = [f"PT-{i}" for i in range(40)]
+    events = asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=ids, max_concurrency=8)))
+    results = [e for e in events if e["type"] == "result"]
+    assert sorted(e["index"] for e in results) == list(range(40))
+    assert all(e["decision"]["decision"] == "urgent_referral" and e["decision"]["decided_by"] == "llm" for e in results)
+    #symptom order and case don't make a new signature: three distinct retrievals for 40 patients
+    assert sorted(batch_rag.retriever.queries) == sorted({
+        assess.guideline_query(assess.symptom_signature({"symptoms": s})) for s in SIGNATURES})
+    assert len(batch_rag.retriever.queries) == 3
+    assert batch_rag.llm.calls == 40
+    progress = [e for e in events if e["type"] == "progress"]
+    assert progress[-1] == {"type": "progress", "done": 40, "total": 40, "cursor": 40, "retrievals": 3, "rule_decisions": 0}
+
+
+def test_unknown_patient_is_an_error_event(batch_rag):
+    events = asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=["PT-1", "PT-missing"])))
+    errors = [e for e in events if e["type"] == "error"]
+    assert [(e["index"], e["detail"]) for e in errors] == [(1, "unknown patient_id")]
+    assert events[-1]["cursor"] == 2
+
+
+def test_every_result_carries_a_cursor_below_all_unfinished(batch_rag):
+    ids = [f"PT-{i}" for i in range(40)]
+    finished = set()
+    for event in asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=ids, max_concurrency=8))):
+        if event["type"] == "progress":
+            continue
+        finished.add(event["index"])
+        assert set(range(event["cursor"])) <= finished
+        assert event["cursor"] not in finished
+
+
+def test_resume_from_last_cursor_covers_everyone_once(batch_rag):
+    ids = [f"PT-{i}" for i in range(40)]
+    #cut off after 10 results, before the first progress event at this size would be of any use
+    first = asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=ids, max_concurrency=1), stop_after=10))
+    cursor = first[-1]["cursor"]
+    assert cursor == 10
+    rest = asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=ids, max_concurrency=4, cursor=cursor)))
+    seen_first = {e["index"] for e in first if e["type"] == "result"}
+    seen_rest = {e["index"] for e in rest if e["type"] == "result"}
+    assert seen_first | seen_rest == set(range(40))
+    assert not seen_first & seen_rest
+
+
+def test_cursor_past_the_end(batch_rag):
+    events = asyncio.run(_collect(assess.BatchAssessRequest(patient_ids=["PT-1"], cursor=5)))
+    assert events == [{"type": "progress", "done": 1, "total": 1, "cursor": 1, "retrievals": 0, "rule_decisions": 0}]
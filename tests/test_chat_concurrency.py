@@ -0,0 +1,66 @@
+"""
+Load test for the async /chat route: concurrent requests run through the graph with a slow fake
+llm must overlap their llm waits instead of queueing behind one another.
+"""
+import asyncio
+import time
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+from scripts.fakes import SlowFakeChatModel
+
+LATENCY_S = 0.2
+CONCURRENCY = 8
+
+
+class TrackingChatModel(SlowFakeChatModel):
+    """
+    SlowFakeChatModel that records how many calls were waiting at the same time.
+    """
+
+    in_flight: int = 0
+    peak: int = 0
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            return await super()._agenerate(messages, stop, run_manager, **kwargs)
+        finally:
+            self.in_flight -= 1
+
+
+async def _post_concurrently(app: FastAPI, count: int) -> float:
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        async def one(i: int):
+            #unique questions, the answer cache must not short-circuit the graph
+            response = await client.post("/chat", json={"message": f"referral for haemoptysis {i} {uuid.uuid4().hex}"})
+            response.raise_for_status()
+            return response.json()
+
+        start = time.perf_counter()
+        replies = await asyncio.gather(*(one(i) for i in range(count)))
+        elapsed = time.perf_counter() - start
+    assert all(reply["reply"] for reply in replies)
+    return elapsed
+
+
+def test_concurrent_chats_overlap(offline_rag, monkeypatch):
+    from app.routers import chat
+
+    model = TrackingChatModel(latency_s=LATENCY_S)
+    monkeypatch.setattr(offline_rag, "llm", model)
+    app = FastAPI()
+    app.include_router(chat.router)
+
+    elapsed = asyncio.run(_post_concurrently(app, CONCURRENCY))
+
+    calls_per_chat = model.calls / CONCURRENCY
+    assert calls_per_chat >= 1
+    #one after another would take CONCURRENCY * calls_per_chat * LATENCY_S
+    assert elapsed < CONCURRENCY * calls_per_chat * LATENCY_S / 3
+    assert model.peak == CONCURRENCY
+    assert model.in_flight == 0
@@ -0,0 +1,197 @@
+"""
+BoundedMemorySaver and SQLiteCheckpointSaver driven through a small message graph: eviction,
+per-thread pruning, the message cap, and the SQLite flush / trim / sweep / reopen cycle.
+"""
+import time
+from typing import Annotated
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.graph import START, END, StateGraph
+from langgraph.graph.message import add_messages
+from typing_extensions import TypedDict
+
+from ragPipeline.checkpointer import BoundedMemorySaver, SQLiteCheckpointSaver, cap_messages, session_config
+
+
+class State(TypedDict):
+    messages: Annotated[list, add_messages]
+
+
+def echo(state: State):
+    return {"messages": [AIMessage(f"echo: {state['messages'][-1].content}")]}
+
+
+def compiled(saver):
+    builder = StateGraph(State)
+    builder.add_node("echo", echo)
+    builder.add_edge(START, "echo")
+    builder.add_edge("echo", END)
+    return builder.compile(checkpointer=saver)
+
+
+def turn(graph, session: str, text: str) -> list:
+    return graph.invoke({"messages": [HumanMessage(text)]}, config=session_config(session))["messages"]
+
+
+def history(graph, session: str) -> list:
+    return graph.get_state(session_config(session)).values.get("messages", [])
+
+
+def test_cap_messages_keeps_newest_starting_on_a_human_message():
+    messages = [HumanMessage(f"q{i}") if i % 2 == 0 else AIMessage(f"a{i}") for i in range(10)]
+    checkpoint = {"id": "1", "channel_values": {"messages": messages, "summary": "s"}}
+    capped = cap_messages(checkpoint, 5)
+    assert [m.content for m in capped["channel_values"]["messages"]] == ["q6", "a7", "q8", "a9"]
+    assert capped["channel_values"]["summary"] == "s"
+    assert checkpoint["channel_values"]["messages"] is messages
+    assert cap_messages(checkpoint, None) is checkpoint
+    assert cap_messages(checkpoint, 10) is checkpoint
+
+
+#memory backend
+def test_memory_lru_eviction():
+    saver = BoundedMemorySaver(max_threads=2)
+    graph = compiled(saver)
+    for session in ("a", "b", "c"):
+        turn(graph, session, "hello")
+    assert set(saver.storage) == {"session:b", "session:c"}
+    assert saver.stats()["evicted"]["lru"] == 1
+    assert history(graph, "a") == []
+
+
+def test_memory_lru_counts_reads_as_use():
+    saver = BoundedMemorySaver(max_threads=2)
+    graph = compiled(saver)
+    turn(graph, "a", "hello")
+    turn(graph, "b", "hello")
+    history(graph, "a")
+    turn(graph, "c", "hello")
+    assert set(saver.storage) == {"session:a", "session:c"}
+
+
+def test_memory_ttl_eviction():
+    saver = BoundedMemorySaver(ttl_s=0.05)
+    graph = compiled(saver)
+    turn(graph, "idle", "hello")
+    time.sleep(0.1)
+    saver.sweep()
+    assert "session:idle" not in saver.storage
+    assert not saver.blobs and not saver.writes
+    assert saver.stats()["evicted"]["ttl"] == 1
+
+
+def test_memory_prunes_old_checkpoints_and_their_blobs():
+    saver = BoundedMemorySaver(max_checkpoints_per_thread=2)
+    graph = compiled(saver)
+    for i in range(10):
+        turn(graph, "s", f"q{i}")
+    assert len(saver.storage["session:s"][""]) == 2
+    #only the message versions the two kept checkpoints point at are left
+    assert len([k for k in saver.blobs if k[2] == "messages"]) <= 2
+    assert saver.stats()["pruned_checkpoints"] > 0
+    assert len(history(graph, "s")) == 20
+
+
+def test_memory_caps_messages_per_thread():
+    saver = BoundedMemorySaver(max_messages_per_thread=6)
+    graph = compiled(saver)
+    for i in range(20):
+        messages = turn(graph, "long", f"q{i}")
+    assert [m.content for m in history(graph, "long")] == ["q17", "echo: q17", "q18", "echo: q18", "q19", "echo: q19"]
+    #within a run the state holds the capped history plus the current turn
+    assert len(messages) == 8
+
+
+def test_memory_delete_thread_leaves_nothing_behind():
+    saver = BoundedMemorySaver()
+    graph = compiled(saver)
+    turn(graph, "a", "hello")
+    turn(graph, "b", "hello")
+    saver.delete_thread("session:a")
+    assert set(saver.storage) == {"session:b"}
+    assert all(k[0] == "session:b" for k in saver.blobs)
+    assert all(k[0] == "session:b" for k in saver.writes)
+
+
+#sqlite backend
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / "checkpoints.sqlite")
+
+
+def _saver(path, **kwargs):
+    #no background flushes during a test: batches only go to disk on flush()
+    kwargs.setdefault("flush_interval_s", 3600)
+    kwargs.setdefault("batch_size", 10_000)
+    return SQLiteCheckpointSaver(path, **kwargs)
+
+
+def _rows(saver, table: str) -> int:
+    return saver._conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def test_sqlite_buffers_until_flush(sqlite_path):
+    saver = _saver(sqlite_path)
+    graph = compiled(saver)
+    turn(graph, "s", "hello")
+    assert _rows(saver, "checkpoints") == 0
+    assert [m.content for m in history(graph, "s")] == ["hello", "echo: hello"]
+    assert saver.flush() > 0
+    assert _rows(saver, "checkpoints") > 0
+    assert saver.stats()["buffered"] == 0
+    assert saver.flush() == 0
+    saver.close()
+
+
+def test_sqlite_trims_each_thread_to_newest_checkpoints(sqlite_path):
+    saver = _saver(sqlite_path, max_checkpoints_per_thread=2)
+    graph = compiled(saver)
+    for i in range(5):
+        turn(graph, "s", f"q{i}")
+        saver.flush()
+    assert _rows(saver, "checkpoints") == 2
+    assert len(history(graph, "s")) == 10
+    saver.close()
+
+
+def test_sqlite_caps_messages_per_thread(sqlite_path):
+    saver = _saver(sqlite_path, max_messages_per_thread=4)
+    graph = compiled(saver)
+    for i in range(10):
+        turn(graph, "s", f"q{i}")
+    assert [m.content for m in history(graph, "s")] == ["q8", "echo: q8", "q9", "echo: q9"]
+    saver.close()
+
+
+def test_sqlite_sweep_deletes_idle_threads(sqlite_path):
+    saver = _saver(sqlite_path, ttl_s=0.05)
+    graph = compiled(saver)
+    turn(graph, "idle", "hello")
+    saver.flush()
+    time.sleep(0.1)
+    turn(graph, "active", "hello")
+    saver.flush()
+    assert saver.sweep() == 1
+    assert saver.stats()["threads"] == 1
+    assert history(graph, "idle") == []
+    assert len(history(graph, "active")) == 2
+    saver.close()
+
+
+def test_sqlite_reopen_round_trip(sqlite_path):
+    saver = _saver(sqlite_path)
+    graph = compiled(saver)
+    turn(graph, "s", "first")
+    turn(graph, "s", "second")
+    #close flushes what is still buffered
+    saver.close()
+
+    reopened = _saver(sqlite_path)
+    graph = compiled(reopened)
+    assert [m.content for m in history(graph, "s")] == ["first", "echo: first", "second", "echo: second"]
+    turn(graph, "s", "third")
+    assert len(history(graph, "s")) == 6
+    reopened.delete_thread("session:s")
+    assert history(graph, "s") == []
+    reopened.close()
@@ -0,0 +1,44 @@
+"""
+clean_pdf_text must reproduce the original fixpoint-regex cleaner: the golden NG12 pages, plus
+hand-written edge cases checked against the reference kept in benchmarks.bench_clean_text.
+"""
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.bench_clean_text import reference_clean_pdf_text
+from scripts.document_loader import clean_pdf_text
+
+GOLDEN_PATH = Path(__file__).resolve().parents[1] / "data" / "golden" / "clean_pdf_text_ng12.json"
+GOLDEN = json.loads(GOLDEN_PATH.read_text(encoding="utf-8"))
+
+EDGE_CASES = [
+    "",
+    "  \x00 ",
+    "R efer people using a suspected can cer pathway re ferral",
+    "haemo- \nptysis in people aged 40 and o ver ( see 1.1.1 ) .",
+    "Offer an urgent chest X -ray to people who have ever smoked , with persistent c ough .",
+    "Consider a non -urgent direct access ultra sound scan.A ny of the following",
+    "iron -deficiency anaemia in people aged 60 and o v e r",
+    "UNEXPLAINED WEIGHTLOSS and abdominal pain",
+]
+
+
+def test_golden_corpus_covers_every_ng12_page():
+    assert [entry["page"] for entry in GOLDEN] == list(range(95))
+
+
+@pytest.mark.parametrize("entry", GOLDEN, ids=lambda entry: f"page-{entry['page']}")
+def test_golden_pages(entry):
+    assert clean_pdf_text(entry["raw"]) == entry["cleaned"]
+
+
+@pytest.mark.parametrize("raw", EDGE_CASES)
+def test_matches_reference(raw):
+    assert clean_pdf_text(raw) == reference_clean_pdf_text(raw)
+
+
+def test_whole_document_matches_reference():
+    whole = "\n".join(entry["raw"] for entry in GOLDEN[:10])
+    assert clean_pdf_text(whole) == reference_clean_pdf_text(whole)
@@ -0,0 +1,116 @@
+"""
+ContextAssembler: overlapping neighbour chunks are stitched back via start_index, MinHash
+near-duplicates are dropped, and the packed context stays within the token budget.
+"""
+import random
+
+import pytest
+from langchain_core.documents import Document
+
+from ragPipeline.context import ContextAssembler, estimate_tokens
+from scripts.document_loader import split_documents
+
+VOCAB = (
+    "refer people suspected cancer pathway lung haemoptysis dysphagia breast lump aged over unexplained "
+    "persistent cough fatigue weight loss urgent direct access endoscopy ultrasound chest consider offer "
+    "primary care blood count thrombocytosis anaemia abdominal pain rectal bleeding change bowel habit"
+).split()
+
+
+def _text(seed: int, words: int) -> str:
+    rng = random.Random(seed)
+    return " ".join(rng.choice(VOCAB) for _ in range(words)) + "."
+
+
+def _doc(text: str, source: str = "ng12.pdf", page: int = 0, **metadata) -> Document:
+    return Document(page_content=text, metadata={"source": source, "page": page, **metadata})
+
+
+@pytest.fixture
+def page():
+    return _doc(_text(0, 400), page=3)
+
+
+def test_adjacent_overlapping_chunks_are_merged(page):
+    chunks = split_documents([page])
+    assert len(chunks) > 3
+    assert all("start_index" in c.metadata for c in chunks)
+    #retrievers return neighbours out of document order
+    shuffled = chunks[:]
+    random.Random(1).shuffle(shuffled)
+
+    report = ContextAssembler(token_budget=10_000).assemble(shuffled)
+    assert report.text == page.page_content
+    assert report.merged == len(chunks) - 1
+    assert len(report.docs) == len(chunks)
+    assert report.tokens < report.raw_tokens
+
+
+def test_chunks_of_other_pages_or_without_overlap_are_not_merged(page):
+    first, second = split_documents([page])[:2]
+    other_page = Document(page_content=second.page_content, metadata={**second.metadata, "page": 4})
+    report = ContextAssembler(token_budget=10_000, dedup_threshold=1.1).assemble([first, other_page])
+    assert report.merged == 0
+    assert report.text == first.page_content + "\n\n" + second.page_content
+
+    apart = [_doc(_text(2, 60), start_index=0), _doc(_text(3, 60), start_index=1000)]
+    assert ContextAssembler(token_budget=10_000).assemble(apart).merged == 0
+
+
+def test_near_duplicates_are_dropped():
+    original = _text(4, 120)
+    words = original.split()
+    words[60] = "reupload"
+    near_copy = " ".join(words)
+    distinct = _text(5, 120)
+    assembler = ContextAssembler(token_budget=10_000)
+    assert assembler.similarity(assembler.signature(original), assembler.signature(near_copy)) >= 0.8
+    assert assembler.similarity(assembler.signature(original), assembler.signature(distinct)) < 0.8
+
+    docs = [
+        _doc(near_copy, source="copy.pdf", relevance_score=0.4),
+        _doc(original, relevance_score=0.9),
+        _doc(distinct, source="other.pdf", relevance_score=0.5),
+    ]
+    report = assembler.assemble(docs)
+    assert report.deduplicated == 1
+    #the more relevant copy survives, passages are ordered by relevance
+    assert report.text == original + "\n\n" + distinct
+    assert [d.metadata["source"] for d in report.docs] == ["ng12.pdf", "other.pdf"]
+
+
+def test_packed_context_stays_within_budget():
+    docs = [_doc(_text(10 + i, 80), source=f"s{i}.pdf", relevance_score=1.0 - i / 20) for i in range(12)]
+    assembler = ContextAssembler(token_budget=300)
+    report = assembler.assemble(docs)
+    assert report.tokens <= 300
+    assert report.over_budget > 0
+    assert len(report.docs) + report.over_budget == 12
+    #greedy by relevance: packed in score order, a passage is only skipped when it no longer fits
+    packed = [int(d.metadata["source"][1:-4]) for d in report.docs]
+    assert packed[0] == 0 and packed == sorted(packed)
+    used = 0
+    for i in range(packed[-1]):
+        tokens = estimate_tokens(docs[i].page_content)
+        if i in packed:
+            used += tokens
+        else:
+            assert used + tokens > 300
+
+    stats = assembler.stats()
+    assert stats["calls"] == 1 and stats["context_tokens"] == report.tokens
+    assert stats["saved_tokens"] == report.raw_tokens - report.tokens
+
+
+def test_single_passage_over_budget_keeps_its_head():
+    text = _text(20, 400)
+    report = ContextAssembler(token_budget=50).assemble([_doc(text)])
+    assert report.tokens <= 50
+    assert text.startswith(report.text)
+    assert estimate_tokens(report.text) == report.tokens
+
+
+def test_rank_order_without_scores():
+    docs = [_doc(_text(30 + i, 40), source=f"s{i}.pdf") for i in range(3)]
+    report = ContextAssembler(token_budget=10_000).assemble(docs)
+    assert report.text == "\n\n".join(d.page_content for d in docs)
@@ -0,0 +1,68 @@
+"""
+ConversationWindow: the prompt history keeps the newest `window` turns, and once `compact_every`
+messages pile up past it the graph folds them into the summary and removes them with RemoveMessage.
+"""
+from langchain_core.messages import AIMessage, HumanMessage, RemoveMessage, SystemMessage
+
+from ragPipeline.conversation import ConversationWindow
+
+
+def _turns(count):
+    messages = []
+    for i in range(count):
+        messages += [HumanMessage(f"question {i}", id=f"h{i}"), AIMessage(f"answer {i}", id=f"a{i}")]
+    return messages
+
+
+def test_history_keeps_the_window_before_the_current_question():
+    window = ConversationWindow(window=4)
+    messages = _turns(5) + [HumanMessage("current", id="now")]
+    history = window.history(messages)
+    assert [m.id for m in history] == ["h3", "a3", "h4", "a4"]
+    assert window.history([HumanMessage("first")]) == []
+
+
+def test_history_leads_with_the_summary():
+    history = ConversationWindow(window=2).history(_turns(3) + [HumanMessage("now")], "patient has haemoptysis")
+    assert isinstance(history[0], SystemMessage)
+    assert "patient has haemoptysis" in history[0].content
+    assert [m.id for m in history[1:]] == ["h2", "a2"]
+
+
+def test_overflow_waits_for_compact_every():
+    window = ConversationWindow(window=4, compact_every=4)
+    assert window.overflow(_turns(4)) == []
+    messages = _turns(4) + [HumanMessage("now", id="now")]
+    assert [m.id for m in window.overflow(messages)] == ["h0", "a0", "h1", "a1", "h2"]
+
+
+def test_compacted_removes_dropped_and_bounds_the_summary():
+    window = ConversationWindow(window=2, compact_every=2, summary_max_tokens=10)
+    dropped = _turns(2)
+    update = window.compacted("  " + "x" * 100 + "  ", dropped)
+    assert update["summary"] == "x" * 40
+    assert all(isinstance(m, RemoveMessage) for m in update["messages"])
+    assert [m.id for m in update["messages"]] == ["h0", "a0", "h1", "a1"]
+    assert window.stats() == {"window": 2, "compactions": 1, "summarized_messages": 4}
+    assert "question 0" in window.summary_prompt("", dropped)[0]["content"]
+
+
+def test_graph_compacts_the_thread(offline_rag, monkeypatch, thread_config):
+    window = ConversationWindow(window=2, compact_every=2)
+    monkeypatch.setattr(offline_rag, "CONVERSATION", window)
+    seen = set()
+    for i in range(6):
+        result = offline_rag.graph.invoke({"messages": [HumanMessage(f"referral criteria question {i}")]}, config=thread_config)
+        messages = result["messages"]
+        seen.update(m.id for m in messages)
+        #window + compact_every before compaction, plus the answer of this turn
+        assert len(messages) <= window.window + window.compact_every + 1
+
+    state = offline_rag.graph.get_state(thread_config).values
+    assert state["summary"] == offline_rag.llm.reply
+    assert window.stats()["compactions"] >= 2
+    #the newest turns stay verbatim, the oldest ones only live on in the summary
+    assert state["messages"][-1].type == "ai"
+    assert state["messages"][-2].content == "referral criteria question 5"
+    assert "referral criteria question 0" not in [m.content for m in state["messages"]]
+    assert len(seen) > len(state["messages"])
@@ -0,0 +1,123 @@
+"""
+EmbeddingScheduler: concurrent callers share batches, duplicates are embedded once, the in-flight
+limit holds and a model failure reaches every waiting caller.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from scripts.embedding_scheduler import EmbeddingScheduler
+from scripts.fakes import HashingEmbeddings
+
+
+class RecordingEmbeddings(HashingEmbeddings):
+    """
+    HashingEmbeddings that keeps every batch it was sent and the peak number of concurrent calls.
+    """
+
+    def __init__(self, latency_s: float = 0.0, fail: bool = False):
+        super().__init__(size=32, latency_s=latency_s)
+        self.fail = fail
+        self.batches = []
+        self.in_flight = 0
+        self.peak = 0
+        self._track = threading.Lock()
+
+    def _call(self, texts):
+        with self._track:
+            self.batches.append(list(texts))
+            self.in_flight += 1
+            self.peak = max(self.peak, self.in_flight)
+        try:
+            if self.fail:
+                time.sleep(self.latency_s)
+                raise RuntimeError("quota exceeded")
+            return super()._call(texts)
+        finally:
+            with self._track:
+                self.in_flight -= 1
+
+
+@pytest.fixture
+def make_scheduler():
+    schedulers = []
+
+    def make(model, **kwargs):
+        scheduler = EmbeddingScheduler(model, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield make
+    for scheduler in schedulers:
+        scheduler.close()
+
+
+def test_concurrent_queries_share_one_batch(make_scheduler):
+    model = RecordingEmbeddings()
+    scheduler = make_scheduler(model, max_batch_size=64, max_wait_ms=200)
+    texts = [f"question {i}" for i in range(16)]
+    with ThreadPoolExecutor(len(texts)) as pool:
+        vectors = list(pool.map(scheduler.embed_query, texts))
+    assert model.batches and sorted(model.batches[0]) == sorted(texts)
+    assert len(model.batches) == 1
+    assert vectors == [model._embed(t) for t in texts]
+    assert scheduler.stats()["batches"] == 1
+
+
+def test_full_batch_flushes_before_the_deadline(make_scheduler):
+    model = RecordingEmbeddings()
+    scheduler = make_scheduler(model, max_batch_size=4, max_wait_ms=10_000)
+    start = time.perf_counter()
+    scheduler.embed_documents([f"chunk {i}" for i in range(8)])
+    assert time.perf_counter() - start < 5
+    assert [len(b) for b in model.batches] == [4, 4]
+
+
+def test_identical_texts_in_one_window_are_embedded_once(make_scheduler):
+    model = RecordingEmbeddings()
+    scheduler = make_scheduler(model, max_wait_ms=100)
+    futures = scheduler.submit(["same", "other", "same"]) + scheduler.submit(["same"])
+    vectors = [f.result(timeout=5) for f in futures]
+    assert model.texts == 2
+    assert vectors[0] == vectors[2] == vectors[3] != vectors[1]
+    assert scheduler.stats()["dedupe_ratio"] == pytest.approx(0.5)
+
+
+def test_queries_and_documents_are_batched_separately(make_scheduler):
+    model = RecordingEmbeddings()
+    scheduler = make_scheduler(model, max_wait_ms=50)
+    futures = scheduler.submit(["text"], "query") + scheduler.submit(["text"], "document")
+    for f in futures:
+        f.result(timeout=5)
+    assert model.batches == [["text"], ["text"]]
+
+
+def test_max_in_flight_is_enforced(make_scheduler):
+    model = RecordingEmbeddings(latency_s=0.1)
+    scheduler = make_scheduler(model, max_batch_size=1, max_wait_ms=1, max_in_flight=2)
+    futures = scheduler.submit([f"chunk {i}" for i in range(8)])
+    for f in futures:
+        f.result(timeout=10)
+    assert len(model.batches) == 8
+    assert model.peak == 2
+
+
+def test_model_error_reaches_every_waiting_future(make_scheduler):
+    model = RecordingEmbeddings(latency_s=0.05, fail=True)
+    scheduler = make_scheduler(model, max_wait_ms=50)
+    futures = scheduler.submit(["a", "b", "a"]) + scheduler.submit(["b"], "document")
+    for f in futures:
+        with pytest.raises(RuntimeError, match="quota exceeded"):
+            f.result(timeout=5)
+    with pytest.raises(RuntimeError, match="quota exceeded"):
+        scheduler.embed_query("c")
+
+
+def test_close_drains_pending_texts():
+    model = RecordingEmbeddings()
+    scheduler = EmbeddingScheduler(model, max_wait_ms=10_000)
+    futures = scheduler.submit(["late"])
+    scheduler.close()
+    assert futures[0].result(timeout=1) == model._embed("late")
@@ -0,0 +1,85 @@
+"""
+Content-hash incremental indexing through scripts.doc_retrieval.index_file: unchanged files are
+skipped, a changed pdf page replaces only its own chunks.
+"""
+import json
+from pathlib import Path
+
+import pytest
+from pypdf import PdfReader, PdfWriter
+
+from scripts import doc_retrieval
+
+NG12_PDF = Path(__file__).resolve().parents[1] / "data" / "NG12_pdf.pdf"
+
+
+def _write_pdf(path: Path, ng12_pages) -> str:
+    reader, writer = PdfReader(str(NG12_PDF)), PdfWriter()
+    for page in ng12_pages:
+        writer.add_page(reader.pages[page])
+    with open(path, "wb") as fh:
+        writer.write(fh)
+    return str(path)
+
+
+def _ids_by_page(store, source: str) -> dict:
+    pages = {}
+    for row in store.snapshot().rows():
+        if row["metadata"]["source"] == source:
+            pages.setdefault(row["metadata"]["page"], set()).add(row["id"])
+    return pages
+
+
+def test_unchanged_json_is_skipped(vector_store, tmp_path):
+    path = tmp_path / "patients.json"
+    path.write_text(json.dumps([{"patient_id": "PT-1", "symptoms": ["fatigue"]}]))
+    first = doc_retrieval.index_file(str(path))
+    assert first and len(vector_store) == len(first)
+    generation = vector_store.snapshot().generation
+    assert doc_retrieval.index_file(str(path)) == []
+    #a byte-identical copy under another name is not indexed twice either
+    copy = tmp_path / "copy.json"
+    copy.write_bytes(path.read_bytes())
+    assert doc_retrieval.index_file(str(copy)) == []
+    assert vector_store.snapshot().generation == generation
+
+
+@pytest.mark.skipif(not NG12_PDF.exists(), reason="NG12 guideline pdf not available")
+def test_changed_page_replaces_only_its_chunks(vector_store, tmp_path):
+    path = tmp_path / "guideline.pdf"
+    source = _write_pdf(path, [3, 4, 5])
+    progress = []
+    first = doc_retrieval.index_file(source, progress=progress.append)
+    before = _ids_by_page(vector_store, source)
+    assert sorted(before) == [0, 1, 2]
+    assert progress[-1]["pages_done"] == progress[-1]["pages_total"] == 3
+    assert {c.id for c in first} == set().union(*before.values())
+
+    assert doc_retrieval.index_file(source) == []
+
+    #same first and last page, a different middle page
+    _write_pdf(path, [3, 8, 5])
+    progress.clear()
+    second = doc_retrieval.index_file(source, progress=progress.append)
+    after = _ids_by_page(vector_store, source)
+    assert progress[-1]["pages_total"] == 1
+    assert {c.metadata["page"] for c in second} == {1}
+    assert after[0] == before[0] and after[2] == before[2]
+    assert after[1] and not after[1] & before[1]
+    assert len(vector_store) == sum(len(ids) for ids in after.values())
+
+    #the lexical index follows the store
+    doc_retrieval.sync_lexical_index()
+    assert set(doc_retrieval.LEXICAL_INDEX.ids()) == set().union(*after.values())
+    assert set(doc_retrieval.MANIFEST.get(source)["chunks"]["1"]) == after[1]
+
+
+@pytest.mark.skipif(not NG12_PDF.exists(), reason="NG12 guideline pdf not available")
+def test_removed_pages_drop_their_chunks(vector_store, tmp_path):
+    path = tmp_path / "guideline.pdf"
+    source = _write_pdf(path, [3, 4])
+    doc_retrieval.index_file(source)
+    before = _ids_by_page(vector_store, source)
+    _write_pdf(path, [3])
+    assert doc_retrieval.index_file(source) == []
+    assert _ids_by_page(vector_store, source) == {0: before[0]}
@@ -0,0 +1,168 @@
+"""
+IngestJobs: bounded queue, per-destination serialization (and lock cleanup), progress and failure
+reporting; POST /upload on top of it.
+"""
+import asyncio
+import threading
+import time
+
+import httpx
+import pytest
+
+from scripts.ingest_jobs import IngestJobs, JobQueueFull
+
+
+class BlockingIndex:
+    """
+    Stand-in for doc_retrieval.index_file: reports progress, waits for `release`, records overlap.
+    """
+
+    def __init__(self, fail_on: str = ""):
+        self.release = threading.Event()
+        self.fail_on = fail_on
+        self.running = 0
+        self.peak = 0
+        self.seen = []
+        self._lock = threading.Lock()
+
+    def __call__(self, path, progress):
+        with self._lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            with open(path) as fh:
+                self.seen.append(fh.read())
+            progress({"pages_total": 2, "pages_done": 1, "chunks": 3})
+            self.release.wait(5)
+            if self.fail_on and self.fail_on in path:
+                raise ValueError("not a pdf")
+            progress({"pages_done": 2, "chunks": 5})
+            return ["chunk"] * 5
+        finally:
+            with self._lock:
+                self.running -= 1
+
+
+def _staged(tmp_path, name, text):
+    path = tmp_path / f"{name}.part"
+    path.write_text(text)
+    return str(path)
+
+
+def _wait(jobs, job_id, status, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = jobs.get(job_id)
+        if job["status"] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {jobs.get(job_id)['status']}, expected {status}")
+
+
+def test_full_queue_raises(tmp_path):
+    index = BlockingIndex()
+    jobs = IngestJobs(index, max_workers=1, max_pending=1)
+    running = jobs.submit(_staged(tmp_path, "a", "a"), str(tmp_path / "a.pdf"))
+    _wait(jobs, running["job_id"], "running")
+    jobs.submit(_staged(tmp_path, "b", "b"), str(tmp_path / "b.pdf"))
+    with pytest.raises(JobQueueFull):
+        jobs.submit(_staged(tmp_path, "c", "c"), str(tmp_path / "c.pdf"))
+    assert jobs.stats()["queued"] == 1
+    index.release.set()
+    jobs.close()
+    assert jobs.stats()["finished"] == 2
+
+
+def test_progress_and_done(tmp_path):
+    index = BlockingIndex()
+    jobs = IngestJobs(index, max_workers=1)
+    job = jobs.submit(_staged(tmp_path, "a", "payload"), str(tmp_path / "a.pdf"))
+    assert job["status"] == "queued" and job["file"] == "a.pdf" and "_path" not in job
+    running = _wait(jobs, job["job_id"], "running")
+    deadline = time.monotonic() + 5
+    while jobs.get(job["job_id"])["pages_done"] != 1 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    running = jobs.get(job["job_id"])
+    assert (running["pages_done"], running["pages_total"], running["chunks"]) == (1, 2, 3)
+    index.release.set()
+    done = _wait(jobs, job["job_id"], "done")
+    assert (done["pages_done"], done["chunks"], done["error"]) == (2, 5, None)
+    assert done["finished_at"] >= done["started_at"] >= done["submitted_at"]
+    assert (tmp_path / "a.pdf").read_text() == "payload"
+    jobs.close()
+
+
+def test_failure_is_reported(tmp_path):
+    index = BlockingIndex(fail_on="bad")
+    index.release.set()
+    jobs = IngestJobs(index, max_workers=1)
+    job = jobs.submit(_staged(tmp_path, "bad", "x"), str(tmp_path / "bad.pdf"))
+    failed = _wait(jobs, job["job_id"], "failed")
+    assert failed["error"] == "not a pdf"
+    assert jobs.stats()["failed"] == 1
+    jobs.close()
+
+
+def test_same_destination_is_serialized_and_its_lock_dropped(tmp_path):
+    index = BlockingIndex()
+    jobs = IngestJobs(index, max_workers=3)
+    destination = str(tmp_path / "guideline.pdf")
+    first = jobs.submit(_staged(tmp_path, "v1", "v1"), destination)
+    second = jobs.submit(_staged(tmp_path, "v2", "v2"), destination)
+    other = jobs.submit(_staged(tmp_path, "o", "o"), str(tmp_path / "other.pdf"))
+    _wait(jobs, other["job_id"], "running")
+    _wait(jobs, first["job_id"], "running")
+    #the second upload of the same name waits, a different name runs alongside
+    time.sleep(0.1)
+    assert jobs.get(second["job_id"])["status"] == "queued"
+    assert index.peak == 2
+    index.release.set()
+    for job in (first, second, other):
+        _wait(jobs, job["job_id"], "done")
+    assert index.seen[-1] == "v2" and sorted(index.seen) == ["o", "v1", "v2"]
+    jobs.close()
+    assert jobs.stats()["path_locks"] == 0
+
+
+def test_finished_jobs_are_trimmed(tmp_path):
+    index = BlockingIndex()
+    index.release.set()
+    jobs = IngestJobs(index, max_workers=1, keep_finished=2)
+    ids = [jobs.submit(_staged(tmp_path, f"f{i}", "x"), str(tmp_path / f"f{i}.pdf"))["job_id"] for i in range(4)]
+    jobs.close()
+    assert [jobs.get(job_id) is not None for job_id in ids] == [False, False, True, True]
+
+
+def test_upload_endpoint_answers_503_when_the_queue_is_full(tmp_path, monkeypatch):
+    from app import main
+
+    index = BlockingIndex()
+    jobs = IngestJobs(index, max_workers=1, max_pending=1)
+    monkeypatch.setattr(main, "INGEST_JOBS", jobs)
+    monkeypatch.setattr(main, "UPLOAD_DIR", str(tmp_path))
+    monkeypatch.setattr(main, "INCOMING_DIR", str(tmp_path))
+
+    async def upload(client, name):
+        return await client.post("/upload", files={"file": (name, b"%PDF-1.4 fake", "application/pdf")})
+
+    async def run():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            accepted = await upload(client, "a.pdf")
+            _wait(jobs, accepted.json()["job_id"], "running")
+            queued = await upload(client, "b.pdf")
+            rejected = await upload(client, "c.pdf")
+            index.release.set()
+            await asyncio.to_thread(_wait, jobs, accepted.json()["job_id"], "done")
+            status = await client.get(f"/upload/{accepted.json()['job_id']}")
+            missing = await client.get("/upload/nope")
+            return accepted, queued, rejected, status, missing
+
+    accepted, queued, rejected, status, missing = asyncio.run(run())
+    jobs.close()
+    assert accepted.status_code == queued.status_code == 202
+    assert rejected.status_code == 503 and rejected.headers["retry-after"] == "5"
+    assert status.json()["status"] == "done" and status.json()["chunks"] == 5
+    assert missing.status_code == 404
+    #the rejected upload's staged file is removed
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["a.pdf", "b.pdf"]
@@ -0,0 +1,52 @@
+"""
+Parallel page-group extraction must give the same pages as the serial path, with workers started
+by spawn (the pool is used from threads of the api process).
+"""
+from pathlib import Path
+
+import pytest
+
+from scripts import ingestion
+
+NG12_PDF = Path(__file__).resolve().parents[1] / "data" / "NG12_pdf.pdf"
+
+pytestmark = pytest.mark.skipif(not NG12_PDF.exists(), reason="NG12 guideline pdf not available")
+
+
+def _pages(groups):
+    return sorted(((doc.metadata["page"], doc.page_content, doc.metadata["source"]) for _, docs in groups for doc in docs))
+
+
+def test_pool_workers_are_spawned():
+    assert ingestion.POOL_CONTEXT.get_start_method() == "spawn"
+
+
+def test_page_groups():
+    assert ingestion.page_groups([5, 0, 3, 1, 2], 2) == [(0, 1), (2, 3), (5,)]
+
+
+def test_parallel_extraction_matches_serial():
+    pages = range(12)
+    serial = list(ingestion.stream_pdf_pages(str(NG12_PDF), pages_per_task=3, max_workers=1, fast_path=True, pages=pages))
+    parallel = list(ingestion.stream_pdf_pages(str(NG12_PDF), pages_per_task=3, max_workers=2, fast_path=True, pages=pages))
+    assert sorted(group for group, _ in parallel) == [(0, 1, 2), (3, 4, 5), (6, 7, 8), (9, 10, 11)]
+    assert _pages(parallel) == _pages(serial)
+    assert {page for page, _, _ in _pages(serial)} <= set(pages)
+
+
+def test_ingest_pdf_streams_every_page_into_the_store():
+    stored, progress = [], []
+
+    def store(docs):
+        stored.append(len(docs))
+        return docs
+
+    chunks = ingestion.ingest_pdf(
+        str(NG12_PDF), store, pages_per_task=2, max_workers=2, fast_path=True,
+        flush_pages=4, pages=range(8), on_pages=progress.append,
+    )
+    assert sorted(page for group in progress for page in group) == list(range(8))
+    assert len(stored) == 2
+    assert sum(stored) == len(chunks)
+    serial = ingestion.ingest_pdf(str(NG12_PDF), lambda docs: docs, max_workers=1, fast_path=True, pages=range(8))
+    assert sorted(d.page_content for d in chunks) == sorted(d.page_content for d in serial)
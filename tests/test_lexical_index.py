@@ -0,0 +1,131 @@
+"""
+BM25 inverted index and hybrid (dense + BM25) retrieval with reciprocal-rank fusion.
+"""
+import math
+
+import pytest
+from langchain_core.documents import Document
+
+from scripts.doc_retrieval import DocumentBaseRetriever, publish_documents, reciprocal_rank_fusion, sync_lexical_index
+from scripts.lexical_index import InvertedIndex, tokenize
+
+
+@pytest.mark.parametrize("uk, us", [
+    ("haemoptysis", "hemoptysis"), ("anaemia", "anemia"), ("leukaemia", "leukemia"),
+    ("oesophageal", "esophageal"), ("paediatric", "pediatric"), ("orthopaedic", "orthopedic"),
+    ("diarrhoea", "diarrhea"), ("lymphoedema", "lymphedema"), ("tumour", "tumor"),
+])
+def test_british_medical_spellings_fold_to_us(uk, us):
+    assert tokenize(uk) == tokenize(us) == [us]
+
+
+def test_unrelated_ae_oe_words_are_left_alone():
+    assert tokenize("shoe toe does canoe aerial") == ["shoe", "toe", "does", "canoe", "aerial"]
+
+
+def test_stopwords_and_case():
+    assert tokenize("The Persistent cough, AND fatigue") == ["persistent", "cough", "fatigue"]
+
+
+def _index(texts):
+    index = InvertedIndex()
+    for i, text in enumerate(texts):
+        index.add(f"d{i}", text)
+    return index
+
+
+def test_rare_term_outranks_common_term():
+    index = _index([
+        "persistent cough in smokers",
+        "persistent fatigue",
+        "persistent dysphagia",
+        "persistent hoarseness",
+    ])
+    ranked = [doc.id for doc, _ in index.search("persistent cough")]
+    assert ranked[0] == "d0"
+    assert set(ranked) == {"d0", "d1", "d2", "d3"}
+
+
+def test_bm25_score_matches_formula():
+    index = _index(["cough cough fatigue", "fatigue", "dysphagia weight loss"])
+    (doc, score), = [hit for hit in index.search("cough") if hit[0].id == "d0"]
+    n, df, avgdl, k1, b = 3, 1, 7 / 3, index.k1, index.b
+    idf = math.log(1 + (n - df + 0.5) / (df + 0.5))
+    assert score == pytest.approx(idf * 2 * (k1 + 1) / (2 + k1 * (1 - b + b * 3 / avgdl)))
+
+
+def test_shorter_document_wins_on_equal_term_frequency():
+    index = _index(["haemoptysis", "haemoptysis with a long list of other unrelated findings in the record"])
+    assert [doc.id for doc, _ in index.search("hemoptysis")] == ["d0", "d1"]
+
+
+def test_remove_and_replace():
+    index = _index(["haemoptysis", "dysphagia"])
+    index.remove(["d0", "missing"])
+    assert "d0" not in index and len(index) == 1
+    assert index.search("haemoptysis") == []
+    index.add("d1", "hoarseness")
+    assert index.search("dysphagia") == []
+    assert [doc.id for doc, _ in index.search("hoarseness")] == ["d1"]
+
+
+def test_reindexing_reuses_freed_slots():
+    index = _index([f"chunk {i} about cough" for i in range(10)])
+    for round_ in range(20):
+        for i in range(10):
+            index.add(f"d{i}", f"chunk {i} about cough, version {round_}")
+        index.remove(["d3", "d4"])
+        index.add("d3", "chunk 3 about fatigue")
+        index.add("d4", "chunk 4 about fatigue")
+    assert len(index._docs) == len(index._doc_len) == 10
+    assert len(index) == 10
+    assert index._total_len == sum(len(tokenize(doc.page_content)) for doc in index._docs)
+
+
+def test_reciprocal_rank_fusion():
+    a, b, c = (Document(id=i, page_content=i) for i in "abc")
+    fused = reciprocal_rank_fusion([[a, b], [b, c]], [1.0, 1.0], k=60)
+    assert [doc.id for doc, _ in fused] == ["b", "a", "c"]
+    assert fused[0][1] == pytest.approx(1 / 62 + 1 / 61)
+    weighted = reciprocal_rank_fusion([[a, b], [c]], [1.0, 3.0], k=60)
+    assert [doc.id for doc, _ in weighted] == ["c", "a", "b"]
+
+
+CHUNKS = [
+    Document(id="c-hem", page_content="Refer people aged 40 and over with unexplained haemoptysis using a suspected cancer pathway referral.", metadata={"source": "ng12", "page": 1}),
+    Document(id="c-dys", page_content="Offer urgent direct access upper gastrointestinal endoscopy to people with dysphagia.", metadata={"source": "ng12", "page": 2}),
+    Document(id="c-bre", page_content="Refer people aged 30 and over with an unexplained breast lump with or without pain.", metadata={"source": "ng12", "page": 3}),
+    Document(id="c-xr", page_content="Offer an urgent chest X-ray to people aged 40 and over who have ever smoked and have fatigue.", metadata={"source": "ng12", "page": 1}),
+]
+
+
+def _publish(store, chunks):
+    publish_documents(chunks, store.embed_texts([d.page_content for d in chunks]))
+
+
+def test_hybrid_retrieval_fuses_dense_and_lexical(vector_store):
+    from scripts import doc_retrieval
+
+    sync_lexical_index()
+    _publish(vector_store, CHUNKS)
+    #in step with the store, so the publish updated it incrementally
+    assert len(doc_retrieval.LEXICAL_INDEX) == len(CHUNKS)
+    assert doc_retrieval.LEXICAL_INDEX.generation == vector_store.snapshot().generation
+    retriever = DocumentBaseRetriever(search_mode="hybrid", k=2)
+    #us spelling only reaches the british chunk through the folded lexical match
+    docs = retriever.invoke("hemoptysis referral")
+    assert docs[0].id == "c-hem"
+    assert docs[0].metadata["relevance_score"] >= docs[1].metadata["relevance_score"]
+    assert retriever.invoke("dysphagia endoscopy")[0].id == "c-dys"
+
+
+def test_lexical_index_catches_up_with_other_writers(vector_store):
+    from scripts import doc_retrieval
+
+    _publish(vector_store, CHUNKS[:2])
+    #a write the lexical index didn't see (another worker)
+    vector_store.commit([CHUNKS[2].page_content], [CHUNKS[2].metadata], [CHUNKS[2].id],
+                        vector_store.embed_texts([CHUNKS[2].page_content]), ["c-dys"])
+    assert "c-bre" not in doc_retrieval.LEXICAL_INDEX
+    sync_lexical_index()
+    assert sorted(doc_retrieval.LEXICAL_INDEX.ids()) == ["c-bre", "c-hem"]
@@ -0,0 +1,100 @@
+"""
+Vectorized top_k / mmr_select / batch_mmr against naive references.
+"""
+import numpy as np
+import pytest
+
+from scripts.mmr import batch_mmr, mmr_select, top_k
+
+
+def _unit(rng, shape):
+    x = rng.standard_normal(shape).astype(np.float32)
+    return x / np.linalg.norm(x, axis=-1, keepdims=True)
+
+
+def naive_mmr(query, candidates, k, lambda_mult):
+    """
+    Textbook MMR: argmax of lambda * sim(q, d) - (1 - lambda) * max sim(d, selected), one pick at a time.
+    """
+    relevance = candidates @ query
+    selected = [int(np.argmax(relevance))]
+    while len(selected) < min(k, len(candidates)):
+        best, best_score = None, -np.inf
+        for i in range(len(candidates)):
+            if i in selected:
+                continue
+            redundancy = max(float(candidates[i] @ candidates[j]) for j in selected)
+            score = lambda_mult * relevance[i] - (1 - lambda_mult) * redundancy
+            if score > best_score:
+                best, best_score = i, score
+        selected.append(best)
+    return selected
+
+
+@pytest.mark.parametrize("k", [0, 1, 5, 50])
+def test_top_k_matches_sort(k):
+    rng = np.random.default_rng(1)
+    scores = rng.standard_normal((3, 50)).astype(np.float32)
+    expected = np.argsort(-scores, axis=1)[:, :k]
+    assert np.array_equal(top_k(scores, k), expected)
+    assert np.array_equal(top_k(scores[0], k), expected[0])
+
+
+def test_top_k_larger_than_n():
+    assert top_k(np.array([0.1, 0.9, 0.5], dtype=np.float32), 10).tolist() == [1, 2, 0]
+
+
+@pytest.mark.parametrize("lambda_mult", [0.0, 0.25, 0.5, 1.0])
+@pytest.mark.parametrize("seed", range(5))
+def test_mmr_select_matches_naive_reference(lambda_mult, seed):
+    rng = np.random.default_rng(seed)
+    queries = _unit(rng, (4, 16))
+    candidates = _unit(rng, (4, 20, 16))
+    relevance = np.einsum("bfd,bd->bf", candidates, queries)
+    picks = mmr_select(relevance, candidates, k=6, lambda_mult=lambda_mult)
+    for b in range(4):
+        assert picks[b].tolist() == naive_mmr(queries[b], candidates[b], 6, lambda_mult)
+
+
+def test_mmr_select_matches_langchain():
+    from langchain_core.vectorstores.utils import maximal_marginal_relevance
+
+    rng = np.random.default_rng(7)
+    query = _unit(rng, (16,))
+    candidates = _unit(rng, (20, 16))
+    picks = mmr_select((candidates @ query)[None], candidates[None], k=5, lambda_mult=0.5)[0]
+    assert picks.tolist() == maximal_marginal_relevance(query, list(candidates), lambda_mult=0.5, k=5)
+
+
+def test_mmr_select_k_beyond_candidates():
+    rng = np.random.default_rng(3)
+    candidates = _unit(rng, (1, 3, 8))
+    picks = mmr_select(np.array([[0.1, 0.3, 0.2]], dtype=np.float32), candidates, k=10)
+    assert sorted(picks[0].tolist()) == [0, 1, 2]
+    assert mmr_select(np.zeros((2, 0), dtype=np.float32), np.zeros((2, 0, 8), dtype=np.float32), k=3).shape == (2, 0)
+
+
+def test_mmr_skips_near_duplicates():
+    base = np.eye(4, dtype=np.float32)
+    duplicate = (base[0] + 0.01 * base[1]) / np.linalg.norm(base[0] + 0.01 * base[1])
+    matrix = np.vstack([base[0], duplicate, base[1], base[2]])
+    query = np.array([[0.9, 0.1, 0.4, 0.0]], dtype=np.float32)
+    query /= np.linalg.norm(query)
+    assert batch_mmr(query, matrix, k=2, fetch_k=4, lambda_mult=0.5)[0].tolist() == [1, 3]
+    #pure relevance keeps the duplicate
+    assert batch_mmr(query, matrix, k=2, fetch_k=4, lambda_mult=1.0)[0].tolist() == [1, 0]
+
+
+def test_batch_mmr_matches_per_query_reference():
+    rng = np.random.default_rng(11)
+    matrix = _unit(rng, (200, 32))
+    queries = _unit(rng, (5, 32))
+    rows = batch_mmr(queries, matrix, k=4, fetch_k=15, lambda_mult=0.5)
+    for query, got in zip(queries, rows):
+        fetched = np.argsort(-(matrix @ query))[:15]
+        expected = fetched[naive_mmr(query, matrix[fetched], 4, 0.5)]
+        assert got.tolist() == expected.tolist()
+
+
+def test_batch_mmr_empty_matrix():
+    assert [r.tolist() for r in batch_mmr(np.ones((2, 4), dtype=np.float32), np.zeros((0, 4), dtype=np.float32))] == [[], []]
@@ -0,0 +1,112 @@
+"""
+Golden checks for the NG12 rule compiler: the clauses known recommendations compile to, which
+recommendations compile at all, and the decisions the table returns for reference patients.
+"""
+from pathlib import Path
+
+import pytest
+
+from scripts.ng12_rules import RuleTable, build_rules, clean_term, guideline_pages
+
+NG12_PDF = Path(__file__).resolve().parents[1] / "data" / "NG12_pdf.pdf"
+
+#the 61 of 109 recommendations a patient record can trigger; a change here means the compiler now
+#reads (or skips) a recommendation differently and the table's decisions need re-checking
+COMPILED_IDS = (
+    "1.1.1 1.1.2 1.1.3 1.1.5 1.1.6 1.2.1 1.2.2 1.2.3 1.2.4 1.2.5 1.2.6 1.2.7 1.2.8 1.2.9 1.2.10 1.2.11 "
+    "1.3.1 1.3.5 1.3.6 1.4.1 1.4.2 1.4.3 1.5.10 1.5.11 1.5.12 1.5.13 1.5.14 1.5.15 1.6.3 1.6.4 1.6.5 "
+    "1.6.6 1.6.7 1.6.8 1.6.9 1.6.10 1.7.1 1.7.3 1.7.4 1.7.5 1.8.1 1.8.2 1.8.3 1.8.4 1.8.5 1.9.1 1.9.2 "
+    "1.10.1 1.10.2 1.10.3 1.10.4 1.10.6 1.10.7 1.10.8 1.10.9 1.11.3 1.11.4 1.11.6 1.12.1 1.12.2 1.12.3"
+).split()
+
+
+def _clause(all_of=(), any_of=(), min_count=0, **cond):
+    return {**cond, "all_of": list(all_of), "any_of": list(any_of), "min_count": min_count}
+
+
+GOLDEN_CLAUSES = {
+    "1.1.1": ("refer", [_clause(["hemoptysis"], min_age=40)]),
+    "1.2.1": ("refer", [
+        _clause(["dysphagia"]),
+        _clause(["weightloss"], ["upperabdominalpain", "reflux", "dyspepsia"], 1, min_age=55),
+    ]),
+    "1.3.1": ("non_urgent", [
+        _clause(["abdominalmass"], min_age=18),
+        _clause(["changeinbowelhabit"], min_age=18),
+        _clause(["irondeficiencyanemia"], min_age=18),
+        _clause(["weightloss", "abdominalpain"], min_age=40),
+        _clause(["rectalbleeding"], ["abdominalpain", "weightloss"], 1, min_age=18, max_age=49),
+        _clause([], ["rectalbleeding", "abdominalpain", "weightloss"], 1, min_age=50),
+        _clause(["anemia"], min_age=60),
+    ]),
+    "1.3.5": ("consider_refer", [_clause(["rectalmass"], min_age=18)]),
+    "1.3.6": ("consider_refer", [_clause(["analmass"]), _clause(["analulceration"])]),
+    "1.4.1": ("refer", [
+        _clause(["breastlumpwithorwithoutpain"], min_age=30),
+        _clause([], ["discharge", "retraction", "otherchangesofconcern"], 1, min_age=50),
+    ]),
+    "1.8.1": ("consider_refer", [_clause(["persistenthoarseness"], min_age=45), _clause(["lumpinneck"], min_age=45)]),
+    "1.10.4": ("non_urgent", [_clause(["persistentbonepain"], min_age=60), _clause(["fracture"], min_age=60)]),
+    "1.12.1": ("consider_refer", [
+        _clause(["palpableabdominalmass"], max_age=24),
+        _clause(["enlargedabdominalorgan"], max_age=24),
+    ]),
+}
+
+#(age, symptoms) -> (decision, strongest recommendation); None = the table must defer to the llm
+GOLDEN_DECISIONS = [
+    ((70, ["rectal mass", "weight loss"]), ("urgent_referral", "1.3.5")),
+    ((55, ["anal mass", "abdominal pain"]), ("urgent_referral", "1.3.6")),
+    ((45, ["change in bowel habit"]), ("non_urgent_investigation", "1.3.1")),
+    ((65, ["anaemia"]), ("non_urgent_investigation", "1.3.1")),
+    ((55, ["unexplained hemoptysis", "fatigue"]), ("urgent_referral", "1.1.1")),
+    ((35, ["dysphagia"]), ("urgent_referral", "1.2.1")),
+    ((32, ["unexplained breast lump"]), ("urgent_referral", "1.4.1")),
+    ((48, ["persistent hoarseness"]), ("urgent_referral", "1.8.1")),
+    ((10, ["palpable abdominal mass"]), ("urgent_referral", "1.12.1")),
+]
+
+
+@pytest.fixture(scope="module")
+def rules():
+    if not NG12_PDF.exists():
+        pytest.skip("NG12 guideline pdf not available")
+    return {rule["id"]: rule for rule in build_rules(guideline_pages(str(NG12_PDF)))}
+
+
+@pytest.fixture(scope="module")
+def table(rules):
+    return RuleTable(list(rules.values()), str(NG12_PDF))
+
+
+def test_compiled_recommendations(rules):
+    assert list(rules) == COMPILED_IDS
+
+
+@pytest.mark.parametrize("rec_id", sorted(GOLDEN_CLAUSES))
+def test_golden_clauses(rules, rec_id):
+    action, clauses = GOLDEN_CLAUSES[rec_id]
+    assert rules[rec_id]["action"] == action
+    assert rules[rec_id]["clauses"] == clauses
+    assert all(clean_term(t) for c in clauses for t in c["all_of"] + c["any_of"])
+
+
+@pytest.mark.parametrize("patient, expected", GOLDEN_DECISIONS)
+def test_golden_decisions(table, patient, expected):
+    age, symptoms = patient
+    patient = {"age": age, "symptoms": symptoms}
+    assert table.covers(patient)
+    decision = table.evaluate(patient)
+    assert (decision["decision"], decision["matched_rules"][0]) == expected
+
+
+def test_uncovered_symptom_defers_to_llm(table):
+    #"sore throat" compiles to no term: matching on "persistent cough" alone could under-triage
+    assert not table.covers({"age": 25, "symptoms": ["persistent cough", "sore throat"]})
+    assert not table.covers({"age": 25, "symptoms": []})
+
+
+def test_no_glued_articles_or_merged_alternatives(rules):
+    terms = {t for rule in rules.values() for c in rule["clauses"] for t in c["all_of"] + c["any_of"]}
+    assert not {"arectalmass", "achangeinbowelhabit", "analmassanalulceration"} & terms
+    assert not [t for t in terms if t.startswith(("apalpable", "apersistent", "askin", "alump"))]
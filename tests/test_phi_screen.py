@@ -0,0 +1,102 @@
+"""
+PHI pre-screen: known patient names and ids, MRNs and NHS numbers are flagged and sent to the llm
+review (double_check); clean answers skip it.
+"""
+from pathlib import Path
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from ragPipeline.phi_screen import AhoCorasick, PhiScreen
+from scripts.fakes import SlowFakeChatModel
+
+PATIENTS = Path(__file__).resolve().parents[1] / "data" / "patients.json"
+
+CLEAN = "Refer using a suspected cancer pathway referral for lung cancer (NG12 1.1.1) within 2 weeks."
+
+FLAGGED = [
+    ("John Doe should be referred for an urgent chest X-ray.", "patient_name"),
+    ("Mr Connor meets the criteria for an urgent referral.", "patient_name"),
+    ("Patient PT-104 needs direct access endoscopy.", "patient_id"),
+    ("Book endoscopy for MRN: A12345678 today.", "mrn"),
+    ("NHS number 943 476 5919 is on the referral form.", "nhs_number"),
+    ("The NHS number 9434765919 should be checked.", "nhs_number"),
+]
+
+
+@pytest.fixture(scope="module")
+def screen():
+    return PhiScreen.from_patients_file(str(PATIENTS))
+
+
+@pytest.mark.parametrize("answer", [
+    CLEAN,
+    "Offer an urgent chest X-ray to people aged 40 and over who have ever smoked.",
+    #parts of names only count on word boundaries
+    "Consider johnsonian or smithfield, they are not patients.",
+])
+def test_clean_answers_have_no_findings(screen, answer):
+    assert screen.findings(answer) == []
+
+
+@pytest.mark.parametrize("answer,kind", FLAGGED)
+def test_identifiers_are_flagged(screen, answer, kind):
+    assert kind in {f.kind for f in screen.findings(answer)}
+
+
+def test_missing_patients_file_keeps_the_patterns(tmp_path):
+    screen = PhiScreen.from_patients_file(str(tmp_path / "missing.json"))
+    assert screen.findings("John Doe") == []
+    assert [f.kind for f in screen.findings("MRN 12345678")] == ["mrn"]
+
+
+def test_aho_corasick_finds_overlapping_whole_words():
+    matcher = AhoCorasick(["ann", "anne smith", "smith"])
+    assert matcher.find_all("Anne Smith and Ann, not Annette") == [(0, "anne smith"), (5, "smith"), (15, "ann")]
+
+
+def test_stats_count_the_fast_path():
+    screen = PhiScreen.from_patients_file(str(PATIENTS))
+    screen.screen(CLEAN)
+    screen.screen(FLAGGED[0][0])
+    stats = screen.stats()
+    assert (stats["screened"], stats["fast_path"], stats["escalated"]) == (2, 1, 1)
+
+
+def _nodes_run(rag, config, question):
+    nodes = []
+    for update in rag.graph.stream({"messages": [HumanMessage(question)]}, config=config, stream_mode="updates"):
+        nodes.extend(update)
+    return nodes
+
+
+@pytest.fixture
+def screened_rag(offline_rag, monkeypatch, screen):
+    monkeypatch.setattr(offline_rag, "PHI_SCREEN", screen)
+    monkeypatch.setattr(offline_rag, "PHI_SCREEN_ENABLED", True)
+    return offline_rag
+
+
+def test_clean_answer_skips_double_check(screened_rag, monkeypatch, thread_config):
+    monkeypatch.setattr(screened_rag, "llm", SlowFakeChatModel(latency_s=0, reply=CLEAN))
+    nodes = _nodes_run(screened_rag, thread_config, "when should haemoptysis be referred?")
+    assert "phi_screen" in nodes and "double_check" not in nodes
+    assert nodes[-1] == "doc_finalizer"
+    #generate only, no review call
+    assert screened_rag.llm.calls == 1
+    state = screened_rag.graph.get_state(thread_config).values
+    assert state["phi_flagged"] is False and state["issues_detected"] is False
+
+
+@pytest.mark.parametrize("answer,kind", FLAGGED)
+def test_flagged_answer_goes_to_double_check(screened_rag, monkeypatch, thread_config, answer, kind):
+    monkeypatch.setattr(screened_rag, "llm", SlowFakeChatModel(latency_s=0, reply=answer))
+    nodes = _nodes_run(screened_rag, thread_config, "what is the next step?")
+    assert nodes.index("phi_screen") < nodes.index("double_check") < nodes.index("doc_finalizer")
+    assert screened_rag.graph.get_state(thread_config).values["phi_flagged"] is True
+
+
+def test_disabled_screen_always_reviews(offline_rag, monkeypatch, thread_config):
+    monkeypatch.setattr(offline_rag, "PHI_SCREEN_ENABLED", False)
+    monkeypatch.setattr(offline_rag, "llm", SlowFakeChatModel(latency_s=0, reply=CLEAN))
+    assert "double_check" in _nodes_run(offline_rag, thread_config, "when should haemoptysis be referred?")
@@ -0,0 +1,69 @@
+"""
+Patient lookups join guideline retrieval instead of replacing it; guideline questions that mention a
+symptom are not answered from whichever patients happen to have it.
+"""
+import pytest
+from langchain_core.messages import HumanMessage
+
+from ragPipeline.query_router import QueryRouter
+
+GUIDELINE_QUESTIONS = [
+    "When should unexplained hemoptysis be referred urgently?",
+    "What does NG12 recommend for a 55 year old smoker with fatigue?",
+    "What does NG12 say about patients with dysphagia?",
+]
+
+
+@pytest.fixture
+def store(patient_store):
+    return patient_store
+
+
+def test_symptom_route_is_off_by_default(store):
+    router = QueryRouter(store)
+    assert router.route("Which patients have fatigue?") == ("vector", [])
+
+
+@pytest.mark.parametrize("question", GUIDELINE_QUESTIONS)
+def test_guideline_questions_with_a_symptom_route_to_vector(store, question):
+    assert QueryRouter(store, route_symptoms=True).route(question) == ("vector", [])
+
+
+@pytest.mark.parametrize("question", ["Which patients have fatigue?", "List all patients with fatigue", "How many patients have fatigue?"])
+def test_find_patient_questions_take_the_symptom_route(store, question):
+    route, docs = QueryRouter(store, route_symptoms=True).route(question)
+    assert route == "symptom"
+    assert {d.metadata["patient_id"] for d in docs} == {"PT-101", "PT-105", "PT-106"}
+
+
+def test_patient_id_route(store):
+    route, docs = QueryRouter(store).route("assess PT-105 and pt-101")
+    assert route == "patient_id"
+    assert [d.metadata["patient_id"] for d in docs] == ["PT-105", "PT-101"]
+
+
+@pytest.fixture
+def routed_rag(offline_rag, store, monkeypatch):
+    monkeypatch.setattr(offline_rag, "QUERY_ROUTER", QueryRouter(store, route_symptoms=True))
+    return offline_rag
+
+
+@pytest.mark.parametrize("question", GUIDELINE_QUESTIONS)
+def test_guideline_question_context_is_guideline_text(routed_rag, thread_config, question):
+    result = routed_rag.graph.invoke({"messages": [HumanMessage(question)]}, config=thread_config)
+    assert result["route"] == "vector"
+    assert [d.id for d in result["context"]] == ["ng12-p3-0", "ng12-p3-1"]
+    assert routed_rag.retriever.queries == [question]
+
+
+def test_patient_records_are_added_to_retrieved_evidence(routed_rag, thread_config):
+    result = routed_rag.graph.invoke({"messages": [HumanMessage("assess PT-105")]}, config=thread_config)
+    assert result["route"] == "patient_id"
+    assert [d.metadata.get("patient_id") for d in result["context"]] == ["PT-105", None, None]
+    assert [d.id for d in result["context"][1:]] == ["ng12-p3-0", "ng12-p3-1"]
+
+
+def test_records_do_not_leak_into_the_next_turn(routed_rag, thread_config):
+    routed_rag.graph.invoke({"messages": [HumanMessage("assess PT-105")]}, config=thread_config)
+    result = routed_rag.graph.invoke({"messages": [HumanMessage("When is a chest X-ray offered?")]}, config=thread_config)
+    assert [d.id for d in result["context"]] == ["ng12-p3-0", "ng12-p3-1"]
@@ -0,0 +1,94 @@
+"""
+Server-side sessions: thread_input continues, restores or starts a session thread, and the
+/sessions routes read and delete it.
+"""
+import asyncio
+import uuid
+
+import httpx
+from fastapi import FastAPI
+
+HISTORY = [
+    {"role": "user", "content": "58 year old smoker with a persistent cough"},
+    {"role": "assistant", "content": "Offer an urgent chest X-ray."},
+]
+
+
+def _app():
+    from app.routers import chat, history
+
+    app = FastAPI()
+    app.include_router(chat.router)
+    app.include_router(history.router)
+    return app
+
+
+def _run(requests):
+    async def go():
+        transport = httpx.ASGITransport(app=_app())
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+            return [await getattr(client, method)(url, **kwargs) for method, url, kwargs in requests]
+    return asyncio.run(go())
+
+
+def test_thread_input_without_session_is_ephemeral(offline_rag):
+    from app.routers.chat import ChatRequest, thread_input
+
+    config, messages, ephemeral, session = asyncio.run(thread_input(ChatRequest(message="hi", history=HISTORY)))
+    assert ephemeral and session is None
+    assert [m.content for m in messages] == [HISTORY[0]["content"], HISTORY[1]["content"], "hi"]
+    config2, *_ = asyncio.run(thread_input(ChatRequest(message="hi")))
+    assert config["configurable"]["thread_id"] != config2["configurable"]["thread_id"]
+
+
+def test_thread_input_new_restored_continued(offline_rag):
+    from app.routers.chat import ChatRequest, thread_input
+
+    session_id = uuid.uuid4().hex
+    _, messages, ephemeral, session = asyncio.run(thread_input(ChatRequest(message="hi", session_id=session_id)))
+    assert (session, ephemeral, len(messages)) == ("new", False, 1)
+
+    #an expired session is rebuilt from the history the client sent
+    _, messages, _, session = asyncio.run(thread_input(ChatRequest(message="hi", history=HISTORY, session_id=session_id)))
+    assert (session, len(messages)) == ("restored", 3)
+
+    (response,) = _run([("post", "/chat", {"json": {"message": "which referral?", "session_id": session_id}})])
+    assert response.json()["session"] == "new"
+    #once the thread exists only the new message is sent, the history is ignored
+    _, messages, _, session = asyncio.run(thread_input(ChatRequest(message="and then?", history=HISTORY, session_id=session_id)))
+    assert session == "continued"
+    assert [m.content for m in messages] == ["and then?"]
+
+
+def test_session_round_trip(offline_rag):
+    create, = _run([("post", "/sessions", {})])
+    session_id = create.json()["session_id"]
+    responses = _run([
+        ("get", f"/sessions/{session_id}", {}),
+        ("post", "/chat", {"json": {"message": "first question", "history": HISTORY, "session_id": session_id}}),
+        ("post", "/chat", {"json": {"message": "second question", "session_id": session_id}}),
+        ("get", f"/sessions/{session_id}", {}),
+        ("delete", f"/sessions/{session_id}", {}),
+        ("get", f"/sessions/{session_id}", {}),
+    ])
+    missing, first, second, stored, deleted, gone = responses
+    assert missing.status_code == 404
+    assert first.json()["session"] == "restored"
+    assert second.json()["session"] == "continued"
+    stored = stored.json()
+    assert [m["role"] for m in stored["messages"]] == ["user", "assistant", "user", "assistant", "user", "assistant"]
+    assert stored["messages"][4]["content"] == "second question"
+    assert deleted.json() == {"session_id": session_id, "deleted": True}
+    assert gone.status_code == 404
+
+
+def test_delete_leaves_other_sessions(offline_rag):
+    keep, drop = uuid.uuid4().hex, uuid.uuid4().hex
+    responses = _run([
+        ("post", "/chat", {"json": {"message": "question one", "session_id": keep}}),
+        ("post", "/chat", {"json": {"message": "question two", "session_id": drop}}),
+        ("delete", f"/sessions/{drop}", {}),
+        ("get", f"/sessions/{keep}", {}),
+        ("get", f"/sessions/{drop}", {}),
+    ])
+    assert responses[3].status_code == 200 and responses[4].status_code == 404
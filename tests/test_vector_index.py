@@ -0,0 +1,115 @@
+"""
+MmapVectorStore: generations on disk survive a reopen after add / delete / upsert, readers keep a
+consistent snapshot, and searches match a brute-force scan.
+"""
+import json
+
+import numpy as np
+import pytest
+
+from scripts.fakes import HashingEmbeddings
+from scripts.vector_index import MANIFEST_NAME, MmapVectorStore
+
+TEXTS = {
+    "hem": "unexplained haemoptysis in people aged 40 and over",
+    "dys": "dysphagia at any age needs urgent endoscopy",
+    "bre": "unexplained breast lump in people aged 30 and over",
+    "cou": "persistent cough and fatigue in people who have ever smoked",
+}
+
+
+def _open(path):
+    return MmapVectorStore(embedding=HashingEmbeddings(size=64), index_dir=str(path))
+
+
+def _contents(store):
+    return {row["id"]: (row["text"], row["metadata"]) for row in store.snapshot().rows()}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = _open(tmp_path / "index")
+    store.add_texts(list(TEXTS.values()), [{"page": i} for i in range(len(TEXTS))], ids=list(TEXTS))
+    return store
+
+
+def test_reopen_after_add(store, tmp_path):
+    reopened = _open(tmp_path / "index")
+    assert len(reopened) == 4
+    assert _contents(reopened) == _contents(store)
+    assert np.allclose(np.linalg.norm(reopened.snapshot().matrix, axis=1), 1.0, atol=1e-5)
+    assert reopened.similarity_search(TEXTS["dys"], k=1)[0].id == "dys"
+
+
+def test_reopen_after_delete(store, tmp_path):
+    assert store.delete(["dys", "missing"])
+    reopened = _open(tmp_path / "index")
+    assert sorted(_contents(reopened)) == ["bre", "cou", "hem"]
+    assert "dys" not in {d.id for d in reopened.similarity_search(TEXTS["dys"], k=4)}
+    assert reopened.get_by_ids(["dys", "hem"])[0].id == "hem"
+
+
+def test_reopen_after_upsert(store, tmp_path):
+    store.add_texts(["haemoptysis, revised wording"], [{"page": 9}], ids=["hem"])
+    reopened = _open(tmp_path / "index")
+    contents = _contents(reopened)
+    assert len(contents) == 4
+    assert contents["hem"] == ("haemoptysis, revised wording", {"page": 9})
+    #the replaced row carries its new vector
+    assert reopened.similarity_search("haemoptysis, revised wording", k=1)[0].id == "hem"
+
+
+def test_commit_publishes_upserts_and_deletes_as_one_generation(store, tmp_path):
+    before = store.snapshot()
+    vectors = store.embed_texts(["new chunk"])
+    store.commit(["new chunk"], [{}], ["new"], vectors, delete_ids=["bre", "cou"])
+    after = store.snapshot()
+    assert after.generation == before.generation + 1
+    assert sorted(_contents(store)) == ["dys", "hem", "new"]
+    #the snapshot a reader already holds is unchanged
+    assert sorted(row["id"] for row in before.rows()) == sorted(TEXTS)
+
+
+def test_other_handles_see_new_generations(store, tmp_path):
+    reader = _open(tmp_path / "index")
+    store.add_texts(["late chunk"], ids=["late"])
+    assert "late" in _contents(reader)
+    manifest = json.loads((tmp_path / "index" / MANIFEST_NAME).read_text())
+    assert manifest["generation"] == reader.snapshot().generation and manifest["count"] == 5
+
+
+def test_old_generations_are_retired(store, tmp_path):
+    for i in range(5):
+        store.add_texts([f"chunk {i}"], ids=[f"c{i}"])
+    generation = store.snapshot().generation
+    generations = {int(p.name.split(".")[0].rsplit("-", 1)[1]) for p in (tmp_path / "index").glob("vectors-*")}
+    assert generations == {generation - 1, generation}
+
+
+def test_dimension_mismatch_is_rejected(store):
+    with pytest.raises(ValueError, match="does not match"):
+        store.commit(["x"], [{}], ["x"], np.ones((1, 8), dtype=np.float32))
+
+
+def test_search_matches_brute_force(store):
+    query = "people aged 40 and over"
+    snap = store.snapshot()
+    q = np.asarray(store.embedding.embed_query(query), dtype=np.float32)
+    q /= np.linalg.norm(q)
+    scores = snap.matrix @ q
+    expected = [snap.row(int(i))["id"] for i in np.argsort(-scores)[:3]]
+    hits = store.similarity_search_with_score(query, k=3)
+    assert [d.id for d, _ in hits] == expected
+    assert [s for _, s in hits] == pytest.approx(sorted(scores, reverse=True)[:3], abs=1e-5)
+
+
+def test_filtered_search(store):
+    docs = store.similarity_search(TEXTS["hem"], k=2, filter=lambda d: d.metadata["page"] >= 2)
+    assert {d.id for d in docs} <= {"bre", "cou"} and len(docs) == 2
+
+
+def test_empty_store(tmp_path):
+    store = _open(tmp_path / "empty")
+    assert len(store) == 0
+    assert store.similarity_search("anything") == []
+    assert store.max_marginal_relevance_search_batch(["a", "b"]) == [[], []]